@@ -2,6 +2,36 @@ import React, { useState, useEffect, useRef } from 'react'
 import { useAlerts } from '../App'
 import { Eye, EyeOff, AlertTriangle, Camera } from 'lucide-react'
 
+// Binary telemetry frames (telemetry_protocol.py): an 8-byte header
+// (version, type, seq, field mask), then the subscribed fields as
+// little-endian scaled integers in the order the schema lists them
+const TELEMETRY_FIELDS = ['timestamp', 'ear', 'flags']
+const FIELD_READERS = {
+  B: [1, (view, offset) => view.getUint8(offset)],
+  H: [2, (view, offset) => view.getUint16(offset, true)],
+  h: [2, (view, offset) => view.getInt16(offset, true)],
+  I: [4, (view, offset) => view.getUint32(offset, true)]
+}
+
+const decodeTelemetry = (buffer, schema) => {
+  const view = new DataView(buffer)
+  const data = { seq: view.getUint32(2, true) }
+  let offset = 8
+  for (const field of schema.fields) {
+    const [size, read] = FIELD_READERS[field.type]
+    const value = read(view, offset)
+    offset += size
+    if (field.name === 'flags') {
+      schema.flags.forEach((flag, bit) => { data[flag] = Boolean(value & (1 << bit)) })
+    } else if (field.name === 'timestamp') {
+      data.timestamp = schema.epoch + value / field.scale
+    } else {
+      data[field.name] = value / field.scale
+    }
+  }
+  return data
+}
+
 const HomePage = () => {
   const { addAlert, settings } = useAlerts()
   const [isConnected, setIsConnected] = useState(false)
@@ -10,6 +40,7 @@ const HomePage = () => {
   const [faceDetected, setFaceDetected] = useState(false)
   const [cameraStream, setCameraStream] = useState(null)
   const wsRef = useRef(null)
+  const schemaRef = useRef(null)
   const audioRef = useRef(null)
   const videoRef = useRef(null)
   const canvasRef = useRef(null)
@@ -85,14 +116,30 @@ const HomePage = () => {
     // Connect to WebSocket
     const connectWebSocket = () => {
       wsRef.current = new WebSocket('ws://localhost:8000/ws')
+      wsRef.current.binaryType = 'arraybuffer'
       
       wsRef.current.onopen = () => {
         setIsConnected(true)
         console.log('Connected to WebSocket')
+        // Servers without the binary protocol ignore this and keep sending JSON
+        schemaRef.current = null
+        wsRef.current.send(JSON.stringify({
+          type: 'subscribe', format: 'binary', rate: 10, fields: TELEMETRY_FIELDS
+        }))
       }
       
       wsRef.current.onmessage = (event) => {
-        const data = JSON.parse(event.data)
+        let data
+        if (typeof event.data === 'string') {
+          data = JSON.parse(event.data)
+          if (data.type === 'schema') {
+            schemaRef.current = data
+            return
+          }
+        } else {
+          if (!schemaRef.current) return
+          data = decodeTelemetry(event.data, schemaRef.current)
+        }
         setEarValue(data.ear)
         setFaceDetected(data.face_detected)
         
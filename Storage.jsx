@@ -31,50 +31,26 @@ const Storage = () => {
     }
   ])
 
-  const exportToJSON = () => {
-    const data = {
-      exportDate: new Date().toISOString(),
-      sessions: sessions,
-      alerts: alerts,
-      summary: {
-        totalSessions: sessions.length,
-        totalAlerts: alerts.length,
-        avgSessionDuration: sessions.reduce((sum, s) => sum + parseInt(s.duration), 0) / sessions.length
-      }
-    }
-
-    const blob = new Blob([JSON.stringify(data, null, 2)], { type: 'application/json' })
-    const url = URL.createObjectURL(blob)
-    const a = document.createElement('a')
-    a.href = url
-    a.download = `blinksense-data-${new Date().toISOString().split('T')[0]}.json`
-    document.body.appendChild(a)
-    a.click()
-    document.body.removeChild(a)
-    URL.revokeObjectURL(url)
-  }
-
-  const exportToCSV = () => {
-    const csvContent = [
-      ['Date', 'Duration', 'Alerts', 'Avg EAR', 'Status'],
-      ...sessions.map(session => [
-        session.date,
-        session.duration,
-        session.alerts,
-        session.avgEar,
-        session.status
-      ])
-    ].map(row => row.join(',')).join('\n')
+  const [exportKind, setExportKind] = useState('alerts')
+  const [exportDays, setExportDays] = useState(7)
 
-    const blob = new Blob([csvContent], { type: 'text/csv' })
-    const url = URL.createObjectURL(blob)
+  // The server streams the export from its history store; the browser
+  // saves it straight to disk (and can resume it) instead of building it
+  // in memory. A fixed end a few seconds back, which the server has
+  // finished writing, keeps the URL, and so a resumed download, on the
+  // same data.
+  const downloadExport = (format) => {
+    const now = Math.floor(Date.now() / 1000) - 5
+    const params = new URLSearchParams({ kind: exportKind, format, end: now })
+    if (exportDays) {
+      params.set('start', now - exportDays * 86400)
+    }
     const a = document.createElement('a')
-    a.href = url
-    a.download = `blinksense-sessions-${new Date().toISOString().split('T')[0]}.csv`
+    // Served by the Flask dashboard (drowsiness_web_app.py), not the :8000 API
+    a.href = `http://localhost:5000/api/history/export?${params}`
     document.body.appendChild(a)
     a.click()
     document.body.removeChild(a)
-    URL.revokeObjectURL(url)
   }
 
   const getStatusColor = (status) => {
@@ -91,20 +67,45 @@ const Storage = () => {
       <div className="flex justify-between items-center mb-8">
         <h1 className="text-3xl font-bold text-gray-800">Data Storage</h1>
         <div className="flex space-x-4">
+          <select
+            value={exportKind}
+            onChange={(e) => setExportKind(e.target.value)}
+            className="px-3 py-2 border border-gray-300 rounded-lg"
+          >
+            <option value="alerts">Alerts</option>
+            <option value="telemetry">Telemetry</option>
+          </select>
+          <select
+            value={exportDays}
+            onChange={(e) => setExportDays(Number(e.target.value))}
+            className="px-3 py-2 border border-gray-300 rounded-lg"
+          >
+            <option value={1}>Last 24 hours</option>
+            <option value={7}>Last 7 days</option>
+            <option value={30}>Last 30 days</option>
+            <option value={0}>All history</option>
+          </select>
           <button
-            onClick={exportToJSON}
+            onClick={() => downloadExport('jsonl')}
             className="flex items-center space-x-2 px-4 py-2 bg-blue-500 text-white rounded-lg hover:bg-blue-600 transition-colors"
           >
             <Download size={16} />
             <span>Export JSON</span>
           </button>
           <button
-            onClick={exportToCSV}
+            onClick={() => downloadExport('csv')}
             className="flex items-center space-x-2 px-4 py-2 bg-green-500 text-white rounded-lg hover:bg-green-600 transition-colors"
           >
             <FileText size={16} />
             <span>Export CSV</span>
           </button>
+          <button
+            onClick={() => downloadExport('parquet')}
+            className="flex items-center space-x-2 px-4 py-2 bg-purple-500 text-white rounded-lg hover:bg-purple-600 transition-colors"
+          >
+            <FileText size={16} />
+            <span>Export Parquet</span>
+          </button>
         </div>
       </div>
 
@@ -0,0 +1,94 @@
+class InferenceScheduler:
+    def __init__(self, ear_thresh=0.25, max_interval=4, alert_band=0.35,
+                 slope_thresh=0.004, ema_alpha=0.4):
+        """
+        Decide per frame whether landmark inference has to run
+
+        While EAR is high and stable the interval between inference frames
+        grows by one frame per stable inference up to max_interval. It drops
+        straight back to 1 (every frame) when EAR falls into the band above
+        the threshold, when the smoothed EAR trend turns downward, or while
+        the detector's closed-eye counter/timer is running.
+
+        Worst-case alert latency: a closure that starts right after an
+        inference frame is seen at most max_interval - 1 frames late, and
+        from then on every frame is inferred, so an alert needing N
+        consecutive closed frames fires within N + max_interval - 1 frames
+        (see latency_bound). With the defaults that is 3 extra frames, about
+        100 ms at 30 FPS.
+
+        Args:
+            ear_thresh: Detector EAR threshold
+            max_interval: Longest gap in frames between inference frames
+            alert_band: Fraction above ear_thresh treated as "falling toward it"
+            slope_thresh: Per-inference EAR drop (smoothed) that counts as a trend
+            ema_alpha: Smoothing factor for the EAR trend
+        """
+        self.ear_thresh = ear_thresh
+        self.max_interval = max(1, int(max_interval))
+        self.alert_band = alert_band
+        self.slope_thresh = slope_thresh
+        self.ema_alpha = ema_alpha
+
+        self.interval = 1
+        self.frames_since = 0
+        self.ear_ema = None
+        self.slope = 0.0
+
+        # Stats
+        self.inferred = 0
+        self.skipped = 0
+
+    def latency_bound(self, consec_frames):
+        """Worst-case frames from eye closure to alert for a consec_frames rule"""
+        return consec_frames + self.max_interval - 1
+
+    def should_run(self, closing=False):
+        """
+        Args:
+            closing: True while the detector's closed-eye counter/timer runs
+        Returns:
+            True if this frame needs inference
+        """
+        self.frames_since += 1
+        if closing:
+            self.interval = 1
+        if self.interval <= 1 or self.frames_since >= self.interval:
+            self.frames_since = 0
+            self.inferred += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def update(self, ear):
+        """Feed the EAR from an inference frame (0.0 or None when no face was found)"""
+        if not ear:
+            self.ear_ema = None
+            self.slope = 0.0
+            self.interval = 1
+            return
+
+        if self.ear_ema is None:
+            self.ear_ema = ear
+        else:
+            previous = self.ear_ema
+            self.ear_ema += self.ema_alpha * (ear - self.ear_ema)
+            self.slope += self.ema_alpha * ((self.ear_ema - previous) - self.slope)
+
+        near_threshold = ear < self.ear_thresh * (1.0 + self.alert_band)
+        falling = self.slope < -self.slope_thresh
+        if near_threshold or falling:
+            # Ramp up immediately
+            self.interval = 1
+        else:
+            # Back off one frame at a time
+            self.interval = min(self.max_interval, self.interval + 1)
+
+    def stats(self):
+        total = self.inferred + self.skipped
+        return {
+            'interval': self.interval,
+            'inferred_frames': self.inferred,
+            'skipped_frames': self.skipped,
+            'inference_ratio': self.inferred / total if total else 1.0,
+        }
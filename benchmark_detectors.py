@@ -0,0 +1,108 @@
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from frame_buffer import DISPLAY_SIZE
+
+
+def load_frames(video, count):
+    """Frames from a video file, or noise frames when no video is given"""
+    frames = []
+    if video:
+        cap = cv2.VideoCapture(video)
+        while len(frames) < count:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(cv2.resize(frame, DISPLAY_SIZE))
+        cap.release()
+    if not frames:
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 255, (DISPLAY_SIZE[1], DISPLAY_SIZE[0], 3), dtype=np.uint8)
+                  for _ in range(count)]
+    return frames
+
+
+def make_detector(name, args):
+    if name == "mediapipe":
+        from drowsiness_detector_mediapipe import DrowsinessDetectorMediaPipe
+        return DrowsinessDetectorMediaPipe(alarm_path=None)
+    if name == "dlib":
+        from drowsiness_detector import DrowsinessDetector
+        return DrowsinessDetector(alarm_path=None)
+    if name == "cnn":
+        from eye_state_detector import EyeStateDetector
+        return EyeStateDetector(args.eye_model, backend=args.cnn_backend, threads=args.threads)
+    if name == "improved":
+        from improved_detector import ImprovedDrowsinessDetector
+        return ImprovedDrowsinessDetector()
+    if name == "simple":
+        from simple_detector import SimpleDrowsinessDetector
+        return SimpleDrowsinessDetector()
+    raise ValueError(name)
+
+
+def bench_detector(detector, frames, warmup=5):
+    """Median and 95th percentile milliseconds per detect_drowsiness call"""
+    for frame in frames[:warmup]:
+        detector.detect_drowsiness(frame.copy())
+    times = []
+    for frame in frames:
+        frame = frame.copy()
+        start = time.perf_counter()
+        detector.detect_drowsiness(frame)
+        times.append((time.perf_counter() - start) * 1000)
+    return np.median(times), np.percentile(times, 95)
+
+
+def bench_classifier(args, runs=2000):
+    """Microseconds per two-eye batch through the eye-state classifier alone"""
+    from eye_state_classifier import EyeStateClassifier
+    classifier = EyeStateClassifier(args.eye_model, threads=args.threads, backend=args.cnn_backend)
+    crops = [np.random.randint(0, 255, (30, 40), dtype=np.uint8) for _ in range(2)]
+    for _ in range(50):
+        classifier.closed_probability(crops)
+    start = time.perf_counter()
+    for _ in range(runs):
+        classifier.closed_probability(crops)
+    return (time.perf_counter() - start) / runs * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description="CPU benchmark of the drowsiness detector backends")
+    ap.add_argument("-v", "--video", type=str, default=None, help="Video with a face (noise frames if omitted)")
+    ap.add_argument("-n", "--frames", type=int, default=200, help="Frames per backend")
+    ap.add_argument("-b", "--backends", type=str, default="mediapipe,dlib,cnn,improved,simple",
+                    help="Comma-separated backends")
+    ap.add_argument("--eye-model", type=str, default=None, help="ONNX eye-state model")
+    ap.add_argument("--cnn-backend", type=str, default="auto", choices=["auto", "onnxruntime", "opencv"])
+    ap.add_argument("--threads", type=int, default=1, help="Classifier and OpenCV threads")
+    args = ap.parse_args()
+
+    if args.eye_model is None:
+        from eye_state_classifier import EYE_MODEL_PATH
+        args.eye_model = EYE_MODEL_PATH
+    cv2.setNumThreads(args.threads)
+    frames = load_frames(args.video, args.frames)
+    print(f"[INFO] {len(frames)} frames at {DISPLAY_SIZE[0]}x{DISPLAY_SIZE[1]}, {args.threads} thread(s)")
+
+    for name in args.backends.split(","):
+        try:
+            detector = make_detector(name.strip(), args)
+        except Exception as e:
+            print(f"{name:>10}: skipped ({e})")
+            continue
+        median, p95 = bench_detector(detector, frames)
+        print(f"{name:>10}: {median:7.2f} ms median, {p95:7.2f} ms p95 per frame")
+
+    if "cnn" in args.backends:
+        try:
+            print(f"{'classifier':>10}: {bench_classifier(args):7.1f} us per two-eye batch")
+        except Exception as e:
+            print(f"{'classifier':>10}: skipped ({e})")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,13 @@ import cv2
 import numpy as np
 from flask import Flask, Response, render_template_string
 import time
+from face_detector_dnn import create_face_detector
 
 app = Flask(__name__)
 
 class EyeDetector:
     def __init__(self):
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.face_cascade = create_face_detector()
         self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
         self.closed_start = None
         self.is_drowsy = False
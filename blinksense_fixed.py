@@ -1,14 +1,17 @@
 import cv2
 import numpy as np
-from flask import Flask, Response, render_template_string, jsonify
+from flask import Flask, Response, jsonify
 import time
 import threading
+from face_detector_dnn import create_face_detector
+from static_assets import compile_page, register_static
 
 app = Flask(__name__)
+register_static(app)
 
 class EyeDetector:
     def __init__(self):
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.face_cascade = create_face_detector()
         self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
         self.closed_start = None
         self.is_drowsy = False
@@ -75,9 +78,7 @@ def generate_frames():
         yield (b'--frame\r\n'
                b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
 
-@app.route('/')
-def index():
-    return render_template_string('''
+INDEX_PAGE = compile_page(app, '''
 <!DOCTYPE html>
 <html>
 <head>
@@ -289,6 +290,10 @@ def index():
 </html>
     ''')
 
+@app.route('/')
+def index():
+    return INDEX_PAGE.response()
+
 @app.route('/video_feed')
 def video_feed():
     return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
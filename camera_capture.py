@@ -0,0 +1,283 @@
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from frame_buffer import negotiate_resolution
+
+
+def fourcc_to_str(value):
+    """Decode a CAP_PROP_FOURCC value into its four-character code"""
+    value = int(value)
+    return "".join(chr((value >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00")
+
+
+def default_backends():
+    """Capture backends to try, most specific first"""
+    if sys.platform.startswith("linux"):
+        return [cv2.CAP_V4L2, cv2.CAP_ANY]
+    if sys.platform.startswith("win"):
+        return [cv2.CAP_ANY, cv2.CAP_DSHOW]
+    return [cv2.CAP_ANY]
+
+
+class CaptureService:
+    def __init__(self, source=0, width=640, height=480, fps=30,
+                 formats=("MJPG", "YUYV"), backends=None,
+                 max_failures=5, max_backoff=5.0,
+                 cap=None, resolver=None, on_open=None):
+        """
+        Camera reader that always hands out the newest frame
+
+        A background thread keeps grabbing so the driver queue never holds
+        stale frames, and reopens the device with exponential backoff when
+        reads fail. Video files are read synchronously instead, since every
+        frame of a recording matters and there is nothing to reconnect to.
+
+        Args:
+            source: Camera index or path to a video file
+            width: Requested frame width
+            height: Requested frame height
+            fps: Requested frame rate
+            formats: Pixel formats to negotiate, in order of preference
+            backends: cv2 capture backends to try (defaults per platform)
+            max_failures: Consecutive read failures before reconnecting
+            max_backoff: Upper bound in seconds between reconnect attempts
+            cap: Already-open cv2.VideoCapture for source (e.g. from a probe)
+            resolver: Callable returning a replacement camera index when
+                reconnecting keeps failing, or None
+            on_open: Callable invoked with the service after each open
+        """
+        self.source = source
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.formats = formats
+        self.backends = backends or default_backends()
+        self.max_failures = max_failures
+        self.max_backoff = max_backoff
+        self.live = isinstance(source, int) or str(source).isdigit()
+        self.resolver = resolver
+        self.on_open = on_open
+
+        self._preopened = cap
+        self.cap = None
+        self.format = None
+        self.resolution = None
+        self.running = False
+        self._thread = None
+
+        # Latest frame, swapped with the grab thread's back buffer under the lock
+        self._cond = threading.Condition()
+        self._front = None
+        self._back = None
+        self._seq = 0
+        self._timestamp = 0.0
+        self._local = threading.local()
+
+        # Stats
+        self.frames_grabbed = 0
+        self.frames_delivered = 0
+        self.reconnects = 0
+        self.read_failures = 0
+        self._fps_window_start = time.time()
+        self._fps_window_frames = 0
+        self.delivered_fps = 0.0
+
+    def _open(self):
+        """Open the device and negotiate buffer size, pixel format, size and FPS"""
+        source = int(self.source) if self.live else self.source
+        for backend in self.backends if self.live else [cv2.CAP_ANY]:
+            if self._preopened is not None:
+                cap, self._preopened = self._preopened, None
+            else:
+                cap = cv2.VideoCapture(source, backend)
+            if not cap.isOpened():
+                cap.release()
+                continue
+
+            if self.live:
+                # Keep a single frame queued in the driver
+                cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+                for fmt in self.formats:
+                    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fmt))
+                    if fourcc_to_str(cap.get(cv2.CAP_PROP_FOURCC)) == fmt:
+                        break
+                self.format = fourcc_to_str(cap.get(cv2.CAP_PROP_FOURCC))
+                self.resolution = negotiate_resolution(cap, self.width, self.height, self.fps)
+
+            self.cap = cap
+            print(f"[INFO] Camera {self.source} opened ({self.format or 'file'}, "
+                  f"{self.resolution or 'native'})")
+            if self.on_open:
+                self.on_open(self)
+            return True
+        return False
+
+    def start(self, timeout=2.0):
+        """Open the source and, for cameras, start the grab thread"""
+        if self.running:
+            return self
+        if not self._open() and not self.live:
+            print(f"[ERROR] Could not open video source {self.source}")
+            return self
+        self.running = True
+        if self.live:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+            with self._cond:
+                self._cond.wait_for(lambda: self._seq > 0, timeout)
+        return self
+
+    def _reconnect(self):
+        backoff = 0.25
+        attempts = 0
+        while self.running:
+            if self.cap is not None:
+                self.cap.release()
+                self.cap = None
+            print(f"[INFO] Reconnecting to camera {self.source}...")
+            if self._open():
+                self.reconnects += 1
+                return True
+            attempts += 1
+            if self.resolver and attempts % 3 == 0:
+                # The device may have come back under another index
+                replacement = self.resolver()
+                if replacement is not None and replacement != self.source:
+                    print(f"[INFO] Switching from camera {self.source} to {replacement}")
+                    self.source = replacement
+            time.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+        return False
+
+    def _run(self):
+        failures = 0
+        while self.running:
+            if self.cap is None and not self._reconnect():
+                break
+
+            ok, frame = self.cap.grab(), None
+            if ok:
+                if self._back is not None:
+                    ok, frame = self.cap.retrieve(self._back)
+                else:
+                    ok, frame = self.cap.retrieve()
+            if not ok or frame is None:
+                self.read_failures += 1
+                failures += 1
+                if failures >= self.max_failures:
+                    failures = 0
+                    self.cap.release()
+                    self.cap = None
+                continue
+            failures = 0
+
+            now = time.time()
+            with self._cond:
+                self._back, self._front = self._front, frame
+                self._seq += 1
+                self._timestamp = now
+                self.frames_grabbed += 1
+                self._cond.notify_all()
+
+            self._fps_window_frames += 1
+            elapsed = now - self._fps_window_start
+            if elapsed >= 1.0:
+                self.delivered_fps = self._fps_window_frames / elapsed
+                self._fps_window_start = now
+                self._fps_window_frames = 0
+
+    def read(self, image=None, timeout=1.0):
+        """
+        Return the newest frame not yet seen by the calling thread
+        Args:
+            image: Optional array to copy into (reused when shape matches)
+            timeout: Seconds to wait for a new frame
+        Returns:
+            (success, frame) like cv2.VideoCapture.read
+        """
+        if not self.live:
+            if self.cap is None:
+                return False, None
+            return self.cap.read(image) if image is not None else self.cap.read()
+
+        last_seq = getattr(self._local, "seq", 0)
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > last_seq or not self.running, timeout):
+                return False, None
+            if self._front is None:
+                return False, None
+            if image is None or image.shape != self._front.shape or image.dtype != self._front.dtype:
+                image = np.empty_like(self._front)
+            np.copyto(image, self._front)
+            self._local.seq = self._seq
+            self.frames_delivered += 1
+        return True, image
+
+    def frame_age(self):
+        """Seconds since the newest frame was grabbed"""
+        return time.time() - self._timestamp if self._timestamp else None
+
+    def isOpened(self):
+        """True while a device is open (False during reconnects)"""
+        return self.running and self.cap is not None
+
+    def stats(self):
+        return {
+            'source': self.source,
+            'format': self.format,
+            'resolution': self.resolution,
+            'delivered_fps': round(self.delivered_fps, 1),
+            'frame_age_ms': round(self.frame_age() * 1000, 1) if self._timestamp else None,
+            'frames_grabbed': self.frames_grabbed,
+            'frames_delivered': self.frames_delivered,
+            'frames_dropped': max(0, self.frames_grabbed - self.frames_delivered),
+            'reconnects': self.reconnects,
+            'read_failures': self.read_failures,
+        }
+
+    def release(self):
+        """Stop the grab thread and close the device"""
+        self.running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    stop = release
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_capture(source=None, **kwargs):
+    """
+    Started CaptureService for source, shared by every caller in the process
+    Args:
+        source: Camera index or video path; None picks a camera via discovery
+    """
+    with _shared_lock:
+        service = _shared.get(source)
+        if service is None or not service.running:
+            if source is None:
+                from camera_discovery import open_camera
+                service = open_camera(**kwargs)
+            else:
+                service = CaptureService(source, **kwargs).start()
+            _shared[source] = service
+        return service
+
+
+def shared_capture_stats(source=None):
+    """Stats of the shared CaptureService for source, {} if none was opened"""
+    with _shared_lock:
+        service = _shared.get(source)
+    return service.stats() if service is not None else {}
@@ -0,0 +1,246 @@
+import glob
+import json
+import os
+import threading
+import time
+
+import cv2
+
+from camera_capture import CaptureService, default_backends
+from frame_buffer import DISPLAY_SIZE
+
+SYSFS_VIDEO = "/sys/class/video4linux"
+CACHE_PATH = os.environ.get(
+    "BLINKSENSE_CAMERA_CACHE",
+    os.path.join(os.path.expanduser("~"), ".blinksense", "camera_cache.json"))
+
+
+def _read_sysfs(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def enumerate_devices(max_index=3):
+    """
+    List capture devices without opening them
+    Args:
+        max_index: Number of indices to assume when sysfs is unavailable
+    Returns:
+        List of dicts with index, name and path, lowest index first
+    """
+    devices = []
+    for node in sorted(glob.glob(os.path.join(SYSFS_VIDEO, "video*"))):
+        name = os.path.basename(node)
+        # V4L2 exposes metadata nodes next to each capture node; only index 0 captures
+        if _read_sysfs(os.path.join(node, "index")) not in (None, "0"):
+            continue
+        devices.append({
+            'index': int(name[len("video"):]),
+            'name': _read_sysfs(os.path.join(node, "name")) or name,
+            'path': os.path.join("/dev", name),
+        })
+
+    if not devices and not os.path.isdir(SYSFS_VIDEO):
+        devices = [{'index': i, 'name': f"camera {i}", 'path': None} for i in range(max_index)]
+    return sorted(devices, key=lambda d: d['index'])
+
+
+def probe_device(device, backend=None):
+    """Open a device and read one frame; returns the open capture or None"""
+    cap = cv2.VideoCapture(device['index'], backend if backend is not None else default_backends()[0])
+    if cap.isOpened():
+        ret, frame = cap.read()
+        if ret and frame is not None:
+            return cap
+    cap.release()
+    return None
+
+
+class CameraDiscovery:
+    def __init__(self, cache_path=CACHE_PATH, timeout=1.5):
+        """
+        Find a working camera quickly
+
+        The last good device and its negotiated format are cached on disk and
+        trusted as long as the same device is still present, so a normal cold
+        start opens the camera once without probing. Otherwise all devices
+        are probed in parallel and the lowest working index wins.
+
+        Args:
+            cache_path: JSON file holding the last good device
+            timeout: Seconds to wait for parallel probes
+        """
+        self.cache_path = cache_path
+        self.timeout = timeout
+        self._reprobe_thread = None
+        self._lock = threading.Lock()
+
+    def load_cache(self):
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def remember_source(self, service):
+        """on_open hook for CaptureService: cache the device it just opened"""
+        for device in enumerate_devices():
+            if device['index'] == service.source:
+                resolution = list(service.resolution) if service.resolution else None
+                self.remember(device, service.format, resolution, service.fps)
+                return
+
+    def remember(self, device, format=None, resolution=None, fps=None):
+        """Persist a working device and the format it was opened with"""
+        entry = dict(device, format=format, resolution=resolution, fps=fps, timestamp=time.time())
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"[WARNING] Could not write camera cache: {e}")
+        return entry
+
+    def forget(self):
+        try:
+            os.remove(self.cache_path)
+        except OSError:
+            pass
+
+    def cached_device(self, devices=None):
+        """Cached device if it is still present under the same name"""
+        cached = self.load_cache()
+        if not cached:
+            return None
+        for device in devices if devices is not None else enumerate_devices():
+            if device['index'] == cached.get('index') and device['name'] == cached.get('name'):
+                return cached
+        return None
+
+    def probe_all(self, devices=None):
+        """
+        Probe every device in parallel
+        Returns:
+            (device, open capture) for the lowest working index, or (None, None)
+        """
+        devices = devices if devices is not None else enumerate_devices()
+        results = {}
+        finished = [False]
+        done = threading.Event()
+        lock = threading.Lock()
+
+        def decided():
+            # Done once every index below the first working one has reported
+            for device in devices:
+                if device['index'] not in results:
+                    return False
+                if results[device['index']] is not None:
+                    return True
+            return True
+
+        def worker(device):
+            cap = probe_device(device)
+            with lock:
+                if finished[0]:
+                    # Reported after the deadline; nobody will use it
+                    if cap is not None:
+                        cap.release()
+                    return
+                results[device['index']] = cap
+                if decided():
+                    done.set()
+
+        for device in devices:
+            threading.Thread(target=worker, args=(device,), daemon=True).start()
+        if devices:
+            done.wait(self.timeout)
+
+        best = None
+        with lock:
+            finished[0] = True
+            for device in devices:
+                cap = results.get(device['index'])
+                if cap is None:
+                    continue
+                if best is None:
+                    best = (device, cap)
+                else:
+                    cap.release()
+        return best or (None, None)
+
+    def find_camera(self, use_cache=True):
+        """
+        Returns:
+            (device, capture) where capture is an already-open cv2.VideoCapture
+            when probing was needed, or None when the cached device is trusted
+        """
+        devices = enumerate_devices()
+        if use_cache:
+            cached = self.cached_device(devices)
+            if cached:
+                return cached, None
+
+        device, cap = self.probe_all(devices)
+        if device is not None:
+            self.remember(device)
+        return device, cap
+
+    def reprobe_async(self, callback=None):
+        """Re-probe in the background after a failure, updating the cache"""
+        with self._lock:
+            if self._reprobe_thread is not None and self._reprobe_thread.is_alive():
+                return
+
+            def run():
+                self.forget()
+                device, cap = self.probe_all()
+                if cap is not None:
+                    cap.release()
+                if device is not None:
+                    self.remember(device)
+                    print(f"[INFO] Re-probe found camera {device['index']} ({device['name']})")
+                if callback:
+                    callback(device)
+
+            self._reprobe_thread = threading.Thread(target=run, daemon=True)
+            self._reprobe_thread.start()
+
+    def resolve(self):
+        """Non-blocking source resolver for CaptureService reconnects"""
+        cached = self.load_cache()
+        self.reprobe_async()
+        return cached['index'] if cached else None
+
+
+discovery = CameraDiscovery()
+
+
+def open_camera(width=DISPLAY_SIZE[0], height=DISPLAY_SIZE[1], fps=30, use_cache=True):
+    """
+    Discover a camera and return a started CaptureService for it
+    Args:
+        width: Requested frame width
+        height: Requested frame height
+        fps: Requested frame rate
+        use_cache: Trust the cached device instead of probing
+    """
+    device, cap = discovery.find_camera(use_cache)
+    if device is None:
+        print("[WARNING] No working camera found, falling back to index 0")
+        device = {'index': 0}
+
+    formats = ["MJPG", "YUYV"]
+    if device.get('format') in formats:
+        # Try the format that worked last time first
+        formats.remove(device['format'])
+        formats.insert(0, device['format'])
+
+    service = CaptureService(device['index'], width, height, fps, formats=tuple(formats),
+                             cap=cap, resolver=discovery.resolve,
+                             on_open=discovery.remember_source)
+    return service.start()
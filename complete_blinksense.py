@@ -1,19 +1,24 @@
 import cv2
-from flask import Flask, Response, render_template_string, jsonify
+from flask import Flask, Response
 import time
 import json
 from datetime import datetime
+from shared_frames import frame_source
+from face_detector_dnn import create_face_detector
+from static_assets import compile_page, register_static
+from telemetry_store import TelemetryLog, telemetry_response
 
 app = Flask(__name__)
+register_static(app)
 
 class EyeDetector:
     def __init__(self):
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.face_cascade = create_face_detector()
         self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
         self.closed_start = None
         self.is_drowsy = False
-        self.alerts = []
-        self.detection_data = []
+        self.alerts = TelemetryLog(50)
+        self.detection_data = TelemetryLog(50)
         self.sensitivity = 100
         
     def detect_drowsiness(self, frame):
@@ -54,9 +59,6 @@ class EyeDetector:
             'eyes_open': eyes_open
         })
         
-        if len(self.detection_data) > 50:
-            self.detection_data.pop(0)
-        
         if self.is_drowsy:
             cv2.putText(frame, "DROWSY! WAKE UP!", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3)
         
@@ -65,18 +67,18 @@ class EyeDetector:
 detector = EyeDetector()
 
 def generate_frames():
-    camera = cv2.VideoCapture(0)
-    while True:
+    camera = frame_source()
+    while camera.running:
         success, frame = camera.read()
         if not success:
-            break
+            continue
         frame = detector.detect_drowsiness(frame)
         ret, buffer = cv2.imencode('.jpg', frame)
         yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
 
 @app.route('/')
 def home():
-    return render_template_string(HTML_TEMPLATE)
+    return INDEX_PAGE.response()
 
 @app.route('/video_feed')
 def video_feed():
@@ -84,11 +86,11 @@ def video_feed():
 
 @app.route('/api/alerts')
 def get_alerts():
-    return jsonify(detector.alerts)
+    return telemetry_response(detector.alerts)
 
 @app.route('/api/data')
 def get_data():
-    return jsonify(detector.detection_data)
+    return telemetry_response(detector.detection_data)
 
 HTML_TEMPLATE = '''
 <!DOCTYPE html>
@@ -407,10 +409,18 @@ HTML_TEMPLATE = '''
             });
         }
         
+        let alertCursor = 0;
+        let alertEpoch = '';
+        let alertHistory = [];
+        
         function updateAlerts() {
-            fetch('/api/alerts')
+            fetch(`/api/alerts?since=${alertCursor}&epoch=${alertEpoch}`)
                 .then(response => response.json())
-                .then(alerts => {
+                .then(update => {
+                    alertHistory = (update.reset ? update.entries : alertHistory.concat(update.entries)).slice(-50);
+                    alertCursor = update.seq;
+                    alertEpoch = update.epoch;
+                    const alerts = alertHistory;
                     const alertsList = document.getElementById('alertsList');
                     if (alerts.length === 0) {
                         alertsList.innerHTML = '<div class="alert-item"><strong>No alerts yet</strong><br>System is monitoring...</div>';
@@ -441,6 +451,8 @@ HTML_TEMPLATE = '''
 </html>
 '''
 
+INDEX_PAGE = compile_page(app, HTML_TEMPLATE)
+
 if __name__ == '__main__':
     print("Starting BlinkSense with all pages...")
     app.run(host='127.0.0.1', port=5000, debug=False)
\ No newline at end of file
@@ -2,18 +2,34 @@ import cv2
 import dlib
 import numpy as np
 from imutils import face_utils
-from imutils.video import VideoStream
 from threading import Thread
 import playsound
 import time
 from .utils import eye_aspect_ratio, draw_eye_landmarks, display_info
+from .frame_buffer import FrameBufferPool, AnalysisFrame, DISPLAY_SIZE
+from .shared_frames import open_source
+from .tiered_detection import TieredEyeState
+from .adaptive_sampling import InferenceScheduler
+from .motion_gate import ChangeGate
+from .vehicle_state import vehicle_gate
+from .face_signals import FaceSignals, draw_signals
+from .fatigue_score import FatigueScorer, draw_fatigue
+from .smoothing import FaceTracks
+from .landmark_models import select_predictor, EYE_PREDICTOR_PATH
+from .face_detector_dnn import load_eye_cascade
 
 class DrowsinessDetector:
     def __init__(self, 
                  shape_predictor_path="data/models/shape_predictor_68_face_landmarks.dat",
                  alarm_path="data/sounds/alarm.wav",
                  ear_thresh=0.25,
-                 ear_consec_frames=20):
+                 ear_consec_frames=20,
+                 tiered=False,
+                 adaptive=False,
+                 change_gate=False,
+                 vehicle_source=None,
+                 smoothing=False,
+                 eye_predictor_path=EYE_PREDICTOR_PATH):
         """
         Initialize the Drowsiness Detector
         
@@ -22,6 +38,21 @@ class DrowsinessDetector:
             alarm_path: Path to alarm sound file
             ear_thresh: Eye aspect ratio threshold for closed eyes
             ear_consec_frames: Number of consecutive frames for drowsiness alert
+            tiered: Skip face detection and landmarks on frames a cheap
+                eye-region check decides are clearly open
+            adaptive: Run landmarks less often while EAR is high and stable
+                (see InferenceScheduler for the alert-latency bound)
+            change_gate: Reuse the last result while the whole scene is
+                unchanged (parked vehicle, static footage)
+            vehicle_source: NMEA, candump or CSV speed feed (default
+                BLINKSENSE_VEHICLE_SOURCE); detection and alarms pause while
+                the vehicle is parked
+            smoothing: One-euro filter the landmarks and Kalman filter EAR,
+                predicting EAR on frames that skip landmarks
+            eye_predictor_path: Compact 12-point eye-only model, used instead
+                of shape_predictor_path when the file exists (default
+                BLINKSENSE_EYE_PREDICTOR); mouth and head-pose signals are
+                then unavailable
         """
         self.shape_predictor_path = shape_predictor_path
         self.alarm_path = alarm_path
@@ -34,11 +65,36 @@ class DrowsinessDetector:
         
         # Initialize dlib's face detector and facial landmark predictor
         self.detector = dlib.get_frontal_face_detector()
-        self.predictor = dlib.shape_predictor(self.shape_predictor_path)
+        # (loaded once per process and shared between detectors)
+        self.predictor, idxs, self.full_landmarks = select_predictor(
+            self.shape_predictor_path, eye_predictor_path)
         
         # Get facial landmarks indexes for left and right eye
-        (self.lStart, self.lEnd) = face_utils.FACIAL_LANDMARKS_IDXS["left_eye"]
-        (self.rStart, self.rEnd) = face_utils.FACIAL_LANDMARKS_IDXS["right_eye"]
+        (self.lStart, self.lEnd) = idxs["left_eye"]
+        (self.rStart, self.rEnd) = idxs["right_eye"]
+        
+        # Reused resize/grayscale buffers; detection runs on a downscaled copy
+        self.buffers = FrameBufferPool(*DISPLAY_SIZE)
+        self.analysis = AnalysisFrame(self.buffers)
+        
+        # Optional cheap first stage in front of the dlib detector/predictor
+        self.tiered = None
+        if tiered:
+            eye_cascade = load_eye_cascade()
+            self.tiered = TieredEyeState(ear_thresh, eye_cascade=eye_cascade)
+        self.last_eyes = []
+        
+        # Optional trend-driven inference rate
+        self.sampler = InferenceScheduler(ear_thresh) if adaptive else None
+        self.last_ear = 0.0
+        self.change_gate = ChangeGate() if change_gate else None
+        self.vehicle = vehicle_gate(vehicle_source)
+        
+        # Yawn and head pose from the same 68 landmarks
+        self.signals = FaceSignals()
+        self.last_signals = {}
+        self.fatigue = FatigueScorer()
+        self.smoother = FaceTracks() if smoothing else None
         
         print("[INFO] Drowsiness detector initialized successfully!")
     
@@ -49,6 +105,29 @@ class DrowsinessDetector:
         except Exception as e:
             print(f"[ERROR] Could not play alarm: {e}")
     
+    def update_counter(self, ear, alarms=True):
+        """
+        Threshold/COUNTER decision for one frame's EAR, measured or predicted
+        Returns:
+            True when this frame raises the alarm
+        """
+        if ear >= self.EYE_AR_THRESH:
+            # Reset counter and alarm if eyes are open
+            self.COUNTER = 0
+            self.ALARM_ON = False
+            return False
+        self.COUNTER += 1
+        # Check if eyes have been closed for sufficient time
+        if self.COUNTER < self.EYE_AR_CONSEC_FRAMES or not alarms or self.ALARM_ON:
+            return False
+        self.ALARM_ON = True
+        # Start alarm in separate thread
+        if self.alarm_path:
+            alarm_thread = Thread(target=self.sound_alarm)
+            alarm_thread.daemon = True
+            alarm_thread.start()
+        return True
+
     def detect_drowsiness(self, frame):
         """
         Process a single frame for drowsiness detection
@@ -61,20 +140,66 @@ class DrowsinessDetector:
             ear: Current eye aspect ratio
             is_drowsy: Boolean indicating drowsiness state
         """
-        # Convert frame to grayscale
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        alarms = True
+        if self.vehicle is not None:
+            detect, alarms = self.vehicle.should_detect()
+            if not detect:
+                # Parked: no inference, no alarm
+                self.COUNTER = 0
+                self.ALARM_ON = False
+                cv2.putText(frame, "PARKED - DETECTION PAUSED", (10, 30),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+                return frame, 0.0, False
         
-        # Detect faces in the grayscale frame
-        rects = self.detector(gray, 0)
+        # Downscaled grayscale copy for face and landmark detection
+        gray = self.analysis.prepare(frame)
         
         ear = 0.0
         is_drowsy = False
+        rects = []
+        inferred = False
+        eye_boxes = []
+        
+        closing = self.COUNTER > 0
+        # The sampler goes last: should_run() counts the frame as inferred
+        # and restarts its interval, so it must only see frames that do run
+        if ((self.change_gate is not None and not self.change_gate.changed(gray, closing)) or
+                (self.tiered is not None and not self.tiered.needs_landmarks(gray, closing)) or
+                (self.sampler is not None and not self.sampler.should_run(closing))):
+            # Scene unchanged or eyes open and stable: reuse the last landmark result
+            ear = self.last_ear
+            if self.smoother is not None:
+                # Extrapolate EAR between landmark passes
+                predicted = self.smoother.predict()
+                ear = self.last_ear if predicted is None else predicted
+            for eye in self.last_eyes:
+                draw_eye_landmarks(frame, eye)
+            if self.last_eyes:
+                # Same decision on the reused/predicted EAR as on inferred frames
+                is_drowsy = self.update_counter(ear, alarms)
+        else:
+            inferred = True
+            # Detect faces in the grayscale frame
+            rects = self.detector(gray, 0)
+            self.last_eyes = []
+            if len(rects) == 0:
+                self.signals.reset()
+                if self.smoother is not None:
+                    self.smoother.reset()
+                self.last_signals = {}
+                if self.tiered is not None:
+                    self.tiered.reset()
+        
+        filters = [None] * len(rects)
+        if self.smoother is not None and inferred:
+            filters = self.smoother.assign([(r.left(), r.top(), r.width(), r.height()) for r in rects])
         
         # Process each detected face
-        for rect in rects:
+        for rect, face_filter in zip(rects, filters):
             # Get facial landmarks
             shape = self.predictor(gray, rect)
-            shape = face_utils.shape_to_np(shape)
+            points = face_utils.shape_to_np(shape)
+            shape = self.analysis.points_to_display(points)
             
             # Extract left and right eye coordinates
             leftEye = shape[self.lStart:self.lEnd]
@@ -87,35 +212,55 @@ class DrowsinessDetector:
             # Average the eye aspect ratio for both eyes
             ear = (leftEAR + rightEAR) / 2.0
             
+            if face_filter is not None:
+                # Decide and draw on this face's filtered landmarks and EAR
+                points, ear = face_filter.update(points, ear)
+                shape = self.analysis.points_to_display(points)
+                leftEye = shape[self.lStart:self.lEnd]
+                rightEye = shape[self.rStart:self.rEnd]
+            
+            if self.tiered is not None:
+                self.tiered.update(gray, [points[self.lStart:self.lEnd], points[self.rStart:self.rEnd]], ear)
+            self.last_eyes = [leftEye, rightEye]
+            eye_boxes += [cv2.boundingRect(points[s:e].astype(np.int32))
+                          for s, e in ((self.lStart, self.lEnd), (self.rStart, self.rEnd))]
+            if self.full_landmarks:
+                self.last_signals = self.signals.from_dlib(points, gray.shape[1], gray.shape[0])
+            
             # Draw eye landmarks
             draw_eye_landmarks(frame, leftEye)
             draw_eye_landmarks(frame, rightEye)
             
             # Check if EAR is below threshold
-            if ear < self.EYE_AR_THRESH:
-                self.COUNTER += 1
-                
-                # Check if eyes have been closed for sufficient time
-                if self.COUNTER >= self.EYE_AR_CONSEC_FRAMES:
-                    if not self.ALARM_ON:
-                        self.ALARM_ON = True
-                        is_drowsy = True
-                        
-                        # Start alarm in separate thread
-                        if self.alarm_path:
-                            alarm_thread = Thread(target=self.sound_alarm)
-                            alarm_thread.daemon = True
-                            alarm_thread.start()
-            else:
-                # Reset counter and alarm if eyes are open
-                self.COUNTER = 0
-                self.ALARM_ON = False
+            is_drowsy = self.update_counter(ear, alarms) or is_drowsy
+        
+        if inferred:
+            self.last_ear = ear
+            if self.change_gate is not None:
+                # Eye regions are compared separately so a closing eye is never skipped
+                self.change_gate.track_regions(gray, eye_boxes)
+            if self.sampler is not None:
+                self.sampler.update(ear)
+        
+        # Fatigue score from EAR plus yawns/nods (EAR is 0.0 when no face was found)
+        self.fatigue.update(ear < self.EYE_AR_THRESH if ear else None, self.last_signals)
         
         # Display information on frame
         display_info(frame, ear, self.COUNTER, self.ALARM_ON)
+        draw_signals(frame, self.last_signals)
+        draw_fatigue(frame, self.fatigue.score, self.fatigue.severity)
         
         return frame, ear, is_drowsy
     
+    def perf_stats(self):
+        """Allocation and frame-skipping counters"""
+        stats = {'buffers': self.buffers.stats()}
+        for name, gate in (('change_gate', self.change_gate), ('adaptive', self.sampler), ('tiered', self.tiered),
+                           ('vehicle', self.vehicle)):
+            if gate is not None:
+                stats[name] = gate.stats()
+        return stats
+    
     def run_detection(self, source=0):
         """
         Run real-time drowsiness detection
@@ -124,18 +269,19 @@ class DrowsinessDetector:
             source: Video source (0 for webcam, or path to video file)
         """
         print("[INFO] Starting video stream...")
-        vs = VideoStream(src=source).start()
-        time.sleep(2.0)  # Allow camera to warm up
+        vs = open_source(source, width=self.buffers.width, height=self.buffers.height)
         
         try:
             while True:
-                # Read frame from video stream
-                frame = vs.read()
-                if frame is None:
+                # Read the newest frame from the video stream
+                ret, frame = self.buffers.read(vs)
+                if not ret:
+                    if vs.live:
+                        continue
                     break
                 
-                # Resize frame for better performance
-                frame = cv2.resize(frame, (640, 480))
+                # Resize into a reused buffer (no-op when already at display size)
+                frame = self.buffers.resize(frame)
                 
                 # Process frame for drowsiness detection
                 processed_frame, ear, is_drowsy = self.detect_drowsiness(frame)
@@ -158,5 +304,6 @@ class DrowsinessDetector:
         finally:
             # Cleanup
             cv2.destroyAllWindows()
-            vs.stop()
+            vs.release()
+            print(f"[INFO] Perf stats: {self.perf_stats()}")
             print("[INFO] Cleanup completed")
@@ -1,9 +1,18 @@
 import cv2
 import mediapipe as mp
 import numpy as np
-from imutils.video import VideoStream
 from threading import Thread
 import time
+from frame_buffer import FrameBufferPool, AnalysisFrame, DISPLAY_SIZE
+from shared_frames import open_source
+from tiered_detection import TieredEyeState
+from adaptive_sampling import InferenceScheduler
+from motion_gate import ChangeGate
+from vehicle_state import vehicle_gate
+from face_signals import FaceSignals, draw_signals
+from fatigue_score import FatigueScorer, draw_fatigue
+from smoothing import FaceTracks
+from face_detector_dnn import load_eye_cascade
 try:
     import playsound
 except ImportError:
@@ -14,9 +23,25 @@ class DrowsinessDetectorMediaPipe:
     def __init__(self, 
                  alarm_path="data/sounds/alarm.wav",
                  ear_thresh=0.25,
-                 ear_consec_frames=20):
+                 ear_consec_frames=20,
+                 tiered=False,
+                 adaptive=False,
+                 change_gate=False,
+                 vehicle_source=None,
+                 smoothing=False):
         """
         Initialize the Drowsiness Detector using MediaPipe
+        
+        With tiered=True a cheap eye-region check decides clearly-open frames
+        and FaceMesh only runs when that check is unsure or eyes are closing.
+        With adaptive=True FaceMesh runs less often while EAR is high and
+        stable (see InferenceScheduler for the alert-latency bound).
+        With change_gate=True the last result is reused while the whole scene
+        is unchanged (parked vehicle, static footage).
+        vehicle_source (or BLINKSENSE_VEHICLE_SOURCE) is an NMEA, candump or
+        CSV speed feed; detection and alarms pause while the vehicle is parked.
+        With smoothing=True eye landmarks are one-euro filtered and EAR is
+        Kalman filtered, with EAR predicted on frames that skip FaceMesh.
         """
         self.alarm_path = alarm_path
         self.EYE_AR_THRESH = ear_thresh
@@ -40,6 +65,29 @@ class DrowsinessDetectorMediaPipe:
         self.LEFT_EYE = [362, 382, 381, 380, 374, 373, 390, 249, 263, 466, 388, 387, 386, 385, 384, 398]
         self.RIGHT_EYE = [33, 7, 163, 144, 145, 153, 154, 155, 133, 173, 157, 158, 159, 160, 161, 246]
         
+        # Reused resize/RGB buffers; FaceMesh runs on a downscaled copy
+        self.buffers = FrameBufferPool(*DISPLAY_SIZE)
+        self.analysis = AnalysisFrame(self.buffers)
+        
+        # Optional cheap first stage in front of FaceMesh
+        self.tiered = None
+        if tiered:
+            eye_cascade = load_eye_cascade()
+            self.tiered = TieredEyeState(ear_thresh, eye_cascade=eye_cascade)
+        self.last_eye_points = []
+        
+        # Optional trend-driven inference rate
+        self.sampler = InferenceScheduler(ear_thresh) if adaptive else None
+        self.last_ear = 0.0
+        self.change_gate = ChangeGate() if change_gate else None
+        self.vehicle = vehicle_gate(vehicle_source)
+        
+        # Yawn, head pose and gaze from the same FaceMesh landmarks
+        self.signals = FaceSignals()
+        self.last_signals = {}
+        self.fatigue = FatigueScorer()
+        self.smoother = FaceTracks() if smoothing else None
+        
         print("[INFO] MediaPipe Drowsiness detector initialized successfully!")
     
     def eye_aspect_ratio(self, landmarks, eye_points):
@@ -72,17 +120,84 @@ class DrowsinessDetectorMediaPipe:
         except Exception as e:
             print(f"[ALERT] Drowsiness detected! (Sound error: {e})")
     
+    def update_counter(self, ear, alarms=True):
+        """
+        Threshold/COUNTER decision for one frame's EAR, measured or predicted
+        Returns:
+            True when this frame raises the alarm
+        """
+        if ear >= self.EYE_AR_THRESH:
+            self.COUNTER = 0
+            self.ALARM_ON = False
+            return False
+        self.COUNTER += 1
+        if self.COUNTER < self.EYE_AR_CONSEC_FRAMES or not alarms or self.ALARM_ON:
+            return False
+        self.ALARM_ON = True
+        # Start alarm in separate thread
+        alarm_thread = Thread(target=self.sound_alarm)
+        alarm_thread.daemon = True
+        alarm_thread.start()
+        return True
+
     def detect_drowsiness(self, frame):
         """Process a single frame for drowsiness detection"""
-        # Convert BGR to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(rgb_frame)
+        alarms = True
+        if self.vehicle is not None:
+            detect, alarms = self.vehicle.should_detect()
+            if not detect:
+                # Parked: no inference, no alarm
+                self.COUNTER = 0
+                self.ALARM_ON = False
+                cv2.putText(frame, "PARKED - DETECTION PAUSED", (10, 30),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+                return frame, 0.0, False
+        
+        # Downscaled RGB copy; landmarks are normalised so they map onto frame directly
+        rgb_frame = self.analysis.prepare(frame, rgb=True)
         
         ear = 0.0
         is_drowsy = False
+        results = None
+        eye_boxes = []
         
-        if results.multi_face_landmarks:
-            for face_landmarks in results.multi_face_landmarks:
+        closing = self.COUNTER > 0
+        gray = self.analysis.gray() if self.change_gate is not None or self.tiered is not None else None
+        # The sampler goes last: should_run() counts the frame as inferred
+        # and restarts its interval, so it must only see frames that do run
+        if ((self.change_gate is not None and not self.change_gate.changed(gray, closing)) or
+                (self.tiered is not None and not self.tiered.needs_landmarks(gray, closing)) or
+                (self.sampler is not None and not self.sampler.should_run(closing))):
+            # Scene unchanged or eyes open and stable: reuse the last FaceMesh result
+            ear = self.last_ear
+            if self.smoother is not None:
+                # Extrapolate EAR between FaceMesh passes
+                predicted = self.smoother.predict()
+                ear = self.last_ear if predicted is None else predicted
+            for (x, y) in self.last_eye_points:
+                cv2.circle(frame, (x, y), 1, (0, 255, 0), -1)
+            if self.last_eye_points:
+                # Same decision on the reused/predicted EAR as on inferred frames
+                is_drowsy = self.update_counter(ear, alarms)
+        else:
+            results = self.face_mesh.process(rgb_frame)
+            self.last_eye_points = []
+            if not results.multi_face_landmarks:
+                self.signals.reset()
+                if self.smoother is not None:
+                    self.smoother.reset()
+                self.last_signals = {}
+                if self.tiered is not None:
+                    self.tiered.reset()
+        
+        if results is not None and results.multi_face_landmarks:
+            filters = [None] * len(results.multi_face_landmarks)
+            if self.smoother is not None:
+                boxes = [cv2.boundingRect(np.array([(l.x * frame.shape[1], l.y * frame.shape[0])
+                                                    for l in face.landmark], dtype=np.float32))
+                         for face in results.multi_face_landmarks]
+                filters = self.smoother.assign(boxes)
+            for face_landmarks, face_filter in zip(results.multi_face_landmarks, filters):
                 # Get landmarks
                 landmarks = face_landmarks.landmark
                 
@@ -92,36 +207,44 @@ class DrowsinessDetectorMediaPipe:
                 
                 # Average EAR
                 ear = (left_ear + right_ear) / 2.0
+                self.last_signals = self.signals.from_mediapipe(landmarks, frame.shape[1], frame.shape[0])
                 
-                # Draw eye landmarks
-                for point in self.LEFT_EYE[:6]:
-                    x = int(landmarks[point].x * frame.shape[1])
-                    y = int(landmarks[point].y * frame.shape[0])
-                    cv2.circle(frame, (x, y), 1, (0, 255, 0), -1)
+                gh, gw = rgb_frame.shape[:2]
+                eyes = [[(landmarks[p].x * gw, landmarks[p].y * gh) for p in eye]
+                        for eye in (self.LEFT_EYE, self.RIGHT_EYE)]
+                eye_boxes += [cv2.boundingRect(np.array(eye, dtype=np.int32)) for eye in eyes]
+                if self.tiered is not None:
+                    self.tiered.update(self.analysis.gray(), eyes, ear)
                 
-                for point in self.RIGHT_EYE[:6]:
-                    x = int(landmarks[point].x * frame.shape[1])
-                    y = int(landmarks[point].y * frame.shape[0])
+                # Eye landmarks in display pixels, optionally smoothed together with EAR
+                eye_points = np.array([(landmarks[p].x, landmarks[p].y)
+                                       for p in self.LEFT_EYE[:6] + self.RIGHT_EYE[:6]])
+                eye_points *= (frame.shape[1], frame.shape[0])
+                if face_filter is not None:
+                    eye_points, ear = face_filter.update(eye_points, ear)
+                
+                # Draw eye landmarks
+                for (x, y) in eye_points.astype(int).tolist():
                     cv2.circle(frame, (x, y), 1, (0, 255, 0), -1)
+                    self.last_eye_points.append((x, y))
                 
                 # Check for drowsiness
-                if ear < self.EYE_AR_THRESH:
-                    self.COUNTER += 1
-                    
-                    if self.COUNTER >= self.EYE_AR_CONSEC_FRAMES:
-                        if not self.ALARM_ON:
-                            self.ALARM_ON = True
-                            is_drowsy = True
-                            
-                            # Start alarm in separate thread
-                            alarm_thread = Thread(target=self.sound_alarm)
-                            alarm_thread.daemon = True
-                            alarm_thread.start()
-                else:
-                    self.COUNTER = 0
-                    self.ALARM_ON = False
+                is_drowsy = self.update_counter(ear, alarms) or is_drowsy
+        
+        if results is not None:
+            self.last_ear = ear
+            if self.change_gate is not None:
+                # Eye regions are compared separately so a closing eye is never skipped
+                self.change_gate.track_regions(gray, eye_boxes)
+            if self.sampler is not None:
+                self.sampler.update(ear)
+        
+        # Fatigue score from EAR plus yawns/nods (EAR is 0.0 when no face was found)
+        self.fatigue.update(ear < self.EYE_AR_THRESH if ear else None, self.last_signals)
         
         # Display information
+        draw_signals(frame, self.last_signals)
+        draw_fatigue(frame, self.fatigue.score, self.fatigue.severity)
         cv2.putText(frame, f"EAR: {ear:.2f}", (300, 30),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
         cv2.putText(frame, f"Counter: {self.COUNTER}", (10, 60),
@@ -133,19 +256,29 @@ class DrowsinessDetectorMediaPipe:
         
         return frame, ear, is_drowsy
     
+    def perf_stats(self):
+        """Allocation and frame-skipping counters"""
+        stats = {'buffers': self.buffers.stats()}
+        for name, gate in (('change_gate', self.change_gate), ('adaptive', self.sampler), ('tiered', self.tiered),
+                           ('vehicle', self.vehicle)):
+            if gate is not None:
+                stats[name] = gate.stats()
+        return stats
+    
     def run_detection(self, source=0):
         """Run real-time drowsiness detection"""
         print("[INFO] Starting video stream...")
-        vs = VideoStream(src=source).start()
-        time.sleep(2.0)
+        vs = open_source(source, width=self.buffers.width, height=self.buffers.height)
         
         try:
             while True:
-                frame = vs.read()
-                if frame is None:
+                ret, frame = self.buffers.read(vs)
+                if not ret:
+                    if vs.live:
+                        continue
                     break
                 
-                frame = cv2.resize(frame, (640, 480))
+                frame = self.buffers.resize(frame)
                 processed_frame, ear, is_drowsy = self.detect_drowsiness(frame)
                 
                 cv2.imshow("MediaPipe Drowsiness Detection", processed_frame)
@@ -162,5 +295,6 @@ class DrowsinessDetectorMediaPipe:
         
         finally:
             cv2.destroyAllWindows()
-            vs.stop()
+            vs.release()
+            print(f"[INFO] Perf stats: {self.perf_stats()}")
             print("[INFO] Cleanup completed")
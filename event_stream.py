@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+import uuid
+from collections import deque
+
+from flask import Response, request
+
+HEARTBEAT_SECONDS = 15.0
+RESET_MESSAGE = b"event: reset\ndata: {}\n\n"
+
+
+class EventBroker:
+    def __init__(self, history=200, heartbeat=HEARTBEAT_SECONDS):
+        """
+        Server-Sent Events fan-out from one publisher to many clients
+
+        publish() formats an event once and wakes every waiting client; each
+        client generator keeps its own position in a short replay history,
+        so a reconnecting browser sends Last-Event-ID and gets what it
+        missed. Event ids are "<epoch>-<n>" with an epoch per server run, so
+        an id from before a restart gets a reset event instead of a replay
+        of this run's events. Idle connections get a comment line every
+        heartbeat seconds so proxies keep them open.
+
+        Args:
+            history: Events kept for Last-Event-ID replay
+            heartbeat: Seconds between keep-alive comments
+        """
+        self.heartbeat = heartbeat
+        self._history = deque(maxlen=history)   # (id, formatted bytes)
+        self._cond = threading.Condition()
+        self.last_id = 0
+        self.epoch = uuid.uuid4().hex[:8]
+        self.clients = 0
+
+    def publish(self, event, data):
+        """Send an event to every connected client; returns its id"""
+        payload = json.dumps(data, separators=(',', ':'))
+        with self._cond:
+            self.last_id += 1
+            message = f"id: {self.epoch}-{self.last_id}\nevent: {event}\ndata: {payload}\n\n".encode()
+            self._history.append((self.last_id, message))
+            self._cond.notify_all()
+            return self.last_id
+
+    def _pending(self, cursor):
+        """Messages after cursor; a reset event first if some were dropped"""
+        if not self._history or cursor >= self.last_id:
+            return [], cursor
+        first = self._history[0][0]
+        messages = [message for event_id, message in self._history if event_id > cursor]
+        if cursor < first - 1:
+            messages.insert(0, RESET_MESSAGE)
+        return messages, self.last_id
+
+    def _cursor(self, last_event_id):
+        """Event number of a Last-Event-ID of this run, else None"""
+        epoch, _, number = (last_event_id or '').partition('-')
+        if epoch != self.epoch or not number.isdigit() or int(number) > self.last_id:
+            return None
+        return int(number)
+
+    def stream(self, last_event_id=None):
+        """
+        Generator of SSE bytes for one client
+        Args:
+            last_event_id: Last id the client saw (replays newer events);
+                None starts with live events only, and an id of another
+                server run starts with a reset event
+        """
+        with self._cond:
+            self.clients += 1
+            cursor = self._cursor(last_event_id)
+            stale = cursor is None and last_event_id is not None
+            if cursor is None:
+                cursor = self.last_id
+        try:
+            # Ask browsers to retry quickly after a dropped connection
+            yield b"retry: 2000\n\n"
+            if stale:
+                yield RESET_MESSAGE
+            while True:
+                with self._cond:
+                    messages, cursor = self._pending(cursor)
+                    if not messages:
+                        self._cond.wait(self.heartbeat)
+                        messages, cursor = self._pending(cursor)
+                if messages:
+                    yield b"".join(messages)
+                else:
+                    yield b": keepalive %d\n\n" % int(time.time())
+        finally:
+            with self._cond:
+                self.clients -= 1
+
+    def stats(self):
+        return {'clients': self.clients, 'epoch': self.epoch, 'last_id': self.last_id,
+                'history': len(self._history)}
+
+
+def sse_response(broker):
+    """Flask response streaming a broker; honours the Last-Event-ID header"""
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(broker.stream(last_id), mimetype='text/event-stream', headers=headers)
+
+
+class StateTracker:
+    def __init__(self, broker):
+        """Publishes 'state' events only when the driver state changes"""
+        self.broker = broker
+        self.state = None
+
+    def update(self, face_found, eyes_open, drowsy, **extra):
+        """
+        Args:
+            face_found, eyes_open, drowsy: Current frame's result
+            extra: Added to the event payload (e.g. fatigue score)
+        Returns:
+            The new state name if it changed, else None
+        """
+        if not face_found:
+            state = 'face_lost'
+        elif drowsy:
+            state = 'drowsy'
+        else:
+            state = 'eyes_open' if eyes_open else 'eyes_closed'
+        if state == self.state:
+            return None
+        previous, self.state = self.state, state
+        transition = 'recovered' if previous == 'drowsy' and state == 'eyes_open' else state
+        self.broker.publish('state', {'state': state, 'previous': previous,
+                                      'transition': transition, 'time': time.time(), **extra})
+        return state
@@ -0,0 +1,169 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+EVIDENCE_DIR = os.environ.get("BLINKSENSE_EVIDENCE_DIR", "evidence")
+EVIDENCE_MAX_BYTES = int(os.environ.get("BLINKSENSE_EVIDENCE_MAX_BYTES", str(16 * 1024 * 1024)))
+EVIDENCE_FOURCC = os.environ.get("BLINKSENSE_EVIDENCE_FOURCC", "mp4v")
+
+
+class ClipRing:
+    def __init__(self, seconds=10.0, max_bytes=EVIDENCE_MAX_BYTES):
+        """
+        Recent JPEG frames bounded by age and by total bytes
+
+        The byte bound holds whatever the resolution or JPEG size; at high
+        resolutions the ring simply covers less than `seconds`.
+        """
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self._frames = deque()      # (timestamp, jpeg bytes)
+        self.nbytes = 0
+
+    def append(self, timestamp, jpeg):
+        self._frames.append((timestamp, jpeg))
+        self.nbytes += len(jpeg)
+        while self._frames and (self.nbytes > self.max_bytes or
+                                timestamp - self._frames[0][0] > self.seconds):
+            self.nbytes -= len(self._frames.popleft()[1])
+
+    def frames(self):
+        return list(self._frames)
+
+    def stats(self):
+        span = self._frames[-1][0] - self._frames[0][0] if self._frames else 0.0
+        return {'frames': len(self._frames), 'bytes': self.nbytes, 'seconds': round(span, 1)}
+
+
+class EvidenceRecorder:
+    def __init__(self, relay, cache, pre_seconds=10.0, post_seconds=5.0, fps=10.0,
+                 max_bytes=EVIDENCE_MAX_BYTES, folder=EVIDENCE_DIR, url_prefix="/api/evidence/"):
+        """
+        Pre/post-alert video clips cut from the annotated stream
+
+        A recorder thread keeps the last pre_seconds of JPEG frames from the
+        relay (sharing the MJPEG encodes through the JpegCache). trigger()
+        only marks the moment and returns the clip URL; the post-alert
+        frames are collected by the recorder thread and a separate writer
+        thread encodes the file, so the detection loop never waits on
+        encoding or disk.
+
+        Args:
+            relay: FrameRelay with the annotated frames
+            cache: JpegCache for that relay
+            pre_seconds, post_seconds: Clip span around the alert
+            fps: Frames per second kept in the ring
+            max_bytes: Memory bound of the ring (and of each pending clip)
+            folder: Output directory
+            url_prefix: URL the clips are served under
+        """
+        self.relay = relay
+        self.cache = cache
+        self.post_seconds = post_seconds
+        self.interval = 1.0 / fps
+        self.max_bytes = max_bytes
+        # Absolute, since Flask resolves relative send directories against the app
+        self.folder = os.path.abspath(folder)
+        self.url_prefix = url_prefix
+        self.ring = ClipRing(pre_seconds, max_bytes)
+        self._lock = threading.Lock()
+        self._pending = None
+        # Each queued clip holds up to two rings' worth of frames
+        self._jobs = queue.Queue(maxsize=2)
+        self.written = 0
+        self.dropped = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def start(self):
+        threading.Thread(target=self._record, name="evidence-recorder", daemon=True).start()
+        threading.Thread(target=self._write_jobs, name="evidence-writer", daemon=True).start()
+        return self
+
+    def trigger(self, label="alert"):
+        """
+        Start a clip around now; an alert inside a clip still being
+        collected shares that clip
+        Returns:
+            URL of the clip (served once it has been written)
+        """
+        now = time.time()
+        with self._lock:
+            if self._pending is None:
+                # Only references to the ring's JPEGs are copied here
+                name = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{label}.mp4"
+                self._pending = {'name': name, 'frames': self.ring.frames(), 'post_bytes': 0,
+                                 'until': now + self.post_seconds}
+            return self.url_prefix + self._pending['name']
+
+    def _record(self):
+        seq, last = 0, 0.0
+        while True:
+            seq, frame = self.relay.wait(seq, 1.0)
+            now = time.time()
+            jpeg = None
+            if frame is not None and now - last >= self.interval:
+                last = now
+                _, jpeg = self.cache.get()
+            self._collect(now, jpeg)
+
+    def _collect(self, now, jpeg):
+        with self._lock:
+            if jpeg is not None:
+                self.ring.append(now, jpeg)
+            pending = self._pending
+            if pending is None:
+                return
+            if jpeg is not None and pending['post_bytes'] + len(jpeg) <= self.max_bytes:
+                pending['frames'].append((now, jpeg))
+                pending['post_bytes'] += len(jpeg)
+            # Also closes the clip when the camera stops delivering frames
+            if now < pending['until']:
+                return
+            self._pending = None
+        try:
+            self._jobs.put_nowait(pending)
+        except queue.Full:
+            self.dropped += 1
+            print(f"[WARNING] Evidence writer busy; dropped clip {pending['name']}")
+
+    def _write_jobs(self):
+        while True:
+            job = self._jobs.get()
+            try:
+                self._write(job)
+                self.written += 1
+            except Exception as e:
+                print(f"[WARNING] Could not write evidence clip {job['name']}: {e}")
+
+    def _write(self, job):
+        frames = job['frames']
+        if not frames:
+            return
+        first = cv2.imdecode(np.frombuffer(frames[0][1], np.uint8), cv2.IMREAD_COLOR)
+        span = frames[-1][0] - frames[0][0]
+        fps = (len(frames) - 1) / span if span > 0 else 1.0
+        path = os.path.join(self.folder, job['name'])
+        # Written under a temporary name so the URL never serves a partial file
+        tmp = path + ".part.mp4"
+        writer = cv2.VideoWriter(tmp, cv2.VideoWriter_fourcc(*EVIDENCE_FOURCC), fps,
+                                 (first.shape[1], first.shape[0]))
+        try:
+            for _, jpeg in frames:
+                image = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+                if image.shape != first.shape:
+                    image = cv2.resize(image, (first.shape[1], first.shape[0]))
+                writer.write(image)
+        finally:
+            writer.release()
+        os.replace(tmp, path)
+        print(f"[INFO] Evidence clip saved: {path} ({len(frames)} frames, {span:.1f}s)")
+
+    def stats(self):
+        return {'ring': self.ring.stats(), 'pending': self._pending is not None,
+                'written': self.written, 'dropped': self.dropped}
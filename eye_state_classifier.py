@@ -0,0 +1,143 @@
+import os
+
+import cv2
+import numpy as np
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+EYE_MODEL_PATH = os.environ.get("BLINKSENSE_EYE_MODEL", "data/models/eye_state_int8.onnx")
+# What the model returns: "probability" (sigmoid/softmax included) or "logits"
+EYE_MODEL_OUTPUT = os.environ.get("BLINKSENSE_EYE_MODEL_OUTPUT", "probability")
+
+# Eye boxes as fractions of a frontal face box: (x0, y0, x1, y1)
+EYE_REGIONS = ((0.13, 0.20, 0.47, 0.50), (0.53, 0.20, 0.87, 0.50))
+
+
+def eye_boxes(face, shape):
+    """
+    Left and right eye boxes from a face box by fixed face proportions
+    Args:
+        face: (x, y, w, h) face box
+        shape: Shape of the image the box refers to, for clipping
+    Returns:
+        List of two (x, y, w, h) boxes
+    """
+    x, y, w, h = face
+    h_max, w_max = shape[:2]
+    boxes = []
+    for (x0, y0, x1, y1) in EYE_REGIONS:
+        bx0, by0 = max(0, x + int(w * x0)), max(0, y + int(h * y0))
+        bx1, by1 = min(w_max, x + int(w * x1)), min(h_max, y + int(h * y1))
+        boxes.append((bx0, by0, max(1, bx1 - bx0), max(1, by1 - by0)))
+    return boxes
+
+
+def quantize_model(src_path, dst_path):
+    """
+    Write an int8 copy of a float ONNX model (dynamic weight quantization)
+
+    Needs onnxruntime; static quantization with calibration crops gives
+    better accuracy but needs a dataset, so it is left to training.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(src_path, dst_path, weight_type=QuantType.QInt8)
+    return dst_path
+
+
+class EyeStateClassifier:
+    def __init__(self, model_path=EYE_MODEL_PATH, input_size=(24, 24), threads=1, backend="auto",
+                 output=EYE_MODEL_OUTPUT):
+        """
+        Tiny CNN deciding open/closed for grayscale eye crops
+
+        Both eyes go through the network as one batch. The model takes
+        (N, 1, H, W) float32 in [0, 1] and returns either one closed value
+        per crop or two (open, closed) values.
+
+        Args:
+            model_path: ONNX model file
+            input_size: (width, height) the model expects
+            threads: Intra-op threads for ONNX Runtime
+            backend: "onnxruntime", "opencv" or "auto" (ONNX Runtime if installed)
+            output: "probability" or "logits", fixed per model
+        """
+        if output not in ("probability", "logits"):
+            raise ValueError(f"output must be 'probability' or 'logits', not {output!r}")
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Eye state model not found: {model_path}")
+        self.model_path = model_path
+        self.output = output
+        self.input_size = input_size
+        self._batch = np.zeros((2, 1, input_size[1], input_size[0]), dtype=np.float32)
+        self._crop = np.empty((input_size[1], input_size[0]), dtype=np.uint8)
+
+        if backend == "auto":
+            backend = "onnxruntime" if onnxruntime is not None else "opencv"
+        self.backend = backend
+
+        if backend == "onnxruntime":
+            if onnxruntime is None:
+                raise ImportError("onnxruntime is not installed")
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+            self.session = onnxruntime.InferenceSession(model_path, options,
+                                                        providers=["CPUExecutionProvider"])
+            self.input_name = self.session.get_inputs()[0].name
+        else:
+            self.net = cv2.dnn.readNetFromONNX(model_path)
+            self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+            self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+        print(f"[INFO] Eye state classifier loaded ({self.backend}): {model_path}")
+
+    def _prepare(self, crops):
+        if len(crops) != self._batch.shape[0]:
+            self._batch = np.zeros((len(crops),) + self._batch.shape[1:], dtype=np.float32)
+        for i, crop in enumerate(crops):
+            cv2.resize(crop, self.input_size, dst=self._crop, interpolation=cv2.INTER_AREA)
+            np.multiply(self._crop, 1.0 / 255.0, out=self._batch[i, 0], casting="unsafe")
+        return self._batch
+
+    def closed_probability(self, crops):
+        """
+        Args:
+            crops: Grayscale eye crops (any size)
+        Returns:
+            Array of closed-eye probabilities, one per crop
+        """
+        if len(crops) == 0:
+            return np.zeros(0, dtype=np.float32)
+        batch = self._prepare(crops)
+        if self.backend == "onnxruntime":
+            out = self.session.run(None, {self.input_name: batch})[0]
+        else:
+            self.net.setInput(batch)
+            out = self.net.forward()
+
+        out = np.asarray(out, dtype=np.float32).reshape(len(crops), -1)
+        if self.output == "probability":
+            # The closed column of (open, closed), or the single output
+            return out[:, -1]
+        if out.shape[1] == 2:
+            # (open, closed) logits
+            out = out - out.max(axis=1, keepdims=True)
+            exp = np.exp(out)
+            return exp[:, 1] / exp.sum(axis=1)
+        return 1.0 / (1.0 + np.exp(-out[:, 0]))
+
+    def classify_face(self, gray, face):
+        """
+        Closed probability for both eyes of one face
+        Args:
+            gray: Grayscale image the face box refers to
+            face: (x, y, w, h)
+        Returns:
+            (probabilities, eye boxes)
+        """
+        boxes = eye_boxes(face, gray.shape)
+        crops = [gray[y:y + h, x:x + w] for (x, y, w, h) in boxes]
+        return self.closed_probability(crops), boxes
@@ -0,0 +1,152 @@
+import cv2
+import numpy as np
+import time
+from threading import Thread
+from frame_buffer import FrameBufferPool, AnalysisFrame, DISPLAY_SIZE
+from shared_frames import open_source
+from eye_state_classifier import EyeStateClassifier, EYE_MODEL_PATH
+from face_detector_dnn import create_face_detector
+
+class EyeStateDetector:
+    def __init__(self, model_path=EYE_MODEL_PATH, closed_thresh=0.5, ear_consec_frames=20,
+                 backend="auto", threads=1, face_detector=None):
+        """
+        Drowsiness detector using a face box and a CNN eye-state classifier
+
+        No landmark model runs: both eye crops are cut from the face box by
+        fixed proportions and classified in one batch.
+
+        Args:
+            model_path: ONNX eye-state model
+            closed_thresh: Closed probability above which an eye counts as closed
+            ear_consec_frames: Consecutive closed frames for a drowsiness alert
+            backend: Classifier backend ("auto", "onnxruntime" or "opencv")
+            threads: Classifier threads
+            face_detector: "haar", "yunet" or "res10" (default from
+                BLINKSENSE_FACE_DETECTOR)
+        """
+        self.CLOSED_THRESH = closed_thresh
+        self.EYE_AR_CONSEC_FRAMES = ear_consec_frames
+
+        # Initialize counters
+        self.COUNTER = 0
+        self.ALARM_ON = False
+
+        self.face_cascade = create_face_detector(face_detector)
+        self.classifier = EyeStateClassifier(model_path, threads=threads, backend=backend)
+
+        # Reused capture/resize/grayscale buffers
+        self.buffers = FrameBufferPool(*DISPLAY_SIZE)
+        self.analysis = AnalysisFrame(self.buffers)
+
+        # Per-stage timings (seconds, exponential average)
+        self.timings = {'face': 0.0, 'classify': 0.0}
+
+        print("[INFO] CNN eye-state detector initialized successfully!")
+
+    def sound_alarm(self):
+        """Print alarm message"""
+        print("🚨 DROWSINESS ALERT! WAKE UP! 🚨")
+
+    def _time(self, stage, start):
+        self.timings[stage] += 0.05 * ((time.perf_counter() - start) - self.timings[stage])
+
+    def detect_drowsiness(self, frame):
+        """
+        Process a single frame for drowsiness detection
+        Returns:
+            processed_frame, openness (1 - closed probability, in the EAR slot), is_drowsy
+        """
+        small_gray = self.analysis.prepare(frame)
+
+        start = time.perf_counter()
+        faces = self.face_cascade.detectMultiScale(small_gray, 1.3, 5)
+        self._time('face', start)
+
+        openness = 1.0
+        is_drowsy = False
+
+        if len(faces) > 0:
+            # Largest face only
+            face = max(faces, key=lambda f: f[2] * f[3])
+
+            start = time.perf_counter()
+            closed, boxes = self.classifier.classify_face(small_gray, face)
+            self._time('classify', start)
+            openness = 1.0 - float(np.mean(closed))
+
+            x, y, w, h = self.analysis.to_display(face)
+            cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)
+            for box, p_closed in zip(boxes, closed):
+                ex, ey, ew, eh = self.analysis.to_display(box)
+                color = (0, 0, 255) if p_closed > self.CLOSED_THRESH else (0, 255, 0)
+                cv2.rectangle(frame, (ex, ey), (ex+ew, ey+eh), color, 2)
+
+            # Check for drowsiness
+            if np.mean(closed) > self.CLOSED_THRESH:
+                self.COUNTER += 1
+
+                if self.COUNTER >= self.EYE_AR_CONSEC_FRAMES:
+                    if not self.ALARM_ON:
+                        self.ALARM_ON = True
+                        is_drowsy = True
+
+                        # Start alarm in separate thread
+                        alarm_thread = Thread(target=self.sound_alarm)
+                        alarm_thread.daemon = True
+                        alarm_thread.start()
+            else:
+                self.COUNTER = 0
+                self.ALARM_ON = False
+
+        # Display information
+        cv2.putText(frame, f"Open: {openness:.2f}", (300, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        cv2.putText(frame, f"Counter: {self.COUNTER}", (10, 60),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
+
+        if self.ALARM_ON:
+            cv2.putText(frame, "DROWSINESS ALERT!", (10, 30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+
+        return frame, openness, is_drowsy
+
+    def run_detection(self, source=0):
+        """Run real-time drowsiness detection"""
+        print("[INFO] Starting video stream...")
+        cap = open_source(source, width=self.buffers.width, height=self.buffers.height)
+
+        if not cap.isOpened():
+            print("[ERROR] Could not open video source")
+            cap.release()
+            return
+
+        try:
+            while True:
+                ret, frame = self.buffers.read(cap)
+                if not ret:
+                    if cap.live:
+                        continue
+                    break
+
+                frame = self.buffers.resize(frame)
+                processed_frame, openness, is_drowsy = self.detect_drowsiness(frame)
+
+                cv2.imshow("CNN Eye-State Drowsiness Detection", processed_frame)
+
+                if is_drowsy:
+                    print(f"[ALERT] Drowsiness detected! Openness: {openness:.2f}")
+
+                key = cv2.waitKey(1) & 0xFF
+                if key == ord('q'):
+                    break
+
+        except KeyboardInterrupt:
+            print("\n[INFO] Detection stopped by user")
+
+        finally:
+            cap.release()
+            cv2.destroyAllWindows()
+            timings = {stage: f"{value * 1000:.2f} ms" for stage, value in self.timings.items()}
+            print(f"[INFO] Average stage timings: {timings}")
+            print("[INFO] Cleanup completed")
@@ -0,0 +1,164 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+
+# haar (default), yunet or res10
+FACE_DETECTOR = os.environ.get("BLINKSENSE_FACE_DETECTOR", "haar").lower()
+FACE_DETECTOR_THREADS = int(os.environ.get("BLINKSENSE_FACE_THREADS", "0"))
+
+MODEL_DIR = os.environ.get("BLINKSENSE_MODEL_DIR", "data/models")
+YUNET_MODEL = os.path.join(MODEL_DIR, "face_detection_yunet_2023mar.onnx")
+RES10_PROTOTXT = os.path.join(MODEL_DIR, "deploy.prototxt")
+RES10_MODEL = os.path.join(MODEL_DIR, "res10_300x300_ssd_iter_140000.caffemodel")
+
+_nets = {}
+_nets_lock = threading.Lock()
+
+
+def _cached(key, load):
+    """One loaded network per key for the whole process"""
+    with _nets_lock:
+        if key not in _nets:
+            _nets[key] = load()
+        return _nets[key]
+
+
+class DnnFaceDetector:
+    def __init__(self, kind="yunet", input_width=160, score_thresh=0.6, nms_thresh=0.3, threads=None):
+        """
+        cv2.dnn face detector with a Haar-compatible detectMultiScale
+
+        Every frame is shrunk to a fixed small input before the network runs,
+        so the cost does not depend on the frame size or on a scale factor:
+        input_width wide (aspect ratio kept) for YuNet, and res10's fixed
+        300x300 blob, resampled straight from the full frame. YuNet also
+        finds turned and tilted faces that the frontal Haar cascade misses.
+
+        Args:
+            kind: "yunet" (OpenCV Zoo ONNX) or "res10" (Caffe SSD)
+            input_width: YuNet input width in pixels
+            score_thresh: Minimum face confidence
+            nms_thresh: Non-maximum suppression IoU threshold (YuNet)
+            threads: cv2.setNumThreads value; None leaves OpenCV's setting
+        """
+        self.kind = kind
+        self.input_width = input_width
+        self.score_thresh = score_thresh
+        self.nms_thresh = nms_thresh
+        self._local = threading.local()
+
+        if threads is not None:
+            cv2.setNumThreads(threads)
+
+        if kind == "yunet":
+            if not os.path.exists(YUNET_MODEL):
+                raise FileNotFoundError(f"YuNet model not found: {YUNET_MODEL}")
+        elif kind == "res10":
+            if not (os.path.exists(RES10_PROTOTXT) and os.path.exists(RES10_MODEL)):
+                raise FileNotFoundError(f"res10 model not found in {MODEL_DIR}")
+            self.net = _cached(("res10",), lambda: cv2.dnn.readNetFromCaffe(RES10_PROTOTXT, RES10_MODEL))
+        else:
+            raise ValueError(f"Unknown face detector: {kind}")
+
+    def _yunet(self, size):
+        # FaceDetectorYN keeps per-size state, so each thread gets its own
+        # instance per input size; the ONNX file is only parsed on creation
+        detectors = getattr(self._local, "yunet", None)
+        if detectors is None:
+            detectors = self._local.yunet = {}
+        if size not in detectors:
+            detectors[size] = cv2.FaceDetectorYN.create(YUNET_MODEL, "", size,
+                                                        self.score_thresh, self.nms_thresh, 20)
+        return detectors[size]
+
+    def _bgr(self, image):
+        if image.ndim == 3:
+            return image
+        buf = getattr(self._local, "bgr", None)
+        if buf is None or buf.shape[:2] != image.shape[:2]:
+            buf = self._local.bgr = np.empty(image.shape[:2] + (3,), dtype=np.uint8)
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR, dst=buf)
+
+    def detect(self, image):
+        """
+        Args:
+            image: Grayscale or BGR frame
+        Returns:
+            (N, 5) float array of x, y, w, h, score in image pixels
+        """
+        image = self._bgr(image)
+        h, w = image.shape[:2]
+
+        if self.kind == "yunet":
+            scale = min(1.0, self.input_width / w)
+            size = (max(1, round(w * scale)), max(1, round(h * scale)))
+            small = image if scale == 1.0 else cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+            _, faces = self._yunet(size).detect(small)
+            if faces is None:
+                return np.zeros((0, 5), dtype=np.float32)
+            boxes = faces[:, [0, 1, 2, 3, 14]].copy()
+            boxes[:, :4] /= scale
+        else:
+            # The network input is always 300x300; shrinking first would
+            # only throw detail away before blobFromImage scales it back up
+            blob = cv2.dnn.blobFromImage(image, 1.0, (300, 300), (104.0, 177.0, 123.0))
+            with _nets_lock:
+                # cv2.dnn.Net is not safe for concurrent forward() calls
+                self.net.setInput(blob)
+                out = self.net.forward()[0, 0]
+            out = out[out[:, 2] >= self.score_thresh]
+            boxes = np.empty((len(out), 5), dtype=np.float32)
+            boxes[:, 0] = out[:, 3] * w
+            boxes[:, 1] = out[:, 4] * h
+            boxes[:, 2] = (out[:, 5] - out[:, 3]) * w
+            boxes[:, 3] = (out[:, 6] - out[:, 4]) * h
+            boxes[:, 4] = out[:, 2]
+        return boxes
+
+    def detectMultiScale(self, image, *args, **kwargs):
+        """
+        Drop-in for CascadeClassifier.detectMultiScale; scale factor and
+        neighbour arguments are ignored, minSize is honoured
+        Returns:
+            (N, 4) int array of x, y, w, h
+        """
+        boxes = self.detect(image)
+        h_max, w_max = image.shape[:2]
+        x0 = np.clip(boxes[:, 0], 0, w_max - 1)
+        y0 = np.clip(boxes[:, 1], 0, h_max - 1)
+        x1 = np.clip(boxes[:, 0] + boxes[:, 2], 0, w_max)
+        y1 = np.clip(boxes[:, 1] + boxes[:, 3], 0, h_max)
+        rects = np.stack([x0, y0, x1 - x0, y1 - y0], axis=1).astype(np.int32)
+        min_size = kwargs.get("minSize")
+        if min_size:
+            rects = rects[(rects[:, 2] >= min_size[0]) & (rects[:, 3] >= min_size[1])]
+        return rects
+
+
+def load_eye_cascade():
+    """Haar eye cascade, loaded once per process (and shared by forked workers)"""
+    return _cached(("haar_eye",), lambda: cv2.CascadeClassifier(
+        cv2.data.haarcascades + 'haarcascade_eye.xml'))
+
+
+def create_face_detector(kind=None, threads=None):
+    """
+    Face detector for the apps' face_cascade attribute
+    Args:
+        kind: "haar", "yunet" or "res10"; defaults to BLINKSENSE_FACE_DETECTOR
+        threads: OpenCV thread count; defaults to BLINKSENSE_FACE_THREADS (0 = unchanged)
+    Returns:
+        A DnnFaceDetector, or the Haar cascade if kind is "haar" or the
+        model files are missing
+    """
+    kind = (kind or FACE_DETECTOR).lower()
+    threads = threads if threads is not None else (FACE_DETECTOR_THREADS or None)
+    if kind != "haar":
+        try:
+            return DnnFaceDetector(kind, threads=threads)
+        except (FileNotFoundError, ValueError, cv2.error) as e:
+            print(f"[WARNING] {e}; falling back to the Haar face cascade")
+    return _cached(("haar",), lambda: cv2.CascadeClassifier(
+        cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'))
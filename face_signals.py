@@ -0,0 +1,228 @@
+import time
+
+import cv2
+import numpy as np
+
+# Generic 3D face model (mm): nose tip, chin, left eye outer corner, right eye
+# outer corner, left mouth corner, right mouth corner ("left" = image left)
+MODEL_POINTS = np.array([
+    (0.0, 0.0, 0.0),
+    (0.0, -330.0, -65.0),
+    (-225.0, 170.0, -135.0),
+    (225.0, 170.0, -135.0),
+    (-150.0, -150.0, -125.0),
+    (150.0, -150.0, -125.0),
+], dtype=np.float64)
+
+# dlib 68-point indices
+DLIB_POSE = [30, 8, 36, 45, 48, 54]
+DLIB_MOUTH = [60, 64, 61, 67, 62, 66, 63, 65]  # corners, then vertical pairs
+
+# MediaPipe FaceMesh indices (iris points need refine_landmarks=True)
+MP_POSE = [1, 152, 33, 263, 61, 291]
+MP_MOUTH = [78, 308, 82, 87, 13, 14, 312, 317]
+# Per eye: outer corner, inner corner, upper lid, lower lid, iris centre
+MP_GAZE = [[33, 133, 159, 145, 468], [263, 362, 386, 374, 473]]
+
+
+def mouth_aspect_ratio(mouth):
+    """
+    Inner-mouth opening over width
+    Args:
+        mouth: (8, 2) array: two corners followed by three top/bottom pairs
+    """
+    width = np.linalg.norm(mouth[0] - mouth[1])
+    heights = np.linalg.norm(mouth[2::2] - mouth[3::2], axis=1)
+    return float(heights.mean() / width) if width else 0.0
+
+
+def gaze_ratios(eyes):
+    """
+    Iris position inside each eye, averaged over both eyes
+    Args:
+        eyes: (2, 5, 2) array of outer corner, inner corner, upper lid,
+            lower lid and iris centre per eye
+    Returns:
+        (horizontal, vertical) with 0.5 meaning centred
+    """
+    outer, inner, upper, lower, iris = (eyes[:, i] for i in range(5))
+    axis = inner - outer
+    length = np.einsum("ij,ij->i", axis, axis)
+    horizontal = np.einsum("ij,ij->i", iris - outer, axis) / np.where(length > 0, length, 1.0)
+    lid = lower[:, 1] - upper[:, 1]
+    vertical = (iris[:, 1] - upper[:, 1]) / np.where(np.abs(lid) > 1e-6, lid, 1.0)
+    return float(horizontal.mean()), float(vertical.mean())
+
+
+class HeadPose:
+    def __init__(self):
+        """solvePnP on six landmarks"""
+        self._size = None
+        self._camera = None
+        # SQPnP (OpenCV 4.5.3+) is global and several times faster than the
+        # iterative solver; older builds seed the iterative one with the last pose
+        self.flags = getattr(cv2, "SOLVEPNP_SQPNP", cv2.SOLVEPNP_ITERATIVE)
+        self.rvec = None
+        self.tvec = None
+
+    def _camera_matrix(self, width, height):
+        if self._size != (width, height):
+            # Focal length approximated by the frame width, no lens distortion
+            self._size = (width, height)
+            self._camera = np.array([[width, 0, width / 2.0],
+                                     [0, width, height / 2.0],
+                                     [0, 0, 1]], dtype=np.float64)
+        return self._camera
+
+    def estimate(self, image_points, width, height):
+        """
+        Args:
+            image_points: (6, 2) pixels in MODEL_POINTS order
+        Returns:
+            (pitch, yaw, roll) in degrees, pitch positive when the head tips
+            down, or None if solvePnP failed
+        """
+        camera = self._camera_matrix(width, height)
+        image_points = np.ascontiguousarray(image_points, dtype=np.float64)
+        if self.flags == cv2.SOLVEPNP_ITERATIVE and self.rvec is not None:
+            ok, rvec, tvec = cv2.solvePnP(MODEL_POINTS, image_points, camera, None,
+                                          self.rvec, self.tvec, True, self.flags)
+        else:
+            ok, rvec, tvec = cv2.solvePnP(MODEL_POINTS, image_points, camera, None, flags=self.flags)
+        if not ok:
+            self.rvec = self.tvec = None
+            return None
+        self.rvec, self.tvec = rvec, tvec
+
+        rotation, _ = cv2.Rodrigues(rvec)
+        angles = cv2.RQDecomp3x3(rotation)[0]
+        # The model is y-up and the image y-down, so a level head sits at +-180
+        pitch = angles[0] - 180.0 if angles[0] > 0 else angles[0] + 180.0
+        return pitch, angles[1], angles[2]
+
+
+class FaceSignals:
+    def __init__(self, yawn_thresh=0.6, yawn_frames=15, nod_deg=15.0,
+                 gaze_h_limit=0.2, gaze_v_limit=0.25, baseline_alpha=0.02):
+        """
+        Yawn, head-nod and gaze-off-road signals from landmarks the detector
+        already computed
+
+        Everything works on a handful of landmark rows with vectorized NumPy,
+        plus one six-point solvePnP, so the cost (tens of microseconds) is
+        tiny next to the landmark model itself.
+
+        Args:
+            yawn_thresh: Mouth aspect ratio above which the mouth counts as wide open
+            yawn_frames: Consecutive open-mouth frames that make a yawn
+            nod_deg: Pitch drop below the running baseline that counts as a nod
+            gaze_h_limit: Horizontal iris offset from centre that counts as off road
+            gaze_v_limit: Vertical iris offset from centre that counts as off road
+            baseline_alpha: Smoothing factor of the neutral pitch baseline
+        """
+        self.yawn_thresh = yawn_thresh
+        self.yawn_frames = yawn_frames
+        self.nod_deg = nod_deg
+        self.gaze_h_limit = gaze_h_limit
+        self.gaze_v_limit = gaze_v_limit
+        self.baseline_alpha = baseline_alpha
+
+        self.pose = HeadPose()
+        self.pitch_baseline = None
+        self.mouth_open_frames = 0
+        self.head_down = False
+        self.gaze_off_since = None
+
+        # Event counters
+        self.yawns = 0
+        self.nods = 0
+
+    def reset(self):
+        """Face lost: drop per-face state but keep the event counters"""
+        self.pose = HeadPose()
+        self.mouth_open_frames = 0
+        self.head_down = False
+        self.gaze_off_since = None
+
+    def from_dlib(self, points, width, height):
+        """
+        Args:
+            points: (68, 2) dlib landmarks in pixels of a width x height frame
+        """
+        points = np.asarray(points, dtype=np.float64)
+        return self._update(points[DLIB_MOUTH], points[DLIB_POSE], None, width, height)
+
+    def from_mediapipe(self, landmarks, width, height):
+        """
+        Args:
+            landmarks: FaceMesh landmark list (normalised coordinates)
+        """
+        def pixels(indices):
+            return np.array([(landmarks[i].x, landmarks[i].y) for i in indices]) * (width, height)
+
+        gaze = None
+        if len(landmarks) > 473:
+            gaze = pixels(np.ravel(MP_GAZE)).reshape(2, 5, 2)
+        return self._update(pixels(MP_MOUTH), pixels(MP_POSE), gaze, width, height)
+
+    def _update(self, mouth, pose_points, gaze_eyes, width, height):
+        signals = {}
+
+        # Yawn: mouth wide open for yawn_frames in a row, counted once per yawn
+        mar = mouth_aspect_ratio(mouth)
+        if mar > self.yawn_thresh:
+            self.mouth_open_frames += 1
+            if self.mouth_open_frames == self.yawn_frames:
+                self.yawns += 1
+        else:
+            self.mouth_open_frames = 0
+        signals['mar'] = mar
+        signals['yawning'] = self.mouth_open_frames >= self.yawn_frames
+        signals['yawns'] = self.yawns
+
+        # Head pose and nods against a slowly adapting neutral pitch
+        pose = self.pose.estimate(pose_points, width, height)
+        if pose is not None:
+            pitch, yaw, roll = pose
+            if self.pitch_baseline is None:
+                self.pitch_baseline = pitch
+            drop = pitch - self.pitch_baseline
+            if drop > self.nod_deg:
+                self.head_down = True
+            else:
+                if self.head_down and drop < self.nod_deg / 2:
+                    # Head came back up
+                    self.nods += 1
+                    self.head_down = False
+                self.pitch_baseline += self.baseline_alpha * (pitch - self.pitch_baseline)
+            signals.update(pitch=pitch, yaw=yaw, roll=roll)
+        signals['head_down'] = self.head_down
+        signals['nods'] = self.nods
+
+        # Gaze off road from the iris position (MediaPipe refine_landmarks only)
+        if gaze_eyes is not None:
+            horizontal, vertical = gaze_ratios(gaze_eyes)
+            off = abs(horizontal - 0.5) > self.gaze_h_limit or abs(vertical - 0.5) > self.gaze_v_limit
+            now = time.time()
+            if off and self.gaze_off_since is None:
+                self.gaze_off_since = now
+            elif not off:
+                self.gaze_off_since = None
+            signals['gaze'] = (horizontal, vertical)
+            signals['gaze_off_road'] = off
+            signals['gaze_off_seconds'] = now - self.gaze_off_since if off else 0.0
+
+        return signals
+
+
+def draw_signals(frame, signals, origin=(10, 90)):
+    """Compact overlay line for the on-frame display"""
+    if not signals:
+        return
+    text = f"MAR: {signals['mar']:.2f}"
+    if 'pitch' in signals:
+        text += f"  Pitch: {signals['pitch']:.0f}"
+    if signals.get('gaze_off_road'):
+        text += "  GAZE OFF"
+    color = (0, 0, 255) if signals['yawning'] or signals['head_down'] else (255, 255, 0)
+    cv2.putText(frame, text, origin, cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
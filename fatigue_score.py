@@ -0,0 +1,179 @@
+import math
+import time
+
+import cv2
+
+# (lower bound, label) from most to least severe
+SEVERITY_LEVELS = [(75.0, 'critical'), (50.0, 'high'), (25.0, 'moderate'), (0.0, 'low')]
+
+
+def severity_for(score):
+    for bound, label in SEVERITY_LEVELS:
+        if score >= bound:
+            return label
+    return 'low'
+
+
+class DecayingRate:
+    def __init__(self, window):
+        """Events per window seconds with exponential forgetting, O(1) per update"""
+        self.window = window
+        self.value = 0.0
+        self.updated = None
+
+    def decay(self, now):
+        if self.updated is not None:
+            self.value *= math.exp(-(now - self.updated) / self.window)
+        self.updated = now
+
+    def add(self, now, count=1):
+        self.decay(now)
+        self.value += count
+
+
+class FatigueScorer:
+    def __init__(self, window=60.0, blink_max=0.5, normal_blink_rate=17.0,
+                 weights=None):
+        """
+        Continuous 0-100 fatigue score from EAR, blinks, yawns and nods
+
+        All state is a handful of exponentially decaying averages with a
+        time constant of window seconds, so each update is constant time and
+        independent of frame rate; it can run on every frame of every stream.
+
+        Components (each scaled to 0-1 before weighting):
+            perclos: Fraction of time the eyes were closed
+            long_closures: Closures longer than blink_max per window
+            blink_duration: Average blink duration (slow blinks)
+            blink_rate: Blinks per minute above normal_blink_rate
+            yawns: Yawns per window
+            nods: Head nods per window
+
+        Args:
+            window: Averaging time constant in seconds
+            blink_max: Longest closure in seconds still counted as a blink
+            normal_blink_rate: Resting blinks per minute
+            weights: Optional dict overriding the component weights
+        """
+        self.window = window
+        self.blink_max = blink_max
+        self.normal_blink_rate = normal_blink_rate
+        self.weights = {
+            'perclos': 40.0,
+            'long_closures': 20.0,
+            'blink_duration': 10.0,
+            'blink_rate': 10.0,
+            'yawns': 10.0,
+            'nods': 10.0,
+        }
+        if weights:
+            self.weights.update(weights)
+
+        self.perclos = 0.0
+        self.blink_duration = 0.0
+        self.blinks = DecayingRate(60.0)
+        self.long_closures = DecayingRate(window)
+        self.yawns = DecayingRate(window)
+        self.nods = DecayingRate(window)
+
+        self.closed_since = None
+        self.last_time = None
+        self.last_yawns = None
+        self.last_nods = None
+
+        self.score = 0.0
+        self.severity = 'low'
+        self.components = {}
+        self._alerted = 0
+
+    def update(self, eyes_closed, signals=None, now=None):
+        """
+        Feed one frame
+        Args:
+            eyes_closed: Eye state for this frame (EAR below threshold, or
+                the Haar apps' eyes-not-detected), None when no face
+            signals: Optional face_signals dict with 'yawns' and 'nods' counters
+            now: Frame timestamp (defaults to time.time())
+        Returns:
+            (score, severity)
+        """
+        now = time.time() if now is None else now
+        dt = 0.0 if self.last_time is None else max(0.0, now - self.last_time)
+        self.last_time = now
+        alpha = 1.0 - math.exp(-dt / self.window)
+
+        if eyes_closed is not None:
+            self.perclos += alpha * ((1.0 if eyes_closed else 0.0) - self.perclos)
+
+            if eyes_closed and self.closed_since is None:
+                self.closed_since = now
+            elif not eyes_closed and self.closed_since is not None:
+                duration = now - self.closed_since
+                self.closed_since = None
+                if duration <= self.blink_max:
+                    self.blinks.add(now)
+                    # Average over blinks rather than time
+                    self.blink_duration += 0.1 * (duration - self.blink_duration)
+                else:
+                    self.long_closures.add(now)
+
+        if signals:
+            # Signals carry running totals; count only the new events
+            yawns, nods = signals.get('yawns', 0), signals.get('nods', 0)
+            if self.last_yawns is not None and yawns > self.last_yawns:
+                self.yawns.add(now, yawns - self.last_yawns)
+            if self.last_nods is not None and nods > self.last_nods:
+                self.nods.add(now, nods - self.last_nods)
+            self.last_yawns, self.last_nods = yawns, nods
+
+        for rate in (self.blinks, self.long_closures, self.yawns, self.nods):
+            rate.decay(now)
+
+        blink_rate = self.blinks.value  # per minute
+        components = {
+            'perclos': min(1.0, self.perclos / 0.3),
+            'long_closures': min(1.0, self.long_closures.value / 3.0),
+            'blink_duration': min(1.0, max(0.0, (self.blink_duration - 0.15) / 0.25)),
+            'blink_rate': min(1.0, max(0.0, blink_rate - self.normal_blink_rate) / self.normal_blink_rate),
+            'yawns': min(1.0, self.yawns.value / 3.0),
+            'nods': min(1.0, self.nods.value / 3.0),
+        }
+        score = sum(self.weights[name] * value for name, value in components.items())
+        total = sum(self.weights.values())
+        self.score = 100.0 * score / total if total else 0.0
+        self.severity = severity_for(self.score)
+        self.components = components
+        return self.score, self.severity
+
+    def escalation(self, min_severity='high'):
+        """
+        Severity worth a new alert: returned once each time the score climbs
+        into a level at or above min_severity, re-armed when it drops back
+        """
+        ranks = [label for _, label in reversed(SEVERITY_LEVELS)]
+        rank = ranks.index(self.severity)
+        if rank < ranks.index(min_severity):
+            self._alerted = 0
+            return None
+        if rank > self._alerted:
+            self._alerted = rank
+            return self.severity
+        return None
+
+    def snapshot(self):
+        """Score fields for detection_data entries and alerts"""
+        return {
+            'fatigue_score': round(self.score, 1),
+            'severity': self.severity,
+        }
+
+
+def draw_fatigue(frame, score, severity, origin=None):
+    """Score bar in the bottom-left corner of frame"""
+    x, y = origin or (10, frame.shape[0] - 20)
+    colors = {'low': (0, 200, 0), 'moderate': (0, 255, 255), 'high': (0, 140, 255), 'critical': (0, 0, 255)}
+    color = colors.get(severity, (255, 255, 255))
+    cv2.rectangle(frame, (x, y - 12), (x + 100, y), (80, 80, 80), 1)
+    cv2.rectangle(frame, (x, y - 12), (x + int(score), y), color, -1)
+    cv2.putText(frame, f"Fatigue {score:.0f} ({severity})", (x + 108, y),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.45, color, 1)
@@ -1,40 +1,85 @@
 import cv2
 import numpy as np
-from flask import Flask, render_template_string, Response, jsonify, request
+from flask import Flask, Response, jsonify, request, send_from_directory
 import json
 import time
 from datetime import datetime
 import threading
 import queue
 import winsound
+from frame_buffer import FrameBufferPool, AnalysisFrame, DISPLAY_SIZE
+from shared_frames import frame_source, frame_source_stats
+from motion_gate import ChangeGate
+from face_detector_dnn import create_face_detector
+from fatigue_score import FatigueScorer, draw_fatigue
+from static_assets import compile_page, register_static
+from telemetry_store import TelemetryLog, telemetry_response
+from event_stream import EventBroker, StateTracker, sse_response
+from frame_relay import FrameRelay, JpegCache, snapshot_response
+from webrtc_output import offer_response, webrtc_stats
+from evidence_clips import EvidenceRecorder
+from session_recorder import recorder_from_env, register_recordings
+from history_export import HistoryStore, export_response
 
 app = Flask(__name__)
+register_static(app)
+register_recordings(app)
 
 class EyeDetector:
     def __init__(self):
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.face_cascade = create_face_detector()
         self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
         self.closed_eye_start_time = None
         self.is_drowsy = False
         self.drowsy_threshold = 2.0
         self.sensitivity = 100
-        self.detection_data = []
-        self.alerts = []
+        self.detection_data = TelemetryLog(100)
+        self.alerts = TelemetryLog(50)
+        self.buffers = FrameBufferPool(*DISPLAY_SIZE)
+        self.analysis = AnalysisFrame(self.buffers)
+        # Reuse the last faces/eyes while the scene is unchanged
+        self.change_gate = ChangeGate()
+        self.last_faces = []
+        self.last_eyes = []
+        self.fatigue = FatigueScorer()
+        # State transitions and alerts pushed to /api/events
+        self.events = EventBroker()
+        self.state = StateTracker(self.events)
+        # Alerts and telemetry kept on disk for /api/history/export
+        self.history = HistoryStore().start()
+        # Pre/post-alert clips; set once the frame relay exists
+        self.evidence = None
         
     def detect_eyes(self, frame):
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
+        # Find faces on the small analysis frame, then work in display coordinates
+        small_gray = self.analysis.prepare(frame)
+        # Never reuse a result while the closed-eye timer runs
+        fresh = self.change_gate.changed(small_gray, force=self.closed_eye_start_time is not None)
+        if fresh:
+            small_faces = self.face_cascade.detectMultiScale(small_gray, 1.3, 5)
+            # Upper half of each face: a closing eye re-runs inference even if the scene is still
+            self.change_gate.track_regions(small_gray, [(x, y, w, h // 2) for (x, y, w, h) in small_faces])
+            faces = [self.analysis.to_display(face) for face in small_faces]
+            self.last_faces = faces
+            self.last_eyes = []
+        else:
+            faces = self.last_faces
         
         eyes_detected = False
         
-        for (x, y, w, h) in faces:
+        for i, (x, y, w, h) in enumerate(faces):
+            roi_gray = self.analysis.display_gray(frame, x, y, w, h//2)
+            
             cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 182, 193), 2)
             cv2.putText(frame, "FACE", (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 182, 193), 2)
             
-            roi_gray = gray[y:y+h//2, x:x+w]
             roi_color = frame[y:y+h//2, x:x+w]
             
-            eyes = self.eye_cascade.detectMultiScale(roi_gray, 1.1, 3, minSize=(15, 15))
+            if fresh:
+                eyes = self.eye_cascade.detectMultiScale(roi_gray, 1.1, 3, minSize=(15, 15))
+                self.last_eyes.append(eyes)
+            else:
+                eyes = self.last_eyes[i]
             
             eyes_open_count = 0
             total_eyes = max(len(eyes), 2)
@@ -115,26 +160,37 @@ class EyeDetector:
             self.closed_eye_start_time = None
             self.is_drowsy = False
         
-        self.detection_data.append({
+        # Continuous fatigue score alongside the binary drowsy flag
+        score, severity = self.fatigue.update(not eyes_detected if len(faces) > 0 else None, now=current_time)
+        level = self.fatigue.escalation()
+        if level:
+            self.add_alert(f"Fatigue level {level} (score {score:.0f})", severity=level)
+        
+        self.state.update(len(faces) > 0, eyes_detected, self.is_drowsy, fatigue_score=round(score, 1))
+        
+        entry = {
             'timestamp': datetime.now().isoformat(),
             'eyes_open': eyes_detected,
-            'drowsy': self.is_drowsy
-        })
-        
-        if len(self.detection_data) > 100:
-            self.detection_data.pop(0)
+            'drowsy': self.is_drowsy,
+            **self.fatigue.snapshot()
+        }
+        self.detection_data.append(entry)
+        self.history.record('telemetry', entry)
         
         return frame, eyes_detected
     
-    def add_alert(self, message):
+    def add_alert(self, message, severity='high'):
         alert = {
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'message': message,
-            'severity': 'high'
+            'severity': severity,
+            'fatigue_score': round(self.fatigue.score, 1)
         }
+        if self.evidence is not None:
+            alert['clip'] = self.evidence.trigger(severity)
         self.alerts.append(alert)
-        if len(self.alerts) > 50:
-            self.alerts.pop(0)
+        self.history.record('alerts', alert)
+        self.events.publish('alert', alert)
     
     def play_alarm(self):
         try:
@@ -145,14 +201,53 @@ class EyeDetector:
             print(f"Alarm failed: {e}")
 
 detector = EyeDetector()
+# Annotated frames from the single detection thread, for all viewers
+relay = FrameRelay()
+# Shared JPEG encodes of the newest frame (MJPEG clients and snapshots)
+jpegs = JpegCache(relay)
+# Evidence clips around each alert, recorded and written off the detection thread
+detector.evidence = EvidenceRecorder(relay, jpegs).start()
 
-def generate_frames():
-    print("Initializing camera for live detection...")
-    camera = cv2.VideoCapture(0)
+def annotate_frame(frame):
+    """Run detection on a camera frame and draw the status overlays"""
+    frame, eyes_open = detector.detect_eyes(frame)
     
-    if not camera.isOpened():
-        print("Trying DirectShow backend...")
-        camera = cv2.VideoCapture(0, cv2.CAP_DSHOW)
+    # Add status overlay with countdown
+    if detector.is_drowsy:
+        overlay = detector.buffers.overlay(frame)
+        cv2.rectangle(overlay, (0, 0), (frame.shape[1], 150), (0, 0, 255), -1)
+        cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, frame)
+        
+        cv2.putText(frame, "DROWSY! WAKE UP!", (50, 50), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 255), 3)
+        cv2.putText(frame, "ALERT!", (50, 100), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3)
+    elif detector.closed_eye_start_time is not None:
+        duration = time.time() - detector.closed_eye_start_time
+        remaining = max(0, detector.drowsy_threshold - duration)
+        cv2.putText(frame, f"EYES CLOSED: {duration:.1f}s", (50, 50), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+        cv2.putText(frame, f"Alert in: {remaining:.1f}s", (50, 90), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+    else:
+        cv2.putText(frame, "EYES OPEN - SAFE", (50, 50), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+    
+    cv2.putText(frame, "LIVE DETECTION", (frame.shape[1] - 200, 30), 
+               cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+    
+    draw_fatigue(frame, detector.fatigue.score, detector.fatigue.severity)
+    
+    timestamp = datetime.now().strftime('%H:%M:%S')
+    cv2.putText(frame, timestamp, (frame.shape[1] - 100, frame.shape[0] - 20), 
+               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    
+    return frame
+
+def detection_loop():
+    """One detection pipeline for every viewer (MJPEG, WebRTC, snapshots)"""
+    print("Initializing camera for live detection...")
+    camera = frame_source()
     
     if not camera.isOpened():
         print("ERROR: Cannot access camera!")
@@ -161,69 +256,69 @@ def generate_frames():
     print("Camera initialized successfully!")
     
     try:
-        while True:
-            success, frame = camera.read()
+        while camera.running:
+            success, frame = detector.buffers.read(camera)
             if not success:
-                print("Failed to read frame")
-                break
-            
-            # Process frame for drowsiness detection
-            frame, eyes_open = detector.detect_eyes(frame)
-            
-            # Add status overlay with countdown
-            if detector.is_drowsy:
-                overlay = frame.copy()
-                cv2.rectangle(overlay, (0, 0), (frame.shape[1], 150), (0, 0, 255), -1)
-                cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, frame)
-                
-                cv2.putText(frame, "DROWSY! WAKE UP!", (50, 50), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 255), 3)
-                cv2.putText(frame, "ALERT!", (50, 100), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3)
-            elif detector.closed_eye_start_time is not None:
-                duration = time.time() - detector.closed_eye_start_time
-                remaining = max(0, detector.drowsy_threshold - duration)
-                cv2.putText(frame, f"EYES CLOSED: {duration:.1f}s", (50, 50), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-                cv2.putText(frame, f"Alert in: {remaining:.1f}s", (50, 90), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-            else:
-                cv2.putText(frame, "EYES OPEN - SAFE", (50, 50), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-            
-            cv2.putText(frame, "LIVE DETECTION", (frame.shape[1] - 200, 30), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-            
-            timestamp = datetime.now().strftime('%H:%M:%S')
-            cv2.putText(frame, timestamp, (frame.shape[1] - 100, frame.shape[0] - 20), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+                # Camera is reconnecting in the background
+                continue
             
-            ret, buffer = cv2.imencode('.jpg', frame)
-            if ret:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
+            relay.publish(annotate_frame(frame))
     
     except Exception as e:
         print(f"Camera error: {e}")
-    finally:
-        camera.release()
-        print("Camera released")
+
+def generate_frames():
+    relay.start(detection_loop)
+    for _ in relay.frames():
+        seq, jpeg = jpegs.get()
+        if jpeg is not None:
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
 
 @app.route('/')
 def index():
-    return render_template_string(HTML_TEMPLATE)
+    return INDEX_PAGE.response()
 
 @app.route('/video_feed')
 def video_feed():
     return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/api/snapshot')
+def snapshot():
+    relay.start(detection_loop)
+    return snapshot_response(jpegs)
+
+@app.route('/api/webrtc/offer', methods=['POST'])
+def webrtc_offer():
+    relay.start(detection_loop)
+    return offer_response(relay, request.json)
+
 @app.route('/api/detection_data')
 def get_detection_data():
-    return jsonify(detector.detection_data[-20:])
+    return telemetry_response(detector.detection_data, tail=20)
 
 @app.route('/api/alerts')
 def get_alerts():
-    return jsonify(detector.alerts)
+    return telemetry_response(detector.alerts)
+
+@app.route('/api/perf_stats')
+def get_perf_stats():
+    return jsonify({'buffers': detector.buffers.stats(), 'capture': frame_source_stats(),
+                    'change_gate': detector.change_gate.stats(), 'events': detector.events.stats(), 'relay': relay.stats(), 'jpeg': jpegs.stats(),
+                    'webrtc': webrtc_stats(relay), 'evidence': detector.evidence.stats(),
+                    'history': detector.history.stats()})
+
+@app.route('/api/events')
+def events():
+    return sse_response(detector.events)
+
+@app.route('/api/history/export')
+def history_export():
+    return export_response(detector.history)
+
+@app.route('/api/evidence/<path:name>')
+def evidence_clip(name):
+    return send_from_directory(detector.evidence.folder, name)
 
 @app.route('/api/settings', methods=['GET', 'POST'])
 def settings():
@@ -471,6 +566,7 @@ HTML_TEMPLATE = '''
                 <h2>Real-Time Drowsiness Detection</h2>
                 <div class="video-container">
                     <img src="/video_feed" class="video-feed" alt="Live Camera Feed">
+                    <video id="webrtcFeed" class="video-feed" autoplay muted playsinline style="display: none"></video>
                 </div>
                 <div style="text-align: center;">
                     <div id="status" class="status-indicator status-safe">Eyes Open - Safe Driving</div>
@@ -685,55 +781,102 @@ HTML_TEMPLATE = '''
             });
         }
         
+        // Only entries after the last seen seq are fetched; unchanged polls get a 304
+        let detectionCursor = 0;
+        let detectionEpoch = '';
+        let detectionHistory = [];
+        
+        function renderStatus(drowsy, eyesOpen) {
+            const statusEl = document.getElementById('status');
+            
+            if (drowsy) {
+                statusEl.className = 'status-indicator status-drowsy';
+                statusEl.textContent = 'DROWSY - WAKE UP!';
+            } else if (eyesOpen) {
+                statusEl.className = 'status-indicator status-safe';
+                statusEl.textContent = 'Eyes Open - Safe Driving';
+            } else {
+                statusEl.className = 'status-indicator status-safe';
+                statusEl.textContent = 'Monitoring...';
+            }
+        }
+        
+        function renderChart() {
+            if (eyeChart && eyeChart.data) {
+                const data = detectionHistory;
+                eyeChart.data.labels = data.map(d => new Date(d.timestamp).toLocaleTimeString());
+                eyeChart.data.datasets[0].data = data.map(d => d.eyes_open ? 1 : 0);
+                eyeChart.update('none');
+            }
+        }
+        
+        // Fetches the recent entries; used on load, after a reset event and without EventSource
         function updateStatus() {
-            fetch('/api/detection_data')
+            fetch(`/api/detection_data?since=${detectionCursor}&limit=20&epoch=${detectionEpoch}`)
                 .then(response => response.json())
-                .then(data => {
-                    if (data.length > 0) {
-                        const latest = data[data.length - 1];
-                        const statusEl = document.getElementById('status');
-                        
-                        if (latest.drowsy) {
-                            statusEl.className = 'status-indicator status-drowsy';
-                            statusEl.textContent = 'DROWSY - WAKE UP!';
-                        } else if (latest.eyes_open) {
-                            statusEl.className = 'status-indicator status-safe';
-                            statusEl.textContent = 'Eyes Open - Safe Driving';
-                        } else {
-                            statusEl.className = 'status-indicator status-safe';
-                            statusEl.textContent = 'Monitoring...';
-                        }
-                        
-                        if (eyeChart && eyeChart.data) {
-                            const labels = data.map(d => new Date(d.timestamp).toLocaleTimeString());
-                            const values = data.map(d => d.eyes_open ? 1 : 0);
-                            
-                            eyeChart.data.labels = labels;
-                            eyeChart.data.datasets[0].data = values;
-                            eyeChart.update('none');
-                        }
+                .then(update => {
+                    detectionHistory = (update.reset ? update.entries : detectionHistory.concat(update.entries)).slice(-20);
+                    detectionCursor = update.seq;
+                    detectionEpoch = update.epoch;
+                    if (detectionHistory.length > 0) {
+                        const latest = detectionHistory[detectionHistory.length - 1];
+                        renderStatus(latest.drowsy, latest.eyes_open);
+                        renderChart();
                     }
                 });
         }
         
+        // A state event carries everything the status line and chart need
+        function onStateEvent(event) {
+            const state = JSON.parse(event.data);
+            const sample = {
+                timestamp: state.time * 1000,
+                eyes_open: state.state === 'eyes_open',
+                drowsy: state.state === 'drowsy'
+            };
+            renderStatus(sample.drowsy, sample.eyes_open);
+            detectionHistory = detectionHistory.concat([sample]).slice(-20);
+            renderChart();
+        }
+        
+        let alertCursor = 0;
+        let alertEpoch = '';
+        let alertHistory = [];
+        
+        function renderAlerts() {
+            const alerts = alertHistory;
+            const alertsList = document.getElementById('alertsList');
+            if (alerts.length === 0) {
+                alertsList.innerHTML = '<div class="alert-item"><strong>No alerts yet</strong><br>System is monitoring for drowsiness...</div>';
+            } else {
+                alertsList.innerHTML = alerts.map(alert => 
+                    `<div class="alert-item">
+                        <strong>${alert.timestamp}</strong><br>
+                        ${alert.message}
+                        ${alert.clip ? `<br><a href="${alert.clip}" target="_blank">Evidence clip</a>` : ''}
+                    </div>`
+                ).join('');
+            }
+        }
+        
         function updateAlerts() {
-            fetch('/api/alerts')
+            fetch(`/api/alerts?since=${alertCursor}&epoch=${alertEpoch}`)
                 .then(response => response.json())
-                .then(alerts => {
-                    const alertsList = document.getElementById('alertsList');
-                    if (alerts.length === 0) {
-                        alertsList.innerHTML = '<div class="alert-item"><strong>No alerts yet</strong><br>System is monitoring for drowsiness...</div>';
-                    } else {
-                        alertsList.innerHTML = alerts.map(alert => 
-                            `<div class="alert-item">
-                                <strong>${alert.timestamp}</strong><br>
-                                ${alert.message}
-                            </div>`
-                        ).join('');
-                    }
+                .then(update => {
+                    alertHistory = (update.reset ? update.entries : alertHistory.concat(update.entries)).slice(-50);
+                    alertCursor = update.seq;
+                    alertEpoch = update.epoch;
+                    renderAlerts();
                 });
         }
         
+        function onAlertEvent(event) {
+            const entry = JSON.parse(event.data);
+            alertHistory = alertHistory.concat([entry]).slice(-50);
+            alertCursor = entry.seq;
+            renderAlerts();
+        }
+        
         function saveSettings() {
             const sensitivity = document.getElementById('sensitivity').value;
             const threshold = document.getElementById('threshold').value;
@@ -762,16 +905,74 @@ HTML_TEMPLATE = '''
             document.getElementById('thresholdValue').textContent = this.value;
         });
         
-        setInterval(updateStatus, 1000);
-        setInterval(updateAlerts, 5000);
+        // Alerts and state changes are pushed and rendered from the event
+        // payload; the API is only read once on load and after a reset
+        updateStatus();
+        updateAlerts();
+        if (window.EventSource) {
+            const events = new EventSource('/api/events');
+            events.addEventListener('state', onStateEvent);
+            events.addEventListener('alert', onAlertEvent);
+            // Events were missed or the server restarted: resync once
+            events.addEventListener('reset', () => {
+                updateStatus();
+                updateAlerts();
+            });
+        } else {
+            setInterval(updateStatus, 1000);
+            setInterval(updateAlerts, 5000);
+        }
+        
+        // Prefer WebRTC video when the server offers it; MJPEG stays as the fallback
+        async function startWebRTC() {
+            if (!window.RTCPeerConnection) return;
+            const pc = new RTCPeerConnection();
+            const img = document.querySelector('img.video-feed');
+            const video = document.getElementById('webrtcFeed');
+            pc.addTransceiver('video', { direction: 'recvonly' });
+            pc.ontrack = event => {
+                video.srcObject = event.streams[0] || new MediaStream([event.track]);
+                video.style.display = '';
+                img.style.display = 'none';
+                img.removeAttribute('src');
+            };
+            pc.onconnectionstatechange = () => {
+                if (pc.connectionState === 'failed') {
+                    video.style.display = 'none';
+                    img.src = '/video_feed';
+                    img.style.display = '';
+                }
+            };
+            await pc.setLocalDescription(await pc.createOffer());
+            await new Promise(resolve => {
+                if (pc.iceGatheringState === 'complete') return resolve();
+                pc.addEventListener('icegatheringstatechange', () => {
+                    if (pc.iceGatheringState === 'complete') resolve();
+                });
+            });
+            const response = await fetch('/api/webrtc/offer', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(pc.localDescription)
+            });
+            if (!response.ok) {
+                pc.close();
+                return;
+            }
+            await pc.setRemoteDescription(await response.json());
+        }
         
+        startWebRTC().catch(error => console.log('WebRTC unavailable, using MJPEG:', error));
         initDashboardCharts();
     </script>
 </body>
 </html>
 '''
 
+INDEX_PAGE = compile_page(app, HTML_TEMPLATE)
+
 if __name__ == '__main__':
     print("Starting BlinkSense on http://localhost:5000")
     print("Make sure camera is not being used by other applications")
+    recorder_from_env(debug=False)
     app.run(debug=False, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,226 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+
+
+def parse_size(text, default):
+    """Parse a WIDTHxHEIGHT string, falling back to default"""
+    try:
+        width, height = text.lower().split("x")
+        return int(width), int(height)
+    except (AttributeError, ValueError):
+        return default
+
+
+# Per-deployment resolutions: frames are captured, annotated and streamed at
+# DISPLAY_SIZE while face/landmark detection runs on an ANALYSIS_SIZE copy
+DISPLAY_SIZE = parse_size(os.environ.get("BLINKSENSE_DISPLAY_SIZE"), (640, 480))
+ANALYSIS_SIZE = parse_size(os.environ.get("BLINKSENSE_ANALYSIS_SIZE"), (320, 240))
+
+
+def negotiate_resolution(cap, width=640, height=480, fps=None):
+    """
+    Ask the capture device for a resolution instead of resizing every frame
+    Args:
+        cap: Opened cv2.VideoCapture
+        width: Requested frame width
+        height: Requested frame height
+        fps: Optional requested frame rate
+    Returns:
+        (width, height) actually delivered by the device
+    """
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if fps:
+        cap.set(cv2.CAP_PROP_FPS, fps)
+
+    actual_w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or width
+    actual_h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or height
+    if (actual_w, actual_h) != (width, height):
+        print(f"[INFO] Camera delivers {actual_w}x{actual_h}, frames will be resized to {width}x{height}")
+    return actual_w, actual_h
+
+
+class FrameBufferPool:
+    def __init__(self, width=640, height=480):
+        """
+        Pool of destination arrays reused across frames
+
+        Every capture, resize, colour conversion and overlay copy writes into
+        a buffer owned by the pool, so a steady-state loop allocates nothing.
+        Buffers are kept per thread because the Flask servers run one frame
+        generator per client thread.
+
+        Args:
+            width: Working frame width
+            height: Working frame height
+        """
+        self.width = width
+        self.height = height
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        # Allocation accounting
+        self.frames = 0
+        self.bytes_allocated = 0
+        self.last_frame_bytes = 0
+
+    def _buffers(self):
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+            self._local.frame_bytes = 0
+        return buffers
+
+    def _record(self, nbytes):
+        self._local.frame_bytes = getattr(self._local, "frame_bytes", 0) + nbytes
+        with self._lock:
+            self.bytes_allocated += nbytes
+
+    def _keep(self, name, array):
+        """Adopt an array OpenCV had to allocate because the pooled one did not fit"""
+        buffers = self._buffers()
+        if buffers.get(name) is not array:
+            buffers[name] = array
+            self._record(array.nbytes)
+        return array
+
+    def get(self, name, shape, dtype=np.uint8):
+        """Return the pooled array called name, allocating only if shape or dtype changed"""
+        buffers = self._buffers()
+        buf = buffers.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            buffers[name] = buf
+            self._record(buf.nbytes)
+        return buf
+
+    def begin_frame(self):
+        """Mark the start of a new frame for the per-frame allocation counter"""
+        self._buffers()
+        with self._lock:
+            self.frames += 1
+            self.last_frame_bytes = self._local.frame_bytes
+        self._local.frame_bytes = 0
+
+    def read(self, cap):
+        """
+        Read the next frame from cap into the pooled capture buffer
+        Returns:
+            (success, frame) like cv2.VideoCapture.read
+        """
+        self.begin_frame()
+        buf = self._buffers().get("capture")
+        if buf is None:
+            ret, frame = cap.read()
+        else:
+            ret, frame = cap.read(buf)
+        if ret and frame is not None:
+            self._keep("capture", frame)
+        return ret, frame
+
+    def resize(self, frame, size=None, name="resize", interpolation=cv2.INTER_LINEAR):
+        """Resize into a pooled buffer, skipping the work if frame is already size"""
+        width, height = size or (self.width, self.height)
+        if frame.shape[1] == width and frame.shape[0] == height:
+            return frame
+        dst = self.get(name, (height, width) + frame.shape[2:], frame.dtype)
+        return self._keep(name, cv2.resize(frame, (width, height), dst=dst, interpolation=interpolation))
+
+    def flip(self, frame, flip_code=1):
+        """Mirror frame into a pooled buffer"""
+        dst = self.get("flip", frame.shape, frame.dtype)
+        return self._keep("flip", cv2.flip(frame, flip_code, dst=dst))
+
+    def to_gray(self, frame, name="gray"):
+        """BGR to grayscale into a pooled buffer"""
+        dst = self.get(name, frame.shape[:2], frame.dtype)
+        return self._keep(name, cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=dst))
+
+    def to_rgb(self, frame, name="rgb"):
+        """BGR to RGB into a pooled buffer; use a different name for a second copy per frame"""
+        dst = self.get(name, frame.shape, frame.dtype)
+        return self._keep(name, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=dst))
+
+    def overlay(self, frame, name="overlay"):
+        """Pooled replacement for frame.copy() when drawing blended overlays"""
+        dst = self.get(name, frame.shape, frame.dtype)
+        np.copyto(dst, frame)
+        return dst
+
+    def stats(self):
+        """Allocation counters for the perf endpoints"""
+        with self._lock:
+            frames = self.frames
+            total = self.bytes_allocated
+            last = self.last_frame_bytes
+        return {
+            'frames': frames,
+            'bytes_allocated': total,
+            'bytes_per_frame': total / frames if frames else 0.0,
+            'last_frame_bytes': last,
+        }
+
+
+class AnalysisFrame:
+    def __init__(self, buffers, size=ANALYSIS_SIZE):
+        """
+        Small copy of the display frame for detection, with coordinate mapping
+
+        Face/landmark detection runs on the downscaled frame and its results
+        are scaled back onto the display frame for drawing and for eye-region
+        analysis, so raising the stream resolution does not raise detection
+        cost.
+
+        Args:
+            buffers: FrameBufferPool owning the analysis buffers
+            size: (width, height) bounding box of the analysis frame; the
+                display aspect ratio is preserved so faces are not distorted
+        """
+        self.buffers = buffers
+        self.size = size
+        # Scale of the frame last prepared by the calling thread
+        self._local = threading.local()
+
+    @property
+    def scale_x(self):
+        return getattr(self._local, "scale_x", 1.0)
+
+    @property
+    def scale_y(self):
+        return getattr(self._local, "scale_y", 1.0)
+
+    def prepare(self, frame, rgb=False):
+        """Downscale frame for detection; grayscale, or RGB for MediaPipe"""
+        scale = min(self.size[0] / frame.shape[1], self.size[1] / frame.shape[0], 1.0)
+        target = (max(1, round(frame.shape[1] * scale)), max(1, round(frame.shape[0] * scale)))
+        small = self.buffers.resize(frame, target, name="analysis", interpolation=cv2.INTER_AREA)
+        self._local.scale_x = frame.shape[1] / small.shape[1]
+        self._local.scale_y = frame.shape[0] / small.shape[0]
+        self._local.small = small
+        if rgb:
+            return self.buffers.to_rgb(small, "analysis_rgb")
+        return self.buffers.to_gray(small, "analysis_gray")
+
+    def gray(self):
+        """Grayscale of the last prepared analysis frame (after prepare(rgb=True))"""
+        return self.buffers.to_gray(self._local.small, "analysis_gray")
+
+    def to_display(self, rect):
+        """Map an (x, y, w, h) box from analysis to display coordinates"""
+        x, y, w, h = rect
+        return (int(x * self.scale_x), int(y * self.scale_y),
+                int(w * self.scale_x), int(h * self.scale_y))
+
+    def points_to_display(self, points):
+        """Map an (N, 2) array of analysis-frame points to display coordinates"""
+        return (np.asarray(points, dtype=np.float64) * (self.scale_x, self.scale_y)).astype(np.int32)
+
+    def display_gray(self, frame, x, y, w, h):
+        """Grayscale of one display-resolution region, converted in place in a pooled frame"""
+        full = self.buffers.get("display_gray", frame.shape[:2], frame.dtype)
+        roi = full[y:y + h, x:x + w]
+        cv2.cvtColor(frame[y:y + h, x:x + w], cv2.COLOR_BGR2GRAY, dst=roi)
+        return roi
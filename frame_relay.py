@@ -0,0 +1,173 @@
+import threading
+import time
+import uuid
+
+import cv2
+
+
+class FrameRelay:
+    def __init__(self):
+        """
+        Latest annotated frame from one detection pipeline, shared by all
+        viewers
+
+        The pipeline publishes each processed frame once; MJPEG, WebRTC and
+        snapshot consumers read the newest one instead of each running
+        their own capture and detection. Viewers that fall behind skip
+        frames rather than queue them.
+        """
+        self._cond = threading.Condition()
+        self.frame = None
+        self.seq = 0
+        self.timestamp = 0.0
+        self._thread = None
+        # Distinguishes frame numbers of different server runs in ETags
+        self.epoch = uuid.uuid4().hex[:8]
+
+    def publish(self, frame):
+        """Hand a finished frame to the viewers (copied; the caller may reuse its buffer)"""
+        frame = frame.copy()
+        with self._cond:
+            self.frame = frame
+            self.seq += 1
+            self.timestamp = time.time()
+            self._cond.notify_all()
+
+    def latest(self):
+        """(seq, frame) of the newest frame; frame is None before the first"""
+        with self._cond:
+            return self.seq, self.frame
+
+    def wait(self, seq, timeout=1.0):
+        """
+        Block until a frame newer than seq is published
+        Returns:
+            (seq, frame), or (seq, None) on timeout
+        """
+        with self._cond:
+            if self.seq == seq:
+                self._cond.wait(timeout)
+            if self.seq == seq:
+                return seq, None
+            return self.seq, self.frame
+
+    def frames(self, timeout=1.0):
+        """Generator of new frames while the producer thread runs"""
+        seq = 0
+        while self.running():
+            seq, frame = self.wait(seq, timeout)
+            if frame is not None:
+                yield frame
+
+    def start(self, target):
+        """Start the producer thread running target() unless it is already running"""
+        with self._cond:
+            if self.running():
+                return
+            self._thread = threading.Thread(target=target, name="frame-relay", daemon=True)
+            self._thread.start()
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stats(self):
+        return {'frames_published': self.seq, 'running': self.running(),
+                'frame_age': round(time.time() - self.timestamp, 3) if self.timestamp else None}
+
+
+class JpegCache:
+    def __init__(self, relay, quality=80, max_variants=8):
+        """
+        JPEG encodings of a FrameRelay's newest frame, made at most once per
+        frame and size/quality
+
+        Concurrent callers asking for the same variant wait for the one
+        encode in progress instead of starting their own; the variants are
+        dropped as soon as a newer frame is published.
+
+        Args:
+            relay: FrameRelay to encode from
+            quality: Default JPEG quality
+            max_variants: Distinct size/quality pairs kept per frame
+        """
+        self.relay = relay
+        self.quality = quality
+        self.max_variants = max_variants
+        self._lock = threading.Lock()
+        self._seq = None
+        self._variants = {}     # (width, quality) -> [ready Event, bytes]
+        self.encodes = 0
+        self.hits = 0
+
+    def get(self, width=None, quality=None):
+        """
+        Args:
+            width: Output width (height keeps the aspect ratio); None = full size
+            quality: JPEG quality 10-95; None = default
+        Returns:
+            (seq, JPEG bytes), or (seq, None) before the first frame
+        """
+        seq, frame = self.relay.latest()
+        if frame is None:
+            return seq, None
+        # Round so arbitrary query values share a handful of variants
+        if width is not None:
+            width = max(32, min(frame.shape[1], int(width) // 16 * 16))
+            if width == frame.shape[1]:
+                width = None
+        quality = max(10, min(95, int(quality or self.quality) // 5 * 5))
+        key = (width, quality)
+
+        with self._lock:
+            if self._seq != seq:
+                self._seq, self._variants = seq, {}
+            entry = self._variants.get(key)
+            owner = entry is None
+            if owner:
+                entry = [threading.Event(), None]
+                if len(self._variants) < self.max_variants:
+                    self._variants[key] = entry
+                self.encodes += 1
+            else:
+                self.hits += 1
+
+        if owner:
+            image = frame
+            if width is not None:
+                height = round(frame.shape[0] * width / frame.shape[1])
+                image = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            ret, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            entry[1] = buffer.tobytes() if ret else None
+            entry[0].set()
+        else:
+            entry[0].wait()
+        return seq, entry[1]
+
+    def stats(self):
+        return {'encodes': self.encodes, 'hits': self.hits}
+
+
+def snapshot_response(cache, timeout=2.0):
+    """
+    Flask view body for GET /api/snapshot?width=&quality=
+    The newest annotated frame as JPEG, with an ETag so an unchanged frame
+    costs a 304
+    """
+    from flask import Response, request
+    relay = cache.relay
+    if relay.latest()[1] is None:
+        relay.wait(0, timeout)
+    width = request.args.get('width', type=int)
+    quality = request.args.get('quality', type=int)
+
+    variant = f"{width or ''}-{quality or ''}"
+    headers = {'Cache-Control': 'no-cache'}
+    if request.if_none_match.contains_weak(f"{relay.epoch}-{relay.seq}-{variant}"):
+        headers['ETag'] = f'"{relay.epoch}-{relay.seq}-{variant}"'
+        return Response(status=304, headers=headers)
+
+    seq, jpeg = cache.get(width, quality)
+    if jpeg is None:
+        return Response("No frame available yet", status=503, headers={'Retry-After': '1'})
+    headers['ETag'] = f'"{relay.epoch}-{seq}-{variant}"'
+    return Response(jpeg, mimetype='image/jpeg', headers=headers)
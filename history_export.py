@@ -0,0 +1,388 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+HISTORY_DIR = os.environ.get("BLINKSENSE_HISTORY_DIR", "history")
+HISTORY_DAYS = float(os.environ.get("BLINKSENSE_HISTORY_DAYS", "90"))
+HISTORY_MAX_GB = float(os.environ.get("BLINKSENSE_HISTORY_MAX_GB", "2"))
+# Seconds between kept telemetry rows (the detector produces ~30 a second)
+SAMPLE_SECONDS = float(os.environ.get("BLINKSENSE_HISTORY_SAMPLE_SECONDS", "1"))
+CHUNK_SIZE = 64 * 1024
+PARQUET_ROWS = 50000
+
+# Exported columns per kind; 'time' is the epoch seconds added by record()
+COLUMNS = {
+    'alerts': (('time', 'float'), ('timestamp', 'str'), ('message', 'str'), ('severity', 'str'),
+               ('fatigue_score', 'float'), ('clip', 'str')),
+    'telemetry': (('time', 'float'), ('timestamp', 'str'), ('eyes_open', 'bool'), ('drowsy', 'bool'),
+                  ('fatigue_score', 'float'), ('severity', 'str')),
+}
+# Kinds thinned to one row per sample interval; a row where one of these
+# fields changed is always kept, so no state change is lost
+SAMPLED = {'telemetry': ('eyes_open', 'drowsy', 'severity')}
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+class HistoryStore:
+    def __init__(self, folder=HISTORY_DIR, retention_days=HISTORY_DAYS, max_gb=HISTORY_MAX_GB,
+                 sample_seconds=SAMPLE_SECONDS, flush_interval=1.0, max_pending=10000):
+        """
+        Append-only history of alerts and telemetry on disk
+
+        Entries are kept as one JSON line each in a file per kind and day
+        (history/telemetry/20240115.jsonl), so a time range maps to a few
+        files that can be read line by line. record() only queues the
+        line; a background thread appends the queued lines once per
+        flush_interval, so the detection loop never touches the disk.
+        Telemetry is thinned to one row per sample_seconds plus every
+        state change.
+
+        Args:
+            folder: History directory
+            retention_days: Day files older than this are deleted
+            max_gb: Oldest day files are deleted beyond this total size
+            sample_seconds: Interval of the kept telemetry rows
+            flush_interval: Seconds between writes
+            max_pending: Queued lines kept if the disk falls behind
+        """
+        self.folder = os.path.abspath(folder)
+        self.retention_days = retention_days
+        self.max_bytes = max_gb * 1024 ** 3
+        self.sample_seconds = sample_seconds
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = []
+        self._sampled = {}      # kind -> (time, fields) of the last kept row
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.thinned = 0
+        self._pruned = 0.0
+        for kind in COLUMNS:
+            os.makedirs(os.path.join(self.folder, kind), exist_ok=True)
+
+    def start(self):
+        threading.Thread(target=self._run, name="history-writer", daemon=True).start()
+        return self
+
+    def record(self, kind, entry):
+        """Queue an alert or telemetry entry (a copy; 'seq' is left out)"""
+        now = time.time()
+        row = {'time': now, **{k: v for k, v in entry.items() if k != 'seq'}}
+        with self._lock:
+            if kind in SAMPLED:
+                fields = tuple(row.get(name) for name in SAMPLED[kind])
+                last = self._sampled.get(kind)
+                if last is not None and now - last[0] < self.sample_seconds and fields == last[1]:
+                    self.thinned += 1
+                    return
+                self._sampled[kind] = (now, fields)
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending.append((kind, now, json.dumps(row, separators=(',', ':'))))
+
+    def path(self, kind, day):
+        return os.path.join(self.folder, kind, day.strftime('%Y%m%d') + '.jsonl')
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+            if time.time() - self._pruned > 3600:
+                self.prune()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        files = {}
+        for kind, now, line in pending:
+            files.setdefault(self.path(kind, datetime.fromtimestamp(now)), []).append(line)
+        for path, lines in files.items():
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+            self.written += len(lines)
+
+    def prune(self):
+        """
+        Delete day files past the retention period, then the oldest days
+        until the history fits max_gb (today's files are always kept)
+        """
+        self._pruned = time.time()
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).strftime('%Y%m%d')
+        today = datetime.now().strftime('%Y%m%d')
+        days = []
+        for kind in COLUMNS:
+            for name in os.listdir(os.path.join(self.folder, kind)):
+                if name.endswith('.jsonl'):
+                    path = os.path.join(self.folder, kind, name)
+                    if name[:8] < cutoff:
+                        os.remove(path)
+                    else:
+                        days.append((name[:8], path, os.path.getsize(path)))
+        total = sum(size for _, _, size in days)
+        for day, path, size in sorted(days):
+            if total <= self.max_bytes or day >= today:
+                break
+            os.remove(path)
+            total -= size
+
+    def files(self, kind, start=None, end=None):
+        """
+        Day files overlapping [start, end) in time order
+        Returns:
+            List of (path, day start, day end)
+        """
+        result = []
+        folder = os.path.join(self.folder, kind)
+        for name in sorted(os.listdir(folder)):
+            if not name.endswith('.jsonl'):
+                continue
+            day = datetime.strptime(name[:8], '%Y%m%d')
+            first, last = day.timestamp(), (day + timedelta(days=1)).timestamp()
+            if (start is None or last > start) and (end is None or first < end):
+                result.append((os.path.join(folder, name), first, last))
+        return result
+
+    def lines(self, kind, start=None, end=None):
+        """
+        Raw JSON lines (bytes, with newline) in [start, end)
+        Only the lines of the first and last day are parsed to check
+        their time; days wholly inside the range are passed through.
+        """
+        for path, first, last in self.files(kind, start, end):
+            inside = (start is None or first >= start) and (end is None or last <= end)
+            with open(path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break   # Line still being written
+                    if not inside:
+                        t = _line_time(line)
+                        if (start is not None and t < start) or (end is not None and t >= end):
+                            continue
+                    yield line
+
+    def rows(self, kind, start=None, end=None):
+        for line in self.lines(kind, start, end):
+            yield json.loads(line)
+
+    def _prefix_size(self, path, end):
+        """Bytes of the complete lines before end (lines are in time order)"""
+        size = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n') or _line_time(line) >= end:
+                    break
+                size += len(line)
+        return size
+
+    def version(self, kind, start=None, end=None):
+        """
+        Changes whenever data in the range changes
+        The day file holding end (usually today's, appended to every
+        second) only counts up to end, so rows written later keep the
+        version, and the ETag, of a past range.
+        """
+        digest = hashlib.sha1(f"{kind}-{start}-{end}".encode())
+        for path, _, last in self.files(kind, start, end):
+            if end is not None and last > end:
+                state = str(self._prefix_size(path, end))
+            else:
+                st = os.stat(path)
+                state = f"{st.st_size}-{st.st_mtime_ns}"
+            digest.update(f"{os.path.basename(path)}-{state}".encode())
+        return digest.hexdigest()[:16]
+
+    def stats(self):
+        return {'pending': len(self._pending), 'written': self.written, 'dropped': self.dropped,
+                'thinned': self.thinned}
+
+
+def _line_time(line):
+    """'time' of a history line without parsing all of it (record() writes it first)"""
+    if line.startswith(b'{"time":'):
+        try:
+            return float(line[8:line.index(b',', 8)])
+        except ValueError:
+            pass
+    return json.loads(line)['time']
+
+
+def _chunks(parts):
+    """Join small byte strings into CHUNK_SIZE pieces"""
+    buffer, size = [], 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= CHUNK_SIZE:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def export_jsonl(store, kind, start=None, end=None):
+    return _chunks(store.lines(kind, start, end))
+
+
+def export_csv(store, kind, start=None, end=None):
+    names = [name for name, _ in COLUMNS[kind]]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def rows():
+        writer.writerow(names)
+        for row in store.rows(kind, start, end):
+            writer.writerow([row.get(name, '') for name in names])
+            if buffer.tell() >= CHUNK_SIZE:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode('utf-8')
+
+    return rows()
+
+
+class _Drain(io.RawIOBase):
+    """Write-only file that keeps what was written until drained"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data, self.parts = b''.join(self.parts), []
+        return data
+
+
+def export_parquet(store, kind, start=None, end=None):
+    """One row group per PARQUET_ROWS rows, each sent as soon as it is written"""
+    if pa is None:
+        raise ImportError("pyarrow is not installed (pip install pyarrow)")
+    types = {'float': pa.float64(), 'str': pa.string(), 'bool': pa.bool_()}
+    schema = pa.schema([(name, types[kind_]) for name, kind_ in COLUMNS[kind]])
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema)
+    batch = []
+    for row in store.rows(kind, start, end):
+        batch.append({name: row.get(name) for name in schema.names})
+        if len(batch) >= PARQUET_ROWS:
+            writer.write_table(pa.Table.from_pylist(batch, schema))
+            batch = []
+            yield sink.drain()
+    if batch:
+        writer.write_table(pa.Table.from_pylist(batch, schema))
+    writer.close()
+    yield sink.drain()
+
+
+EXPORTERS = {'csv': export_csv, 'jsonl': export_jsonl, 'parquet': export_parquet}
+
+
+def _skip(chunks, offset, length=None):
+    """Bytes [offset, offset + length) of a chunk stream"""
+    for chunk in chunks:
+        if offset >= len(chunk):
+            offset -= len(chunk)
+            continue
+        chunk, offset = chunk[offset:], 0
+        if length is not None:
+            chunk, length = chunk[:length], length - len(chunk[:length])
+        if chunk:
+            yield chunk
+        if length == 0:
+            return
+
+
+def _parse_time(value):
+    """Epoch seconds or an ISO date/time; None if empty"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def export_response(store):
+    """
+    Flask view body for GET /api/history/export?kind=&format=&start=&end=
+
+    kind is alerts or telemetry, format csv, jsonl or parquet; start and
+    end are epoch seconds or ISO dates. The export is generated from the
+    day files while it is sent, in 64 KB chunks, so memory use does not
+    depend on the range. A request without end, or with an end the
+    writer may still add rows before, is redirected to the same URL with
+    end set to the last settled second. The ETag then depends only on the
+    URL and the data in its range, so the output is byte-identical and an
+    interrupted download (which repeats the same URL) resumes with
+    Range/If-Range: the export is regenerated, once to measure it and once
+    to send the requested bytes.
+    """
+    from flask import Response, jsonify, redirect, request
+    kind = request.args.get('kind', 'alerts')
+    fmt = request.args.get('format', 'csv')
+    if kind not in COLUMNS or fmt not in FORMATS:
+        return jsonify({'error': f"kind must be one of {sorted(COLUMNS)}, format one of {sorted(FORMATS)}"}), 400
+    if fmt == 'parquet' and pa is None:
+        return jsonify({'error': 'Parquet export needs pyarrow'}), 501
+    try:
+        start = _parse_time(request.args.get('start'))
+        end = _parse_time(request.args.get('end'))
+    except ValueError:
+        return jsonify({'error': 'start and end must be epoch seconds or ISO dates'}), 400
+    # Rows are written up to a flush interval after their time
+    settled = int(time.time() - 2 * store.flush_interval)
+    if end is None or end > settled:
+        args = {**request.args.to_dict(), 'end': settled}
+        return redirect(f"{request.base_url}?{urlencode(args)}")
+
+    mimetype, extension = FORMATS[fmt]
+    exporter = EXPORTERS[fmt]
+    tag = f"{store.version(kind, start, end)}-{fmt}"
+    span = '-'.join(time.strftime('%Y%m%d', time.localtime(t)) for t in (start, end) if t is not None)
+    filename = f"blinksense-{kind}{'-' + span if span else ''}.{extension}"
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"',
+               'Accept-Ranges': 'bytes', 'ETag': f'"{tag}"', 'Cache-Control': 'no-cache'}
+
+    byte_range = request.range if request.if_range.etag in (None, tag) else None
+    if byte_range is None or byte_range.units != 'bytes' or len(byte_range.ranges) != 1:
+        return Response(exporter(store, kind, start, end), mimetype=mimetype, headers=headers)
+
+    total = sum(len(chunk) for chunk in exporter(store, kind, start, end))
+    window = byte_range.range_for_length(total)
+    if window is None:
+        headers['Content-Range'] = f"bytes */{total}"
+        return Response(status=416, headers=headers)
+    first, stop = window
+    headers['Content-Range'] = f"bytes {first}-{stop - 1}/{total}"
+    headers['Content-Length'] = str(stop - first)
+    body = _skip(exporter(store, kind, start, end), first, stop - first)
+    return Response(body, status=206, mimetype=mimetype, headers=headers)
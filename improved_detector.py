@@ -3,11 +3,17 @@ import numpy as np
 import time
 from threading import Thread
 import winsound  # For Windows beep sound
+from frame_buffer import FrameBufferPool, AnalysisFrame, DISPLAY_SIZE
+from shared_frames import open_source
+from face_detector_dnn import create_face_detector, load_eye_cascade
 
 class ImprovedDrowsinessDetector:
-    def __init__(self, closed_eye_time_thresh=2.0, ear_thresh=0.15):
+    def __init__(self, closed_eye_time_thresh=2.0, ear_thresh=0.15, face_detector=None):
         """
         Improved drowsiness detector that detects closed eyes for 2+ seconds
+        
+        face_detector picks "haar", "yunet" or "res10" (default from
+        BLINKSENSE_FACE_DETECTOR)
         """
         self.CLOSED_EYE_TIME_THRESH = closed_eye_time_thresh  # 2 seconds
         self.EYE_AR_THRESH = ear_thresh  # Lower threshold for better detection
@@ -17,9 +23,13 @@ class ImprovedDrowsinessDetector:
         self.ALARM_ON = False
         self.last_alarm_time = 0
         
-        # Load OpenCV's pre-trained classifiers
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+        # Face detector (Haar cascade or cv2.dnn) and eye cascade
+        self.face_cascade = create_face_detector(face_detector)
+        self.eye_cascade = load_eye_cascade()
+        
+        # Reused capture/flip/grayscale buffers
+        self.buffers = FrameBufferPool(*DISPLAY_SIZE)
+        self.analysis = AnalysisFrame(self.buffers)
         
         print(f"[INFO] Drowsiness detector initialized!")
         print(f"[INFO] Will alert if eyes closed for {self.CLOSED_EYE_TIME_THRESH} seconds")
@@ -71,11 +81,11 @@ class ImprovedDrowsinessDetector:
     
     def detect_drowsiness(self, frame):
         """Process a single frame for drowsiness detection"""
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        small_gray = self.analysis.prepare(frame)
         current_time = time.time()
         
-        # Detect faces
-        faces = self.face_cascade.detectMultiScale(gray, 1.1, 4)
+        # Detect faces on the analysis frame, mapped back to display coordinates
+        faces = [self.analysis.to_display(face) for face in self.face_cascade.detectMultiScale(small_gray, 1.1, 4)]
         
         ear = 0.3  # Default EAR
         is_drowsy = False
@@ -87,14 +97,15 @@ class ImprovedDrowsinessDetector:
             face = max(faces, key=lambda f: f[2] * f[3])
             x, y, w, h = face
             
-            # Draw rectangle around face
-            cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)
-            
             # Focus on upper half of face for better eye detection
             eye_region_y = y + int(h * 0.2)
             eye_region_h = int(h * 0.4)
             
-            roi_gray = gray[eye_region_y:eye_region_y + eye_region_h, x:x+w]
+            roi_gray = self.analysis.display_gray(frame, x, eye_region_y, w, eye_region_h)
+            
+            # Draw rectangle around face
+            cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)
+            
             roi_color = frame[eye_region_y:eye_region_y + eye_region_h, x:x+w]
             
             # Detect eyes within the eye region
@@ -160,26 +171,24 @@ class ImprovedDrowsinessDetector:
         print("[INFO] Starting video stream...")
         print("[INFO] Press 'q' to quit, 'r' to reset alarm")
         
-        cap = cv2.VideoCapture(source)
+        cap = open_source(source, width=self.buffers.width, height=self.buffers.height, fps=30)
         
         if not cap.isOpened():
             print("[ERROR] Could not open video source")
+            cap.release()
             return
         
-        # Set camera properties for better performance
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        cap.set(cv2.CAP_PROP_FPS, 30)
-        
         try:
             while True:
-                ret, frame = cap.read()
+                ret, frame = self.buffers.read(cap)
                 if not ret:
-                    print("[ERROR] Failed to read frame")
+                    if cap.live:
+                        # Camera is reconnecting in the background
+                        continue
                     break
                 
                 # Flip frame horizontally for mirror effect
-                frame = cv2.flip(frame, 1)
+                frame = self.buffers.flip(frame)
                 
                 processed_frame, ear, is_drowsy = self.detect_drowsiness(frame)
                 
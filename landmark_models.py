@@ -0,0 +1,148 @@
+import argparse
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+import dlib
+import numpy as np
+from imutils import face_utils
+
+EYE_PREDICTOR_PATH = os.environ.get("BLINKSENSE_EYE_PREDICTOR", "data/models/shape_predictor_eyes.dat")
+
+# iBUG 68-point indices of the two eyes (36-41 right, 42-47 left), which
+# become parts 0-11 of the eye-only model
+IBUG_EYE_POINTS = tuple(range(36, 48))
+EYE_ONLY_IDXS = {"right_eye": (0, 6), "left_eye": (6, 12)}
+
+_predictors = {}
+_predictors_lock = threading.Lock()
+
+
+def load_predictor(path):
+    """
+    Load a dlib shape predictor once per process
+
+    dlib deserializes the .dat file into its own heap, so the model cannot
+    be memory-mapped; instead every detector in the process (and every
+    forked worker, copy-on-write) shares the one loaded instance.
+    Args:
+        path: .dat file written by dlib.train_shape_predictor
+    Returns:
+        dlib.shape_predictor
+    """
+    key = (os.path.realpath(path), os.path.getmtime(path))
+    with _predictors_lock:
+        if key not in _predictors:
+            start = time.perf_counter()
+            _predictors[key] = dlib.shape_predictor(path)
+            size = os.path.getsize(path) / 1e6
+            print(f"[INFO] Loaded {os.path.basename(path)} ({size:.1f} MB) "
+                  f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return _predictors[key]
+
+
+def landmark_indexes(predictor):
+    """
+    Eye index ranges for a predictor's point layout
+    Returns:
+        Dict like face_utils.FACIAL_LANDMARKS_IDXS, or None for an unknown layout
+    """
+    # dlib's shape_predictor does not expose its point count; the shapes it
+    # returns do, so run it once on a blank image
+    blank = np.zeros((64, 64), dtype=np.uint8)
+    parts = predictor(blank, dlib.rectangle(8, 8, 56, 56)).num_parts
+    if parts == 68:
+        return face_utils.FACIAL_LANDMARKS_IDXS
+    if parts == len(IBUG_EYE_POINTS):
+        return EYE_ONLY_IDXS
+    return None
+
+
+def select_predictor(shape_predictor_path, eye_predictor_path=EYE_PREDICTOR_PATH):
+    """
+    Prefer the compact eye-only model when it exists
+    Returns:
+        (predictor, eye index ranges, True if it is the full 68-point model)
+    """
+    if eye_predictor_path and os.path.exists(eye_predictor_path):
+        predictor = load_predictor(eye_predictor_path)
+        idxs = landmark_indexes(predictor)
+        if idxs is EYE_ONLY_IDXS:
+            print("[INFO] Using the eye-only landmark model (no mouth/head-pose signals)")
+            return predictor, idxs, False
+        print(f"[WARNING] {eye_predictor_path} is not a 12-point eye model; ignoring it")
+    predictor = load_predictor(shape_predictor_path)
+    return predictor, face_utils.FACIAL_LANDMARKS_IDXS, True
+
+
+def subset_eye_annotations(src_xml, dst_xml):
+    """
+    Write a copy of a 68-point iBUG/dlib training XML keeping only the eye
+    points, renumbered 00-11
+    Returns:
+        Number of boxes written
+    """
+    tree = ET.parse(src_xml)
+    keep = {f"{i:02d}": f"{n:02d}" for n, i in enumerate(IBUG_EYE_POINTS)}
+    boxes = 0
+    for box in tree.getroot().iter("box"):
+        for part in list(box.findall("part")):
+            if part.get("name") in keep:
+                part.set("name", keep[part.get("name")])
+            else:
+                box.remove(part)
+        boxes += 1
+    tree.write(dst_xml)
+    return boxes
+
+
+def train_eye_predictor(train_xml, model_path=EYE_PREDICTOR_PATH, test_xml=None,
+                        tree_depth=4, cascade_depth=10, trees_per_level=250, threads=None):
+    """
+    Train the eye-only predictor from the existing 68-point annotations
+
+    Twelve points instead of 68 and fewer, shallower trees give a model of
+    a few MB instead of ~100 MB, which loads faster, takes less RSS and
+    costs less per face.
+    Args:
+        train_xml: 68-point training XML (e.g. iBUG 300-W labels_ibug_300W_train.xml)
+        model_path: Output .dat file
+        test_xml: Optional 68-point test XML for a mean-error report
+        tree_depth, cascade_depth, trees_per_level: Model size knobs
+        threads: Training threads (default all CPUs)
+    """
+    eye_train = os.path.splitext(model_path)[0] + "_train.xml"
+    print(f"[INFO] {subset_eye_annotations(train_xml, eye_train)} training faces")
+
+    options = dlib.shape_predictor_training_options()
+    options.tree_depth = tree_depth
+    options.cascade_depth = cascade_depth
+    options.num_trees_per_cascade_level = trees_per_level
+    options.nu = 0.1
+    options.oversampling_amount = 20
+    options.feature_pool_size = 400
+    options.num_threads = threads or os.cpu_count() or 1
+    options.be_verbose = True
+    dlib.train_shape_predictor(eye_train, model_path, options)
+    print(f"[INFO] Wrote {model_path} ({os.path.getsize(model_path) / 1e6:.1f} MB)")
+
+    if test_xml:
+        eye_test = os.path.splitext(model_path)[0] + "_test.xml"
+        subset_eye_annotations(test_xml, eye_test)
+        print(f"[INFO] Mean test error: {dlib.test_shape_predictor(eye_test, model_path):.2f} px")
+    return model_path
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Train the compact eye-only landmark model")
+    ap.add_argument("train_xml", help="68-point dlib/iBUG training XML")
+    ap.add_argument("-o", "--output", default=EYE_PREDICTOR_PATH, help="Output .dat file")
+    ap.add_argument("-t", "--test-xml", default=None, help="68-point test XML")
+    ap.add_argument("--tree-depth", type=int, default=4)
+    ap.add_argument("--cascade-depth", type=int, default=10)
+    ap.add_argument("--trees", type=int, default=250, help="Trees per cascade level")
+    ap.add_argument("--threads", type=int, default=None)
+    args = ap.parse_args()
+    train_eye_predictor(args.train_xml, args.output, args.test_xml, args.tree_depth,
+                        args.cascade_depth, args.trees, args.threads)
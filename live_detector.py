@@ -2,10 +2,11 @@ import cv2
 import time
 import winsound
 from threading import Thread
+from face_detector_dnn import create_face_detector
 
 class LiveDrowsinessDetector:
     def __init__(self):
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.face_cascade = create_face_detector()
         self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
         self.eyes_closed_start = None
         self.alarm_active = False
@@ -36,16 +36,48 @@ def main():
     ap.add_argument("-t", "--threshold", type=float, default=0.25, help="EAR threshold")
     ap.add_argument("-f", "--frames", type=int, default=20, help="Frame threshold")
     ap.add_argument("-a", "--alarm", type=str, default="data/sounds/alarm.wav", help="Alarm sound path")
+    ap.add_argument("--tiered", action="store_true",
+                    help="Run landmarks only when a cheap eye-region check is unsure")
+    ap.add_argument("--adaptive", action="store_true",
+                    help="Lower the landmark rate while EAR is high and stable")
+    ap.add_argument("--change-gate", action="store_true",
+                    help="Reuse the last result while the scene is unchanged")
+    ap.add_argument("--vehicle", type=str, default=None,
+                    help="NMEA/candump/CSV speed log or device; pause detection while parked")
+    ap.add_argument("--smooth", action="store_true",
+                    help="Filter landmarks and EAR; allows a lower --frames value")
+    ap.add_argument("--backend", type=str, default="auto", choices=["auto", "cnn"],
+                    help="auto: MediaPipe, dlib, then OpenCV; cnn: ONNX eye-state classifier")
+    ap.add_argument("--eye-model", type=str, default=None,
+                    help="ONNX eye-state model for --backend cnn")
+    ap.add_argument("--face-detector", type=str, default=None, choices=["haar", "yunet", "res10"],
+                    help="Face detector for the OpenCV and CNN backends")
+    ap.add_argument("--shm", type=str, default=None,
+                    help="Read frames from a shared-memory ring published by shared_frames.py")
     
     args = vars(ap.parse_args())
     
     try:
-        if USE_MEDIAPIPE:
+        if args["backend"] == "cnn":
+            from eye_state_detector import EyeStateDetector
+            from eye_state_classifier import EYE_MODEL_PATH
+            print("[INFO] Using CNN eye-state detection")
+            detector = EyeStateDetector(
+                model_path=args["eye_model"] or EYE_MODEL_PATH,
+                ear_consec_frames=args["frames"],
+                face_detector=args["face_detector"]
+            )
+        elif USE_MEDIAPIPE:
             print("[INFO] Using MediaPipe-based detection")
             detector = DrowsinessDetectorMediaPipe(
                 alarm_path=args["alarm"],
                 ear_thresh=args["threshold"],
-                ear_consec_frames=args["frames"]
+                ear_consec_frames=args["frames"],
+                tiered=args["tiered"],
+                adaptive=args["adaptive"],
+                change_gate=args["change_gate"],
+                vehicle_source=args["vehicle"],
+                smoothing=args["smooth"]
             )
         elif 'USE_DLIB' in locals() and USE_DLIB:
             print("[INFO] Using dlib-based detection")
@@ -53,28 +85,36 @@ def main():
                 shape_predictor_path="data/models/shape_predictor_68_face_landmarks.dat",
                 alarm_path=args["alarm"],
                 ear_thresh=args["threshold"],
-                ear_consec_frames=args["frames"]
+                ear_consec_frames=args["frames"],
+                tiered=args["tiered"],
+                adaptive=args["adaptive"],
+                change_gate=args["change_gate"],
+                vehicle_source=args["vehicle"],
+                smoothing=args["smooth"]
             )
         elif USE_IMPROVED:
             print("[INFO] Using improved time-based detection")
             detector = ImprovedDrowsinessDetector(
                 closed_eye_time_thresh=2.0,  # 2 seconds
-                ear_thresh=0.15  # Lower threshold for better detection
+                ear_thresh=0.15,  # Lower threshold for better detection
+                face_detector=args["face_detector"]
             )
         elif USE_SIMPLE:
             print("[INFO] Using simple OpenCV-based detection")
             detector = SimpleDrowsinessDetector(
                 ear_thresh=args["threshold"],
-                ear_consec_frames=args["frames"]
+                ear_consec_frames=args["frames"],
+                face_detector=args["face_detector"]
             )
         else:
             print("[ERROR] No detector available")
             sys.exit(1)
         
-        print(f"[INFO] Using video source: {args['webcam']}")
+        source = f"shm:{args['shm']}" if args["shm"] else args["webcam"]
+        print(f"[INFO] Using video source: {source}")
         print("[INFO] Press 'q' to quit the detection")
         
-        detector.run_detection(args["webcam"])
+        detector.run_detection(source)
         
     except Exception as e:
         print(f"[ERROR] An error occurred: {e}")
@@ -0,0 +1,128 @@
+import os
+
+import cv2
+import numpy as np
+
+# Mean absolute difference (0-255) of the thumbnail that counts as a change
+CHANGE_THRESHOLD = float(os.environ.get("BLINKSENSE_CHANGE_THRESHOLD", "2.5"))
+# Mean absolute difference of a tracked eye region that counts as a change
+REGION_THRESHOLD = float(os.environ.get("BLINKSENSE_REGION_THRESHOLD", "4.0"))
+# Unchanged frames allowed before inference is forced anyway; well under
+# the 2 s closed-eye alert time at 30 FPS
+CHANGE_MAX_SKIP = int(os.environ.get("BLINKSENSE_CHANGE_MAX_SKIP", "15"))
+
+
+class ChangeGate:
+    def __init__(self, threshold=CHANGE_THRESHOLD, size=(32, 24), max_skip=CHANGE_MAX_SKIP,
+                 region_threshold=REGION_THRESHOLD, region_size=(16, 8)):
+        """
+        Frame-differencing gate in front of face/eye inference
+
+        Each frame is shrunk to a tiny thumbnail and compared with the
+        thumbnail of the last frame inference ran on. While the scene is
+        effectively unchanged (parked vehicle, static stretch of footage) the
+        caller reuses its last result. Comparing against the last inferred
+        frame rather than the previous one means slow drift still adds up
+        to a change, and max_skip forces a refresh every so often.
+
+        An eyelid closing on a still driver hardly changes the whole-frame
+        thumbnail, so callers also register the eye regions of their last
+        result with track_regions(); each is compared on its own, at a
+        resolution where a closing eye is a large change.
+
+        Args:
+            threshold: Mean absolute thumbnail difference (0-255) that counts
+                as a change
+            size: (width, height) of the comparison thumbnail
+            max_skip: Unchanged frames allowed before inference is forced
+            region_threshold: Mean absolute difference of one tracked region
+                that counts as a change
+            region_size: (width, height) regions are compared at
+        """
+        self.threshold = threshold
+        self.size = size
+        self.max_skip = max_skip
+        self.region_threshold = region_threshold
+        self.region_size = region_size
+        self._regions = []      # (box, reference thumbnail)
+        self.last_region_diff = 0.0
+
+        self._thumb = np.empty((size[1], size[0]), dtype=np.uint8)
+        self._reference = None
+        self._skipped_run = 0
+        self.last_diff = 0.0
+
+        # Stats
+        self.processed = 0
+        self.skipped = 0
+
+    def reset(self):
+        """Force inference on the next frame"""
+        self._reference = None
+        self._regions = []
+
+    def _region_thumb(self, gray, box):
+        x, y, w, h = (int(v) for v in box)
+        # Padded so eyelid movement just outside a tight eye box still counts
+        pad_x, pad_y = w // 4, max(2, h // 2)
+        crop = gray[max(0, y - pad_y):y + h + pad_y, max(0, x - pad_x):x + w + pad_x]
+        if crop.size == 0:
+            return None
+        return cv2.resize(crop, self.region_size, interpolation=cv2.INTER_AREA)
+
+    def track_regions(self, gray, boxes):
+        """
+        Remember regions of the frame inference just ran on
+        Args:
+            gray: The same grayscale frame passed to changed()
+            boxes: (x, y, w, h) boxes in its coordinates, e.g. eye regions
+        """
+        self._regions = [(box, thumb) for box in boxes
+                         for thumb in [self._region_thumb(gray, box)] if thumb is not None]
+
+    def _regions_changed(self, gray):
+        self.last_region_diff = 0.0
+        for box, reference in self._regions:
+            thumb = self._region_thumb(gray, box)
+            if thumb is None:
+                return True
+            diff = cv2.norm(thumb, reference, cv2.NORM_L1) / thumb.size
+            self.last_region_diff = max(self.last_region_diff, diff)
+        return self.last_region_diff > self.region_threshold
+
+    def changed(self, gray, force=False):
+        """
+        Args:
+            gray: Grayscale frame (any size)
+            force: Treat the frame as changed, e.g. while an alert timer runs
+        Returns:
+            True if inference has to run, False to reuse the last result
+        """
+        thumb = cv2.resize(gray, self.size, dst=self._thumb, interpolation=cv2.INTER_AREA)
+        if self._reference is not None:
+            self.last_diff = cv2.norm(thumb, self._reference, cv2.NORM_L1) / thumb.size
+
+        if (force or self._reference is None or self._skipped_run >= self.max_skip or
+                self.last_diff > self.threshold or self._regions_changed(gray)):
+            if self._reference is None:
+                self._reference = thumb.copy()
+            else:
+                np.copyto(self._reference, thumb)
+            self._skipped_run = 0
+            self.processed += 1
+            return True
+
+        self._skipped_run += 1
+        self.skipped += 1
+        return False
+
+    def stats(self):
+        total = self.processed + self.skipped
+        return {
+            'processed_frames': self.processed,
+            'skipped_frames': self.skipped,
+            'skip_ratio': self.skipped / total if total else 0.0,
+            'last_diff': self.last_diff,
+            'last_region_diff': self.last_region_diff,
+            'threshold': self.threshold,
+        }
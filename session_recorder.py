@@ -0,0 +1,338 @@
+import argparse
+import atexit
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import cv2
+
+from shared_frames import SOURCE_PREFIX, SharedFrameRing, frame_source, open_source
+
+RECORDINGS_DIR = os.environ.get("BLINKSENSE_RECORDINGS_DIR", "recordings")
+RECORDING_QUOTA_GB = float(os.environ.get("BLINKSENSE_RECORDING_QUOTA_GB", "32"))
+RETENTION_HOURS = float(os.environ.get("BLINKSENSE_RETENTION_HOURS", "48"))
+SEGMENT_SECONDS = 60
+RECORD_FPS = 10
+RECORD_WIDTH = 640
+MIN_FREE_BYTES = 1024 ** 3
+
+# H.264 where the OpenCV build has an encoder for it, MPEG-4 part 2 otherwise
+FOURCCS = ("avc1", "mp4v")
+SEGMENT_NAME = re.compile(r"^session_(\d{8}_\d{6})_(\d+)s\.mp4$")
+
+
+def segment_index(folder=RECORDINGS_DIR, start=None, end=None):
+    """
+    Finished segments, oldest first
+    The start time and duration are part of each file name, so the
+    directory listing is the index and nothing can get out of step with it.
+    Args:
+        start, end: Only segments overlapping this time range (epoch seconds)
+    Returns:
+        List of {'name', 'start', 'end', 'bytes'}
+    """
+    segments = []
+    if not os.path.isdir(folder):
+        return segments
+    for entry in os.scandir(folder):
+        match = SEGMENT_NAME.match(entry.name)
+        if not match:
+            continue
+        begin = time.mktime(time.strptime(match.group(1), "%Y%m%d_%H%M%S"))
+        finish = begin + int(match.group(2))
+        if (start is not None and finish < start) or (end is not None and begin > end):
+            continue
+        segments.append({'name': entry.name, 'start': begin, 'end': finish,
+                         'bytes': entry.stat().st_size})
+    segments.sort(key=lambda s: s['start'])
+    return segments
+
+
+def enforce_retention(folder=RECORDINGS_DIR, quota_bytes=RECORDING_QUOTA_GB * 1024 ** 3,
+                      retention_hours=RETENTION_HOURS, min_free_bytes=MIN_FREE_BYTES):
+    """
+    Delete segments oldest first until all are inside the retention window,
+    their total fits the quota and the disk keeps min_free_bytes free
+    Returns:
+        Names of the deleted segments
+    """
+    segments = segment_index(folder)
+    total = sum(s['bytes'] for s in segments)
+    cutoff = time.time() - retention_hours * 3600
+    removed = []
+    # The newest segment is never deleted
+    while len(segments) > 1:
+        oldest = segments[0]
+        if (oldest['end'] >= cutoff and total <= quota_bytes and
+                shutil.disk_usage(folder).free >= min_free_bytes):
+            break
+        try:
+            os.remove(os.path.join(folder, oldest['name']))
+        except FileNotFoundError:
+            pass
+        total -= oldest['bytes']
+        removed.append(segments.pop(0)['name'])
+    return removed
+
+
+_fourccs = list(FOURCCS)
+
+
+def open_writer(path, fps, size):
+    """VideoWriter with the first codec in FOURCCS this OpenCV build can encode"""
+    for fourcc in list(_fourccs):
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+        if writer.isOpened():
+            return writer
+        writer.release()
+        # Do not probe a missing encoder again for every segment
+        if len(_fourccs) > 1:
+            _fourccs.remove(fourcc)
+    raise RuntimeError(f"No video encoder available for {path}")
+
+
+def record_segments(source, folder=RECORDINGS_DIR, segment_seconds=SEGMENT_SECONDS, fps=RECORD_FPS,
+                    width=RECORD_WIDTH, quota_bytes=RECORDING_QUOTA_GB * 1024 ** 3,
+                    retention_hours=RETENTION_HOURS):
+    """
+    Encode a frame source into fixed-length MP4 segments until it stops
+    Args:
+        source: Camera index, video path or "shm:NAME" frame ring
+        segment_seconds: Length of each segment
+        fps: Recorded frame rate; gaps in a live source are filled by
+            repeating the last frame so segments keep wall-clock time.
+            Video files are paced by their own frame rate and end the
+            recording when they end.
+        width: Frames wider than this are scaled down
+        quota_bytes, retention_hours: Passed to enforce_retention
+    """
+    os.makedirs(folder, exist_ok=True)
+    capture = open_source(source)
+    interval = 1.0 / fps
+    # Media time of a file: frames read over its frame rate, from now
+    media_fps = (capture.cap.get(cv2.CAP_PROP_FPS) if capture.cap is not None else 0) if not capture.live else 0
+    opened, frames_read = time.time(), 0
+    writer = tmp = None
+    started = written = 0.0
+    frames = 0
+    frame = None
+
+    def close_segment():
+        nonlocal writer
+        writer.release()
+        writer = None
+        seconds = max(1, round(frames * interval))
+        name = f"session_{datetime.fromtimestamp(started).strftime('%Y%m%d_%H%M%S')}_{seconds}s.mp4"
+        os.replace(tmp, os.path.join(folder, name))
+        for removed in enforce_retention(folder, quota_bytes, retention_hours):
+            print(f"[INFO] Retention: deleted {removed}")
+
+    try:
+        while capture.isOpened():
+            ret, frame = capture.read(frame)
+            if not ret and not capture.live:
+                break   # End of the file
+            if capture.live:
+                now = time.time()
+            else:
+                frames_read += 1
+                now = opened + frames_read / (media_fps or fps)
+            if writer is not None and now - started >= segment_seconds:
+                close_segment()
+            # 1 ms slack so rounding does not drop a frame that is exactly due
+            if not ret or now - written < interval - 0.001:
+                continue
+
+            image = frame
+            if image.shape[1] > width:
+                height = round(image.shape[0] * width / image.shape[1]) // 2 * 2
+                image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+            if writer is None:
+                # A hidden name until the segment is complete, so it is
+                # neither indexed nor served half-written
+                tmp = os.path.join(folder, ".recording.mp4")
+                writer = open_writer(tmp, fps, (image.shape[1], image.shape[0]))
+                started = written = now
+                frames = 0
+            repeats = min(fps * 2, max(1, round((now - written) / interval))) if frames else 1
+            for _ in range(int(repeats)):
+                writer.write(image)
+            frames += int(repeats)
+            written = now
+    finally:
+        if writer is not None:
+            close_segment()
+        capture.release()
+
+
+class SessionRecorder:
+    def __init__(self, source=None, folder=RECORDINGS_DIR, segment_seconds=SEGMENT_SECONDS,
+                 fps=RECORD_FPS, width=RECORD_WIDTH, quota_gb=RECORDING_QUOTA_GB,
+                 retention_hours=RETENTION_HOURS, restart_delay=5.0):
+        """
+        Background session recording in a separate process
+
+        Encoding runs in its own process, reading the frame ring, so it
+        never competes with detection for the GIL. It is a fresh interpreter
+        running this module's command line rather than a fork of the
+        threaded server (or a multiprocessing spawn, which re-runs the
+        server script's module-level setup). Without
+        a ring (BLINKSENSE_FRAME_RING unset) a feeder thread copies frames
+        from the in-process camera into a private ring at the recording
+        rate. The process is restarted if it dies.
+
+        Args:
+            source: "shm:NAME" ring to record; None = this server's frame source
+            folder: Segment directory
+            segment_seconds, fps, width: See record_segments
+            quota_gb: Disk quota for all segments
+            retention_hours: Segments older than this are deleted
+        """
+        self.source = source
+        self.folder = os.path.abspath(folder)
+        self.fps = fps
+        self.options = ["-o", self.folder, "--segment", str(segment_seconds), "--fps", str(fps),
+                        "--width", str(width), "--quota-gb", str(quota_gb),
+                        "--retention-hours", str(retention_hours), "--threads", "1"]
+        self.quota_bytes = quota_gb * 1024 ** 3
+        self.restart_delay = restart_delay
+        self.process = None
+        self.ring = None
+        self.restarts = 0
+        self.running = False
+
+    def _feed(self, capture, interval):
+        frame = None
+        while self.running:
+            ret, frame = capture.read(frame)
+            if not ret:
+                continue
+            if self.ring is None:
+                self.ring = SharedFrameRing.create(shape=frame.shape)
+                self.source = SOURCE_PREFIX + self.ring.name
+            self.ring.write(frame)
+            time.sleep(interval)
+
+    def _spawn(self):
+        # Own session: Ctrl+C in the server's terminal is left to stop()
+        self.process = subprocess.Popen([sys.executable, os.path.abspath(__file__), self.source] + self.options,
+                                        start_new_session=True)
+
+    def _monitor(self):
+        while self.running:
+            if self.source is None:
+                time.sleep(0.5)     # Feeder has not created the ring yet
+                continue
+            self._spawn()
+            self.process.wait()
+            if self.running:
+                self.restarts += 1
+                print(f"[WARNING] Recorder exited with code {self.process.returncode}; "
+                      f"restarting in {self.restart_delay:.1f}s")
+                time.sleep(self.restart_delay)
+
+    def start(self):
+        self.running = True
+        if self.source is None:
+            name = os.environ.get("BLINKSENSE_FRAME_RING")
+            if name:
+                self.source = SOURCE_PREFIX + name
+            else:
+                threading.Thread(target=self._feed, args=(frame_source(), 1.0 / self.fps),
+                                 name="recorder-feed", daemon=True).start()
+        threading.Thread(target=self._monitor, name="recorder-monitor", daemon=True).start()
+        atexit.register(self.stop)
+        print(f"[INFO] Recording sessions to {self.folder}")
+        return self
+
+    def stop(self, timeout=10.0):
+        self.running = False
+        if self.process is not None and self.process.poll() is None:
+            # SIGTERM lets the child finish its current segment
+            self.process.terminate()
+            try:
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.ring is not None:
+            self.ring.release()
+
+    def stats(self):
+        segments = segment_index(self.folder)
+        return {'recording': self.process is not None and self.process.poll() is None,
+                'segments': len(segments), 'bytes': sum(s['bytes'] for s in segments),
+                'quota_bytes': int(self.quota_bytes), 'restarts': self.restarts,
+                'oldest': segments[0]['start'] if segments else None}
+
+
+def recorder_from_env(debug=False):
+    """Start a SessionRecorder if BLINKSENSE_RECORD=1, else return None"""
+    if os.environ.get("BLINKSENSE_RECORD") != "1":
+        return None
+    # Under the Flask debug reloader only the serving child records
+    if debug and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        return None
+    return SessionRecorder().start()
+
+
+def register_recordings(app, folder=RECORDINGS_DIR):
+    """
+    Add the recording routes to a Flask app
+    GET /api/recordings?start=&end=  segment index (epoch seconds)
+    GET /api/recordings/<name>       one segment, with Range support
+    """
+    from flask import abort, jsonify, request, send_file
+    folder = os.path.abspath(folder)
+
+    @app.route('/api/recordings')
+    def recordings_index():
+        start = request.args.get('start', type=float)
+        end = request.args.get('end', type=float)
+        segments = segment_index(folder, start, end)
+        for segment in segments:
+            segment['url'] = f"/api/recordings/{segment['name']}"
+        return jsonify(segments)
+
+    @app.route('/api/recordings/<name>')
+    def recording_segment(name):
+        path = os.path.join(folder, name)
+        if not SEGMENT_NAME.match(name) or not os.path.isfile(path):
+            abort(404)
+        # conditional=True answers Range requests with 206 and partial
+        # bodies; the file is handed to the server's wsgi.file_wrapper
+        # (sendfile under gunicorn, X-Sendfile with USE_X_SENDFILE)
+        return send_file(path, mimetype='video/mp4', conditional=True, max_age=3600)
+
+    return folder
+
+
+def parse_source(value):
+    return int(value) if value.isdigit() else value
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Record a camera or frame ring into rotating segments")
+    ap.add_argument("source", nargs="?", default="0", help="Webcam index, video path or shm:NAME ring")
+    ap.add_argument("-o", "--output", type=str, default=RECORDINGS_DIR, help="Segment directory")
+    ap.add_argument("--segment", type=int, default=SEGMENT_SECONDS, help="Segment length in seconds")
+    ap.add_argument("--fps", type=int, default=RECORD_FPS, help="Recorded frame rate")
+    ap.add_argument("--width", type=int, default=RECORD_WIDTH, help="Maximum recorded width")
+    ap.add_argument("--quota-gb", type=float, default=RECORDING_QUOTA_GB, help="Disk quota")
+    ap.add_argument("--retention-hours", type=float, default=RETENTION_HOURS, help="Footage kept")
+    ap.add_argument("--threads", type=int, default=0, help="OpenCV threads (0 = OpenCV's default)")
+    args = ap.parse_args()
+    if args.threads:
+        cv2.setNumThreads(args.threads)
+    # SIGTERM (SessionRecorder.stop, docker stop) exits through the finally that closes the segment
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        record_segments(parse_source(args.source), args.output, args.segment, args.fps, args.width,
+                        args.quota_gb * 1024 ** 3, args.retention_hours)
+    except KeyboardInterrupt:
+        print("\n[INFO] Recording stopped by user")
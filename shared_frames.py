@@ -0,0 +1,258 @@
+import argparse
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from camera_capture import CaptureService, shared_capture, shared_capture_stats
+from frame_buffer import DISPLAY_SIZE
+
+MAGIC = 0x424C4E4B  # "BLNK"
+HEADER_WORDS = 8    # magic, slots, height, width, channels, latest, writer pid, reserved
+SLOT_HEADER = 16    # seq (uint64) + timestamp (float64)
+SOURCE_PREFIX = "shm:"
+READ_RETRIES = 200  # ~0.1 s of 0.5 ms waits for a slot being written
+
+
+def _attach(name):
+    """Attach without letting this process's resource tracker unlink the block at exit"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no track flag; skip registration so a reader sharing
+        # the writer's tracker does not drop the writer's registration either
+        from multiprocessing import resource_tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedFrameRing:
+    def __init__(self, shm, owner=False):
+        """
+        Ring of frame slots in shared memory with a latest-frame handoff
+
+        One writer process publishes frames; any number of reader processes
+        pick up the newest one without pickling or locks. Each slot carries a
+        sequence number used as a seqlock: the writer marks the slot odd while
+        copying in and even (2 * frame number) when done, and readers retry if
+        the number moved while they were reading.
+
+        Use SharedFrameRing.create() in the capture process and
+        SharedFrameRing.attach() in readers.
+        """
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((HEADER_WORDS,), dtype=np.uint64, buffer=shm.buf)
+        if int(self.header[0]) != MAGIC:
+            raise ValueError(f"Shared memory block {shm.name} is not a frame ring")
+
+        self.slots = int(self.header[1])
+        self.shape = (int(self.header[2]), int(self.header[3]), int(self.header[4]))
+        frame_bytes = int(np.prod(self.shape))
+        self.slot_size = SLOT_HEADER + frame_bytes
+
+        base = HEADER_WORDS * 8
+        self._slot_seq = []
+        self._slot_time = []
+        self._slot_data = []
+        for i in range(self.slots):
+            offset = base + i * self.slot_size
+            self._slot_seq.append(np.ndarray((1,), dtype=np.uint64, buffer=shm.buf, offset=offset))
+            self._slot_time.append(np.ndarray((1,), dtype=np.float64, buffer=shm.buf, offset=offset + 8))
+            self._slot_data.append(np.ndarray(self.shape, dtype=np.uint8, buffer=shm.buf,
+                                              offset=offset + SLOT_HEADER))
+
+        self._count = int(self.header[5])
+        self._local = threading.local()
+        self.live = True
+        self.running = True
+
+    @classmethod
+    def create(cls, name=None, shape=(480, 640, 3), slots=4):
+        """
+        Allocate a new ring
+        Args:
+            name: Shared memory name readers attach to (random if None)
+            shape: (height, width, channels) of every frame
+            slots: Number of frame slots; 3+ keeps readers from being lapped
+        """
+        height, width, channels = shape
+        size = HEADER_WORDS * 8 + slots * (SLOT_HEADER + height * width * channels)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_WORDS,), dtype=np.uint64, buffer=shm.buf)
+        header[:] = [MAGIC, slots, height, width, channels, 0, os.getpid(), 0]
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(_attach(name))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, frame, timestamp=None):
+        """Publish a frame; returns its frame number"""
+        n = self._count + 1
+        slot = n % self.slots
+        self._slot_seq[slot][0] = 2 * n - 1
+        np.copyto(self._slot_data[slot], frame)
+        self._slot_time[slot][0] = timestamp or time.time()
+        self._slot_seq[slot][0] = 2 * n
+        self.header[5] = n
+        self._count = n
+        return n
+
+    def latest(self):
+        """Number of the newest published frame (0 before the first)"""
+        return int(self.header[5])
+
+    def read_latest(self, image=None):
+        """
+        Copy the newest frame out of the ring
+        Returns:
+            (frame number, timestamp, frame), or (0, None, None) if nothing was
+            published or no consistent copy was made within READ_RETRIES tries
+            (e.g. the writer died in the middle of a frame)
+        """
+        for _ in range(READ_RETRIES):
+            n = int(self.header[5])
+            if n == 0:
+                return 0, None, None
+            slot = n % self.slots
+            if int(self._slot_seq[slot][0]) != 2 * n:
+                # Slot already being reused for a newer frame; let the writer finish
+                time.sleep(0.0005)
+                continue
+            if image is None or image.shape != self.shape or image.dtype != np.uint8:
+                image = np.empty(self.shape, dtype=np.uint8)
+            np.copyto(image, self._slot_data[slot])
+            timestamp = float(self._slot_time[slot][0])
+            if int(self._slot_seq[slot][0]) == 2 * n:
+                return n, timestamp, image
+        return 0, None, None
+
+    def read(self, image=None, timeout=1.0, poll=0.002):
+        """
+        VideoCapture-style read of the newest frame not yet seen by this thread
+        Returns:
+            (success, frame)
+        """
+        last = getattr(self._local, "seq", 0)
+        deadline = time.time() + timeout
+        while self.latest() <= last:
+            if time.time() >= deadline:
+                return False, None
+            time.sleep(poll)
+        n, timestamp, image = self.read_latest(image)
+        if image is None:
+            return False, None
+        self._local.seq = n
+        self._local.timestamp = timestamp
+        return True, image
+
+    def frame_age(self):
+        """Seconds since the frame last returned by read() was published"""
+        timestamp = getattr(self._local, "timestamp", None)
+        return time.time() - timestamp if timestamp else None
+
+    def isOpened(self):
+        return self.running
+
+    def stats(self):
+        return {
+            'ring': self.name,
+            'slots': self.slots,
+            'frames_published': self.latest(),
+            'writer_pid': int(self.header[6]),
+        }
+
+    def release(self):
+        """Detach; the owner also removes the shared memory block"""
+        self.running = False
+        self.header = None
+        self._slot_seq = self._slot_time = self._slot_data = []
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    stop = release
+
+
+def open_source(source=0, **kwargs):
+    """
+    Open a frame source for the detection loops
+    Release it even when isOpened() is False: a live camera starts its
+    reconnect thread before the first open has succeeded.
+    Args:
+        source: "shm:NAME" to attach to a frame ring, otherwise a camera index
+            or video path for CaptureService
+    """
+    if isinstance(source, str) and source.startswith(SOURCE_PREFIX):
+        return SharedFrameRing.attach(source[len(SOURCE_PREFIX):])
+    return CaptureService(source, **kwargs).start()
+
+
+_ring = None
+_ring_lock = threading.Lock()
+
+
+def frame_source():
+    """Shared source for the Flask servers: BLINKSENSE_FRAME_RING if set, else the camera"""
+    global _ring
+    name = os.environ.get("BLINKSENSE_FRAME_RING")
+    if not name:
+        return shared_capture()
+    with _ring_lock:
+        if _ring is None:
+            _ring = SharedFrameRing.attach(name)
+        return _ring
+
+
+def frame_source_stats():
+    """Stats of the shared source without opening it ({} before first use)"""
+    if os.environ.get("BLINKSENSE_FRAME_RING"):
+        return _ring.stats() if _ring is not None else {}
+    return shared_capture_stats()
+
+
+def run_capture_process(source, name, width=640, height=480, slots=4):
+    """Capture from a camera into a new frame ring until interrupted"""
+    capture = CaptureService(source, width, height).start()
+    ring = SharedFrameRing.create(name, (height, width, 3), slots)
+    print(f"[INFO] Publishing camera {source} to shared memory '{ring.name}'")
+    frame = None
+    try:
+        while capture.running:
+            ret, frame = capture.read(frame)
+            if not ret:
+                continue
+            if frame.shape != ring.shape:
+                print(f"[ERROR] Camera delivers {frame.shape}, ring expects {ring.shape}")
+                break
+            ring.write(frame)
+    except KeyboardInterrupt:
+        print("\n[INFO] Capture stopped by user")
+    finally:
+        capture.release()
+        ring.release()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Publish camera frames to shared memory")
+    ap.add_argument("-w", "--webcam", type=int, default=0, help="Webcam index")
+    ap.add_argument("-n", "--name", type=str, default="blinksense_cam0", help="Shared memory name")
+    ap.add_argument("--width", type=int, default=DISPLAY_SIZE[0], help="Frame width")
+    ap.add_argument("--height", type=int, default=DISPLAY_SIZE[1], help="Frame height")
+    ap.add_argument("--slots", type=int, default=4, help="Ring slots")
+    args = ap.parse_args()
+    run_capture_process(args.webcam, args.name, args.width, args.height, args.slots)
@@ -1,14 +1,18 @@
-from flask import Flask, render_template_string, Response
+from flask import Flask, Response
 import cv2
 import time
 import winsound
 import threading
+from shared_frames import frame_source
+from face_detector_dnn import create_face_detector
+from static_assets import compile_page, register_static
 
 app = Flask(__name__)
+register_static(app)
 
 class BlinkSenseDetector:
     def __init__(self):
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.face_cascade = create_face_detector()
         self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
         self.closed_start = None
         self.is_drowsy = False
@@ -80,14 +84,12 @@ class BlinkSenseDetector:
 detector = BlinkSenseDetector()
 
 def generate_frames():
-    camera = cv2.VideoCapture(0)
-    if not camera.isOpened():
-        camera = cv2.VideoCapture(0, cv2.CAP_DSHOW)
+    camera = frame_source()
     
-    while True:
+    while camera.running:
         success, frame = camera.read()
         if not success:
-            break
+            continue
         
         # Flip frame for mirror effect
         frame = cv2.flip(frame, 1)
@@ -102,9 +104,7 @@ def generate_frames():
         yield (b'--frame\r\n'
                b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
 
-@app.route('/')
-def index():
-    return render_template_string('''
+INDEX_PAGE = compile_page(app, '''
 <!DOCTYPE html>
 <html>
 <head>
@@ -292,6 +292,10 @@ def index():
 </html>
     ''')
 
+@app.route('/')
+def index():
+    return INDEX_PAGE.response()
+
 @app.route('/video_feed')
 def video_feed():
     return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
@@ -2,11 +2,17 @@ import cv2
 import numpy as np
 import time
 from threading import Thread
+from frame_buffer import FrameBufferPool, AnalysisFrame, DISPLAY_SIZE
+from shared_frames import open_source
+from face_detector_dnn import create_face_detector, load_eye_cascade
 
 class SimpleDrowsinessDetector:
-    def __init__(self, ear_thresh=0.25, ear_consec_frames=20):
+    def __init__(self, ear_thresh=0.25, ear_consec_frames=20, face_detector=None):
         """
         Simple drowsiness detector using OpenCV's built-in face detection
+        
+        face_detector picks "haar", "yunet" or "res10" (default from
+        BLINKSENSE_FACE_DETECTOR)
         """
         self.EYE_AR_THRESH = ear_thresh
         self.EYE_AR_CONSEC_FRAMES = ear_consec_frames
@@ -15,9 +21,13 @@ class SimpleDrowsinessDetector:
         self.COUNTER = 0
         self.ALARM_ON = False
         
-        # Load OpenCV's pre-trained face and eye cascade classifiers
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+        # Face detector (Haar cascade or cv2.dnn) and eye cascade
+        self.face_cascade = create_face_detector(face_detector)
+        self.eye_cascade = load_eye_cascade()
+        
+        # Reused capture/resize/grayscale buffers
+        self.buffers = FrameBufferPool(*DISPLAY_SIZE)
+        self.analysis = AnalysisFrame(self.buffers)
         
         print("[INFO] Simple Drowsiness detector initialized successfully!")
     
@@ -47,20 +57,21 @@ class SimpleDrowsinessDetector:
     
     def detect_drowsiness(self, frame):
         """Process a single frame for drowsiness detection"""
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        small_gray = self.analysis.prepare(frame)
         
-        # Detect faces
-        faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
+        # Detect faces on the analysis frame, mapped back to display coordinates
+        faces = [self.analysis.to_display(face) for face in self.face_cascade.detectMultiScale(small_gray, 1.3, 5)]
         
         ear = 0.3  # Default EAR
         is_drowsy = False
         
         for (x, y, w, h) in faces:
+            # Region of interest for eyes, at display resolution
+            roi_gray = self.analysis.display_gray(frame, x, y, w, h)
+            
             # Draw rectangle around face
             cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)
             
-            # Region of interest for eyes
-            roi_gray = gray[y:y+h, x:x+w]
             roi_color = frame[y:y+h, x:x+w]
             
             # Detect eyes within the face
@@ -107,19 +118,23 @@ class SimpleDrowsinessDetector:
     def run_detection(self, source=0):
         """Run real-time drowsiness detection"""
         print("[INFO] Starting video stream...")
-        cap = cv2.VideoCapture(source)
+        # Camera is negotiated to the display size so resize is normally skipped
+        cap = open_source(source, width=self.buffers.width, height=self.buffers.height)
         
         if not cap.isOpened():
             print("[ERROR] Could not open video source")
+            cap.release()
             return
         
         try:
             while True:
-                ret, frame = cap.read()
+                ret, frame = self.buffers.read(cap)
                 if not ret:
+                    if cap.live:
+                        continue
                     break
                 
-                frame = cv2.resize(frame, (640, 480))
+                frame = self.buffers.resize(frame)
                 processed_frame, ear, is_drowsy = self.detect_drowsiness(frame)
                 
                 cv2.imshow("Simple Drowsiness Detection", processed_frame)
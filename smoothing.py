@@ -0,0 +1,214 @@
+import math
+import time
+
+import numpy as np
+
+
+def _alpha(cutoff, dt):
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    def __init__(self, min_cutoff=1.0, beta=0.05, d_cutoff=1.0):
+        """
+        One-euro filter (Casiez et al.) for a scalar or an array of values
+
+        Smooths heavily while the signal is still and follows quickly when
+        it moves, so landmark jitter is removed without lagging real motion.
+        Works on timestamps, so irregular frame spacing is handled.
+
+        Args:
+            min_cutoff: Cutoff frequency (Hz) at rest; lower = smoother
+            beta: Speed coefficient; higher = less lag on fast motion
+            d_cutoff: Cutoff frequency for the derivative estimate
+        """
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self.x = None
+        self.dx = None
+        self.t = None
+
+    def __call__(self, x, t=None):
+        t = time.time() if t is None else t
+        x = np.asarray(x, dtype=np.float64)
+        if self.x is None or self.x.shape != x.shape:
+            self.x, self.dx, self.t = x.copy(), np.zeros_like(x), t
+            return x.copy()
+        dt = t - self.t
+        if dt <= 0:
+            return self.x.copy()
+        self.t = t
+
+        dx = (x - self.x) / dt
+        self.dx += _alpha(self.d_cutoff, dt) * (dx - self.dx)
+        cutoff = self.min_cutoff + self.beta * np.abs(self.dx)
+        self.x += _alpha(cutoff, dt) * (x - self.x)
+        return self.x.copy()
+
+
+class EARKalman:
+    def __init__(self, process_noise=2.0, measurement_noise=0.02, max_horizon=0.5,
+                 limits=(0.0, 0.5)):
+        """
+        Constant-velocity Kalman filter on EAR with prediction between
+        inference frames
+
+        The state is (EAR, EAR rate). update() folds in a measured EAR;
+        predict() extrapolates to any later time so frames that skipped
+        inference still get a current estimate. Prediction is capped at
+        max_horizon seconds past the last measurement and clamped to limits.
+
+        Args:
+            process_noise: Acceleration noise (EAR/s^2) - how fast EAR may change
+            measurement_noise: Standard deviation of a single EAR measurement
+            max_horizon: Longest extrapolation in seconds
+            limits: (low, high) clamp for the estimate
+        """
+        self.q = process_noise ** 2
+        self.r = measurement_noise ** 2
+        self.max_horizon = max_horizon
+        self.limits = limits
+        self.reset()
+
+    def reset(self):
+        self.x = None    # EAR
+        self.v = 0.0     # EAR per second
+        self.p = None    # 2x2 covariance as (p00, p01, p11)
+        self.t = None
+
+    def _clamp(self, value):
+        return min(self.limits[1], max(self.limits[0], value))
+
+    def _propagate(self, dt):
+        p00, p01, p11 = self.p
+        q = self.q
+        # F = [[1, dt], [0, 1]], white-acceleration process noise
+        p00 = p00 + 2 * dt * p01 + dt * dt * p11 + q * dt ** 4 / 4
+        p01 = p01 + dt * p11 + q * dt ** 3 / 2
+        p11 = p11 + q * dt * dt
+        return self.x + self.v * dt, (p00, p01, p11)
+
+    def update(self, ear, t=None):
+        """Fold in a measured EAR; returns the filtered EAR"""
+        t = time.time() if t is None else t
+        if self.x is None:
+            self.x, self.v, self.p, self.t = ear, 0.0, (self.r, 0.0, 1.0), t
+            return self.x
+
+        dt = max(0.0, t - self.t)
+        x, (p00, p01, p11) = self._propagate(dt)
+        k0 = p00 / (p00 + self.r)
+        k1 = p01 / (p00 + self.r)
+        residual = ear - x
+        self.x = x + k0 * residual
+        self.v = self.v + k1 * residual
+        self.p = ((1 - k0) * p00, (1 - k0) * p01, p11 - k1 * p01)
+        self.t = t
+        return self._clamp(self.x)
+
+    def predict(self, t=None):
+        """EAR estimate at time t without a new measurement (None before the first)"""
+        if self.x is None:
+            return None
+        t = time.time() if t is None else t
+        dt = min(max(0.0, t - self.t), self.max_horizon)
+        return self._clamp(self.x + self.v * dt)
+
+
+class FaceFilter:
+    def __init__(self, min_cutoff=1.0, beta=0.05, **kalman_options):
+        """
+        Per-face smoothing: one-euro on landmarks, Kalman on EAR
+
+        Keep one instance per tracked face and reset() it when the face is
+        lost, so a new face does not inherit the previous one's state.
+        """
+        self.points = OneEuroFilter(min_cutoff, beta)
+        self.ear = EARKalman(**kalman_options)
+
+    def reset(self):
+        self.points.reset()
+        self.ear.reset()
+
+    def update(self, points, ear, t=None):
+        """
+        Args:
+            points: Landmark array from an inference frame
+            ear: EAR measured on that frame
+        Returns:
+            (smoothed points, filtered EAR)
+        """
+        t = time.time() if t is None else t
+        return self.points(points, t), self.ear.update(ear, t)
+
+    def predict(self, t=None):
+        """Filtered EAR for a frame without inference"""
+        return self.ear.predict(t)
+
+
+def box_iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes"""
+    w = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    h = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    return inter / float(a[2] * a[3] + b[2] * b[3] - inter)
+
+
+class FaceTracks:
+    def __init__(self, min_iou=0.3, max_missed=5, **filter_options):
+        """
+        One FaceFilter per face, matched across inference frames by box IoU
+
+        With a driver and a passenger in frame each face is smoothed
+        against its own history. A face that matches no box for
+        max_missed inference frames is dropped, so a new face never
+        inherits another face's state.
+
+        Args:
+            min_iou: Overlap with the face's last box needed to match it
+            max_missed: Inference frames a track survives without a match
+            filter_options: Passed to each FaceFilter
+        """
+        self.min_iou = min_iou
+        self.max_missed = max_missed
+        self.filter_options = filter_options
+        self.reset()
+
+    def reset(self):
+        self.tracks = []        # [box, FaceFilter, missed frames]
+        self.last = None
+
+    def assign(self, boxes):
+        """
+        Match this inference frame's face boxes to the tracked faces
+        Returns:
+            One FaceFilter per box, in the same order
+        """
+        unmatched = list(self.tracks)
+        filters = []
+        for box in boxes:
+            best = max(unmatched, key=lambda track: box_iou(box, track[0]), default=None)
+            if best is None or box_iou(box, best[0]) < self.min_iou:
+                best = [box, FaceFilter(**self.filter_options), 0]
+                self.tracks.append(best)
+            else:
+                unmatched.remove(best)
+            best[0], best[2] = box, 0
+            filters.append(best[1])
+        for track in unmatched:
+            track[2] += 1
+        self.tracks = [track for track in self.tracks if track[2] <= self.max_missed]
+        # The last face processed is the one whose EAR the detector keeps
+        self.last = filters[-1] if filters else None
+        return filters
+
+    def predict(self, t=None):
+        """Filtered EAR of the last face processed, for a frame without inference"""
+        return self.last.predict(t) if self.last is not None else None
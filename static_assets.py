@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+from flask import Response, abort, render_template_string, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Cache lifetime for /static URLs whose ?v= matches the file's content hash
+# (as built by StaticAssets.url()); they can be cached for a year
+ASSET_MAX_AGE = int(os.environ.get("BLINKSENSE_ASSET_MAX_AGE", str(365 * 24 * 3600)))
+
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_COMPRESS_SIZE = 1024
+
+
+class CachedAsset:
+    def __init__(self, body, content_type, cache_control="no-cache"):
+        """
+        Response body with its ETag and compressed variants built once
+
+        Args:
+            body: bytes or str (encoded as UTF-8)
+            content_type: Content-Type header value
+            cache_control: Cache-Control header value; "no-cache" lets
+                browsers keep the page but revalidate it (a 304 via ETag)
+        """
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.digest = hashlib.sha1(body).hexdigest()[:16]
+
+        self.variants = {'identity': (body, self.digest)}
+        if len(body) >= MIN_COMPRESS_SIZE and content_type.startswith(COMPRESSIBLE):
+            compressed = gzip.compress(body, 9, mtime=0)
+            if len(compressed) < len(body):
+                self.variants['gzip'] = (compressed, self.digest + "-gz")
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.variants['br'] = (compressed, self.digest + "-br")
+
+    def encoding_for(self, accept_encodings):
+        """Smallest variant the client accepts"""
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and accept_encodings[encoding] > 0:
+                return encoding
+        return 'identity'
+
+    def response(self, cache_control=None):
+        """
+        Flask response for the current request (304 when the ETag matches)
+        Args:
+            cache_control: Overrides the asset's Cache-Control header
+        """
+        encoding = self.encoding_for(request.accept_encodings)
+        body, etag = self.variants[encoding]
+        headers = {'ETag': f'"{etag}"', 'Cache-Control': cache_control or self.cache_control,
+                   'Vary': 'Accept-Encoding'}
+        if request.if_none_match.contains_weak(etag):
+            return Response(status=304, headers=headers)
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        return Response(body, content_type=self.content_type, headers=headers)
+
+    def stats(self):
+        return {encoding: len(body) for encoding, (body, _) in self.variants.items()}
+
+
+def compile_page(app, template, **context):
+    """
+    Render an inline page template once at startup
+    The page is rendered and compressed only here; views serve the result
+    with an ETag, so a reload is answered with a 304.
+    Args:
+        app: Flask app (for the template environment)
+        template: Jinja source, as passed to render_template_string
+        context: Template variables; must not change per request
+    Returns:
+        CachedAsset to return from the view with .response()
+    """
+    with app.app_context():
+        html = render_template_string(template, **context)
+    return CachedAsset(html, "text/html; charset=utf-8")
+
+
+class StaticAssets:
+    def __init__(self, folder, max_age=ASSET_MAX_AGE):
+        """
+        Files from a directory with ETags, cache headers and gzip/brotli
+        variants, built on first request and rebuilt when the file changes
+
+        Only URLs carrying the current content hash (?v=, see url()) are
+        cached as immutable; plain or outdated URLs are revalidated with
+        the ETag, so a deploy is never hidden behind a stale cached file.
+        """
+        self.folder = os.path.abspath(folder)
+        self.cache_control = f"public, max-age={max_age}, immutable"
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def _path(self, filename):
+        path = os.path.abspath(os.path.join(self.folder, filename))
+        if not path.startswith(self.folder + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+    def get(self, filename):
+        """CachedAsset for a file, or None if it does not exist"""
+        path = self._path(filename)
+        if path is None:
+            return None
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            cached = self._assets.get(path)
+            if cached is None or cached[0] != mtime:
+                with open(path, "rb") as f:
+                    body = f.read()
+                content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+                if content_type.startswith("text/") or content_type == "application/javascript":
+                    content_type += "; charset=utf-8"
+                cached = self._assets[path] = (mtime, CachedAsset(body, content_type))
+            return cached[1]
+
+    def url(self, filename, prefix="/static"):
+        """Cache-busting URL: changes whenever the file content changes"""
+        asset = self.get(filename)
+        version = f"?v={asset.digest}" if asset else ""
+        return f"{prefix}/{filename}{version}"
+
+    def response(self, filename):
+        asset = self.get(filename)
+        if asset is None:
+            abort(404)
+        if request.args.get('v') == asset.digest:
+            return asset.response(self.cache_control)
+        return asset.response()
+
+
+def register_static(app):
+    """Serve the app's static folder through StaticAssets instead of send_file"""
+    if not app.static_folder or 'static' not in app.view_functions:
+        return None
+    assets = StaticAssets(app.static_folder)
+    app.view_functions['static'] = assets.response
+    app.jinja_env.globals['asset_url'] = assets.url
+    return assets
@@ -0,0 +1,252 @@
+import asyncio
+import json
+import math
+import struct
+import threading
+import time
+
+VERSION = 1
+MSG_STATE = 1
+
+# version, message type, sequence number, field mask
+HEADER = struct.Struct("<BBIH")
+
+# Fixed field table: name, struct code, scale. A frame carries the fields
+# whose mask bit is set, in this order, as scaled integers.
+FIELDS = (
+    ("timestamp", "I", 1000),       # ms since the hub's epoch
+    ("ear", "H", 10000),
+    ("flags", "B", 1),              # FLAG_BITS
+    ("fatigue_score", "B", 1),
+    ("mar", "H", 10000),
+    ("pitch", "h", 100),
+    ("yaw", "h", 100),
+)
+FLAG_BITS = ("face_detected", "is_drowsy", "eyes_closed")
+DEFAULT_FIELDS = ("timestamp", "ear", "flags")
+
+MAX_RATE = 30.0
+MIN_RATE = 0.2
+
+_LIMITS = {"B": (0, 255), "H": (0, 65535), "h": (-32768, 32767), "I": (0, 2 ** 32 - 1)}
+_INDEX = {name: i for i, (name, _, _) in enumerate(FIELDS)}
+
+
+def _flags(state):
+    return sum(1 << bit for bit, name in enumerate(FLAG_BITS) if state.get(name))
+
+
+def _field_value(state, name, epoch):
+    if name == "timestamp":
+        return state.get("timestamp", time.time()) - epoch
+    if name == "flags":
+        return _flags(state)
+    return state.get(name) or 0
+
+
+def encode_frame(state, seq, mask, epoch):
+    """
+    Pack one state dict into a binary frame
+    Args:
+        state: Detector state (ear, face_detected, is_drowsy, ...)
+        seq: Sequence number
+        mask: Bit mask of FIELDS to include
+        epoch: Hub start time the timestamp field is relative to
+    """
+    codes, values = "", []
+    for i, (name, code, scale) in enumerate(FIELDS):
+        if mask & (1 << i):
+            low, high = _LIMITS[code]
+            value = _field_value(state, name, epoch)
+            values.append(min(high, max(low, int(round(value * scale)))))
+            codes += code
+    return HEADER.pack(VERSION, MSG_STATE, seq & 0xFFFFFFFF, mask) + struct.pack("<" + codes, *values)
+
+
+def decode_frame(data, epoch=0.0):
+    """Inverse of encode_frame; returns the state dict with 'seq'"""
+    version, kind, seq, mask = HEADER.unpack_from(data)
+    if version != VERSION or kind != MSG_STATE:
+        raise ValueError(f"Unsupported frame {version}/{kind}")
+    fields = [f for i, f in enumerate(FIELDS) if mask & (1 << i)]
+    values = struct.unpack_from("<" + "".join(code for _, code, _ in fields), data, HEADER.size)
+    state = {"seq": seq}
+    for (name, _, scale), value in zip(fields, values):
+        if name == "flags":
+            state.update({flag: bool(value & (1 << bit)) for bit, flag in enumerate(FLAG_BITS)})
+        elif name == "timestamp":
+            state[name] = epoch + value / scale
+        else:
+            state[name] = value / scale
+    return state
+
+
+class TelemetryHub:
+    def __init__(self):
+        """
+        Latest detector state shared by all telemetry clients
+
+        publish() only replaces the state and wakes the senders, so it is
+        cheap to call from the detection thread every frame. Each client
+        reads whatever is newest when it is due; a slow client skips
+        intermediate states instead of building up a backlog.
+        """
+        self.epoch = time.time()
+        self.latest = {}
+        self.version = 0
+        self._lock = threading.Lock()
+        self._waiters = set()   # (loop, asyncio.Event)
+
+    def publish(self, state):
+        with self._lock:
+            self.latest = dict(state)
+            self.version += 1
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def snapshot(self):
+        with self._lock:
+            return self.version, self.latest
+
+    def channel(self):
+        return TelemetryChannel(self)
+
+    async def wait(self, version, timeout):
+        """Wait until the state is newer than version or timeout passes"""
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self._lock:
+            if self.version != version:
+                return
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+
+class TelemetryChannel:
+    def __init__(self, hub, rate=10.0, fields=DEFAULT_FIELDS, binary=False):
+        """
+        One client's negotiated view of a TelemetryHub
+
+        Clients that never send a subscribe message get JSON at the default
+        rate, as before. Changes of the flags field (face lost, drowsy) are
+        sent at once regardless of the rate.
+        """
+        self.hub = hub
+        self.seq = 0
+        self.sent_version = -1
+        self.sent_flags = None
+        self.last_sent = 0.0
+        self.rate = 10.0
+        self.mask = sum(1 << _INDEX[n] for n in DEFAULT_FIELDS)
+        self.binary = False
+        self.configure({"rate": rate, "fields": list(fields), "format": "binary" if binary else "json"})
+
+    def configure(self, message):
+        """
+        Apply a subscribe message: {"rate": Hz, "fields": [...], "format": "binary"|"json"}
+        A missing or invalid value keeps the current setting.
+        Returns:
+            The schema to send back to the client
+        """
+        rate = message.get("rate")
+        if isinstance(rate, (int, float)) and not isinstance(rate, bool) and math.isfinite(rate):
+            self.rate = min(MAX_RATE, max(MIN_RATE, float(rate)))
+        fields = message.get("fields")
+        if isinstance(fields, list):
+            names = [n for n in fields if isinstance(n, str) and n in _INDEX]
+            if names:
+                self.mask = sum(1 << _INDEX[n] for n in names)
+        if message.get("format") in ("binary", "json"):
+            self.binary = message["format"] == "binary"
+        # The current state is due again, in the new format
+        self.sent_version = -1
+        self.last_sent = 0.0
+        return self.schema()
+
+    def schema(self):
+        fields = [{"name": name, "type": code, "scale": scale}
+                  for i, (name, code, scale) in enumerate(FIELDS) if self.mask & (1 << i)]
+        return {"type": "schema", "version": VERSION, "epoch": self.hub.epoch, "rate": self.rate,
+                "format": "binary" if self.binary else "json", "fields": fields, "flags": list(FLAG_BITS)}
+
+    def next_message(self, now=None):
+        """The message to send now (bytes or str), or None if nothing is due"""
+        now = time.time() if now is None else now
+        version, state = self.hub.snapshot()
+        if version == self.sent_version or not state:
+            return None
+        flags = _flags(state)
+        urgent = flags != self.sent_flags
+        if not urgent and now - self.last_sent < 1.0 / self.rate:
+            return None
+
+        self.seq += 1
+        self.sent_version, self.sent_flags, self.last_sent = version, flags, now
+        if self.binary:
+            return encode_frame(state, self.seq, self.mask, self.hub.epoch)
+        fields = {name: state.get(name) for name, _, _ in FIELDS
+                  if self.mask & (1 << _INDEX[name]) and name != "flags"}
+        if self.mask & (1 << _INDEX["flags"]):
+            fields.update({name: bool(state.get(name)) for name in FLAG_BITS})
+        return json.dumps({"seq": self.seq, **fields}, separators=(",", ":"))
+
+    def wait_time(self, now=None):
+        now = time.time() if now is None else now
+        return max(0.0, self.last_sent + 1.0 / self.rate - now)
+
+
+async def run_websocket(hub, websocket):
+    """
+    Serve one accepted WebSocket (Starlette/FastAPI-style send_bytes,
+    send_text and receive_text) until it disconnects
+    """
+    channel = hub.channel()
+    # A schema and the messages in its format never overtake each other
+    sending = asyncio.Lock()
+
+    async def deliver(message):
+        if isinstance(message, bytes):
+            await websocket.send_bytes(message)
+        elif message is not None:
+            await websocket.send_text(message)
+
+    async def receive():
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                continue    # Not JSON; ignored like any unknown message
+            if isinstance(message, dict) and message.get("type") == "subscribe":
+                async with sending:
+                    await websocket.send_text(json.dumps(channel.configure(message)))
+                    # Without waiting for the sender, which may sleep until the next publish
+                    await deliver(channel.next_message())
+
+    async def send():
+        while True:
+            async with sending:
+                message = channel.next_message()
+                await deliver(message)
+            if message is None:
+                # Wake on the next publish (it may carry a flag change) or
+                # when the rate allows the pending state to go out
+                version, _ = hub.snapshot()
+                pending = version != channel.sent_version
+                await hub.wait(version, max(channel.wait_time(), 0.005) if pending else 30.0)
+
+    tasks = [asyncio.ensure_future(receive()), asyncio.ensure_future(send())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+    for task in done:
+        # Re-raises the disconnect that ended the task
+        task.result()
@@ -0,0 +1,92 @@
+import argparse
+import threading
+import time
+
+from shared_frames import open_source
+from telemetry_protocol import TelemetryHub, run_websocket
+
+TELEMETRY_PORT = 8000
+
+
+def detector_state(detector, ear, is_drowsy):
+    """Hub state for one processed frame of a landmark detector"""
+    state = {
+        'timestamp': time.time(),
+        'ear': ear,
+        'face_detected': ear > 0,
+        'is_drowsy': is_drowsy,
+        'eyes_closed': 0 < ear < detector.EYE_AR_THRESH,
+        'fatigue_score': detector.fatigue.score,
+    }
+    state.update({k: v for k, v in detector.last_signals.items() if k in ('mar', 'pitch', 'yaw')})
+    return state
+
+
+def publish_detection(hub, detector, source=0):
+    """
+    Run a landmark detector over a frame source and publish every frame's
+    state to the hub; returns when a video file ends
+    """
+    cap = open_source(source, width=detector.buffers.width, height=detector.buffers.height)
+    try:
+        while cap.isOpened():
+            ret, frame = detector.buffers.read(cap)
+            if not ret:
+                if cap.live:
+                    continue
+                break
+            frame = detector.buffers.resize(frame)
+            _, ear, is_drowsy = detector.detect_drowsiness(frame)
+            hub.publish(detector_state(detector, ear, is_drowsy))
+    finally:
+        cap.release()
+
+
+def make_detector(ear_thresh=0.25, ear_consec_frames=20):
+    """MediaPipe landmark detector if installed, else dlib (the order main.py uses)"""
+    try:
+        from drowsiness_detector_mediapipe import DrowsinessDetectorMediaPipe
+        return DrowsinessDetectorMediaPipe(ear_thresh=ear_thresh, ear_consec_frames=ear_consec_frames,
+                                           change_gate=True)
+    except ImportError:
+        from drowsiness_detector import DrowsinessDetector
+        return DrowsinessDetector(shape_predictor_path="data/models/shape_predictor_68_face_landmarks.dat",
+                                  ear_thresh=ear_thresh, ear_consec_frames=ear_consec_frames,
+                                  change_gate=True)
+
+
+def create_app(hub):
+    """
+    ASGI app serving the telemetry protocol on /ws (the socket HomePage.jsx
+    connects to); every connection is one TelemetryChannel on the hub
+    """
+    from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+    app = FastAPI(title="BlinkSense telemetry")
+
+    @app.websocket("/ws")
+    async def telemetry_socket(websocket: WebSocket):
+        await websocket.accept()
+        try:
+            await run_websocket(hub, websocket)
+        except WebSocketDisconnect:
+            pass
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    ap = argparse.ArgumentParser(description="Detection with WebSocket telemetry on /ws")
+    ap.add_argument("source", nargs="?", default="0", help="Webcam index, video path or shm:NAME ring")
+    ap.add_argument("--host", type=str, default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=TELEMETRY_PORT)
+    ap.add_argument("-t", "--threshold", type=float, default=0.25, help="EAR threshold")
+    ap.add_argument("-f", "--frames", type=int, default=20, help="Frame threshold")
+    args = ap.parse_args()
+
+    hub = TelemetryHub()
+    source = int(args.source) if args.source.isdigit() else args.source
+    threading.Thread(target=publish_detection, name="telemetry-detection", daemon=True,
+                     args=(hub, make_detector(args.threshold, args.frames), source)).start()
+    uvicorn.run(create_app(hub), host=args.host, port=args.port)
@@ -0,0 +1,135 @@
+import gzip
+import itertools
+import json
+import threading
+import uuid
+from collections import deque
+
+from flask import Response, request
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_TYPE = "application/msgpack"
+MIN_GZIP_SIZE = 1024
+
+
+class TelemetryLog:
+    def __init__(self, maxlen=100):
+        """
+        Bounded, append-only list of telemetry entries with sequence numbers
+
+        Each entry gets a 'seq' key and is serialized to JSON once when it
+        is appended, so polls only join bytes that already exist. Clients
+        keep the last seq they saw and ask for what came after it.
+
+        Args:
+            maxlen: Entries kept; older ones are dropped
+        """
+        self._entries = deque(maxlen=maxlen)    # (seq, entry, json bytes)
+        self._lock = threading.Lock()
+        self.seq = 0
+        # Part of the ETag so tags from before a restart never match
+        self.epoch = uuid.uuid4().hex[:8]
+
+    def append(self, entry):
+        """Add an entry dict; returns its sequence number"""
+        with self._lock:
+            self.seq += 1
+            entry['seq'] = self.seq
+            self._entries.append((self.seq, entry, json.dumps(entry, separators=(',', ':')).encode()))
+            return self.seq
+
+    def since(self, seq, limit=None):
+        """
+        Entries newer than seq
+        Returns:
+            (rows, last seq, reset). reset is True when the rows do not
+            continue from seq (entries were dropped, the server restarted or
+            limit cut the reply), so the client should replace its copy.
+        """
+        with self._lock:
+            last = self.seq
+            first = self._entries[0][0] if self._entries else last + 1
+            reset = seq > last or seq < first - 1
+            start = 0 if reset else seq - first + 1
+            rows = list(itertools.islice(self._entries, start, None))
+        if limit and len(rows) > limit:
+            rows = rows[-limit:]
+            reset = True
+        return rows, last, reset
+
+    def tail(self, count=None):
+        """The newest count entries (all if None) as dicts"""
+        with self._lock:
+            rows = list(self._entries)
+        return [entry for _, entry, _ in rows[-count if count else 0:]]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self.tail())
+
+    def __getitem__(self, index):
+        return self.tail()[index]
+
+
+def _wants_msgpack():
+    if msgpack is None:
+        return False
+    if request.args.get('format') == 'msgpack':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', MSGPACK_TYPE]) == MSGPACK_TYPE
+
+
+def telemetry_response(log, tail=None):
+    """
+    Poll endpoint for a TelemetryLog
+
+    ?since=<seq> returns {"epoch", "seq", "reset", "entries"} with only the
+    newer entries (?limit=N caps them); without it the plain list of the
+    newest `tail` entries is returned, as before. Clients send the epoch
+    back (&epoch=) so a seq from before a server restart gets a reset. The ETag is the log's last seq,
+    so an unchanged log costs a 304. ?format=msgpack (or Accept:
+    application/msgpack) selects msgpack when installed, and larger
+    replies are gzip-compressed for clients that accept it.
+    """
+    since = request.args.get('since', type=int)
+    limit = request.args.get('limit', type=int)
+    stale = request.args.get('epoch') not in (None, '', log.epoch)
+    binary = _wants_msgpack()
+    compress = request.accept_encodings['gzip'] > 0
+
+    variant = ('-mp' if binary else '') + ('-gz' if compress else '')
+    tag = f"{log.epoch}-{log.seq}{variant}"
+    headers = {'ETag': f'"{tag}"', 'Cache-Control': 'no-cache', 'Vary': 'Accept, Accept-Encoding'}
+    if request.if_none_match.contains_weak(tag):
+        return Response(status=304, headers=headers)
+
+    if since is None:
+        rows, last, reset = log.since(0, tail)
+    else:
+        rows, last, reset = log.since(0 if stale else since, limit)
+        reset = reset or stale
+
+    if binary:
+        entries = [entry for _, entry, _ in rows]
+        body = msgpack.packb(entries if since is None else
+                             {'epoch': log.epoch, 'seq': last, 'reset': reset, 'entries': entries})
+        content_type = MSGPACK_TYPE
+    else:
+        body = b'[' + b','.join(data for _, _, data in rows) + b']'
+        if since is not None:
+            body = b'{"epoch":"%s","seq":%d,"reset":%s,"entries":%s}' % (
+                log.epoch.encode(), last, b'true' if reset else b'false', body)
+        content_type = 'application/json'
+
+    if compress and len(body) >= MIN_GZIP_SIZE:
+        body = gzip.compress(body, 5)
+        headers['Content-Encoding'] = 'gzip'
+    # The tag was read before the rows; name the version actually sent
+    headers['ETag'] = f'"{log.epoch}-{last}{variant}"'
+    return Response(body, content_type=content_type, headers=headers)
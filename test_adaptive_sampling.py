@@ -0,0 +1,64 @@
+from adaptive_sampling import InferenceScheduler
+
+EAR_THRESH = 0.25
+CONSEC_FRAMES = 20
+
+
+def frames_to_alert(scheduler, trace, consec_frames=CONSEC_FRAMES):
+    """
+    Run a detector-style counter over an EAR trace; EAR is only seen on
+    inference frames, as in the landmark detectors
+    Returns:
+        Index of the frame the alert fires on, or None
+    """
+    counter = 0
+    for i, ear in enumerate(trace):
+        if not scheduler.should_run(closing=counter > 0):
+            continue
+        scheduler.update(ear)
+        if ear < EAR_THRESH:
+            counter += 1
+            if counter >= consec_frames:
+                return i
+        else:
+            counter = 0
+    return None
+
+
+def closing_trace(open_frames, closed_frames=200, open_ear=0.36, closed_ear=0.15):
+    return [open_ear] * open_frames + [closed_ear] * closed_frames
+
+
+def test_alert_within_latency_bound():
+    # A sudden closure at every phase of the sampling interval
+    for max_interval in (1, 2, 4, 8):
+        for open_frames in range(60, 60 + 3 * max_interval):
+            scheduler = InferenceScheduler(EAR_THRESH, max_interval=max_interval)
+            alert = frames_to_alert(scheduler, closing_trace(open_frames))
+            assert alert is not None
+            latency = alert - open_frames + 1
+            assert latency <= scheduler.latency_bound(CONSEC_FRAMES), (max_interval, open_frames, latency)
+
+
+def test_gradual_closure_within_latency_bound():
+    # EAR drifting down to the threshold makes the scheduler sample every frame
+    for open_frames in range(60, 72):
+        scheduler = InferenceScheduler(EAR_THRESH, max_interval=4)
+        drift = [0.36 - 0.008 * i for i in range(16)]
+        trace = [0.36] * open_frames + drift + [0.15] * 200
+        alert = frames_to_alert(scheduler, trace)
+        closed_from = open_frames + next(i for i, ear in enumerate(drift + [0.15]) if ear < EAR_THRESH)
+        assert alert - closed_from + 1 <= scheduler.latency_bound(CONSEC_FRAMES)
+
+
+def test_skips_while_eyes_stay_open():
+    scheduler = InferenceScheduler(EAR_THRESH, max_interval=4)
+    assert frames_to_alert(scheduler, [0.36] * 300) is None
+    assert scheduler.stats()['inference_ratio'] < 0.35
+
+
+if __name__ == "__main__":
+    test_alert_within_latency_bound()
+    test_gradual_closure_within_latency_bound()
+    test_skips_while_eyes_stay_open()
+    print("✓ Adaptive sampling latency bound holds")
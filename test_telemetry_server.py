@@ -0,0 +1,46 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from telemetry_protocol import TelemetryHub, decode_frame
+from telemetry_server import create_app
+
+
+def test_binary_subscription():
+    hub = TelemetryHub()
+    hub.publish({'ear': 0.31, 'face_detected': True, 'is_drowsy': False})
+    with TestClient(create_app(hub)).websocket_connect("/ws") as ws:
+        # Malformed messages are ignored; the socket stays open
+        for message in ("not json", "[1, 2]", '{"type": "subscribe", "rate": "fast"}'):
+            ws.send_text(message)
+        ws.send_text(json.dumps({"type": "subscribe", "format": "binary", "rate": 30,
+                                 "fields": ["timestamp", "ear", "flags"]}))
+        # JSON states and the schema of the invalid subscribe come first;
+        # nothing binary is sent before the binary schema
+        message = ws.receive_json()
+        while message.get("format") != "binary":
+            message = ws.receive_json()
+        assert message["type"] == "schema"
+        assert [f["name"] for f in message["fields"]] == ["timestamp", "ear", "flags"]
+
+        state = decode_frame(ws.receive_bytes(), message["epoch"])
+        assert abs(state["ear"] - 0.31) < 1e-4
+        assert state["face_detected"] and not state["is_drowsy"]
+
+        hub.publish({'ear': 0.12, 'face_detected': True, 'is_drowsy': True})
+        state = decode_frame(ws.receive_bytes(), message["epoch"])
+        assert state["is_drowsy"] and abs(state["ear"] - 0.12) < 1e-4
+
+
+def test_json_without_subscribe():
+    hub = TelemetryHub()
+    hub.publish({'ear': 0.28, 'face_detected': True})
+    with TestClient(create_app(hub)).websocket_connect("/ws") as ws:
+        data = ws.receive_json()
+        assert data["ear"] == 0.28 and data["face_detected"] is True
+
+
+if __name__ == "__main__":
+    test_binary_subscription()
+    test_json_without_subscribe()
+    print("✓ Telemetry WebSocket protocol works end to end")
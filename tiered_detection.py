@@ -0,0 +1,136 @@
+import cv2
+import numpy as np
+
+
+def boxes_from_points(eyes, shape, pad=0.6):
+    """
+    Padded bounding boxes around eye landmark sets
+    Args:
+        eyes: Iterable of (N, 2) eye landmark arrays in gray-frame pixels
+        shape: Shape of the gray frame, for clipping
+        pad: Padding as a fraction of the eye width
+    Returns:
+        List of (x, y, w, h) boxes
+    """
+    h_max, w_max = shape[:2]
+    boxes = []
+    for eye in eyes:
+        eye = np.asarray(eye, dtype=np.float64)
+        x0, y0 = eye.min(axis=0)
+        x1, y1 = eye.max(axis=0)
+        margin = (x1 - x0) * pad
+        x0, y0 = max(0, int(x0 - margin)), max(0, int(y0 - margin))
+        x1, y1 = min(w_max, int(x1 + margin) + 1), min(h_max, int(y1 + margin) + 1)
+        if x1 - x0 >= 4 and y1 - y0 >= 4:
+            boxes.append((x0, y0, x1 - x0, y1 - y0))
+    return boxes
+
+
+class TieredEyeState:
+    def __init__(self, ear_thresh=0.25, open_margin=0.2, diff_thresh=6.0,
+                 brightness_thresh=12.0, max_skip=15, eye_cascade=None):
+        """
+        Cheap per-frame gate in front of landmark inference
+
+        After each landmark pass the eye regions are remembered. On later
+        frames the eye regions alone are compared with that reference (mean
+        absolute difference and brightness shift, optionally a Haar eye
+        check); if the last EAR was clearly open and the eyes have not
+        visibly changed, the frame is treated as open without running the
+        landmark model. Anything uncertain, a running closed-eye counter, or
+        max_skip cheap frames in a row escalates to landmarks, so the alert
+        path always sees real EAR values.
+
+        Args:
+            ear_thresh: Detector EAR threshold
+            open_margin: Fraction above ear_thresh that counts as clearly open
+            diff_thresh: Mean absolute eye-region difference (0-255) allowed
+            brightness_thresh: Eye-region mean brightness shift allowed
+            max_skip: Cheap frames allowed between landmark passes
+            eye_cascade: Optional cv2.CascadeClassifier used as a tie-breaker
+                when the difference is above diff_thresh but below twice it
+        """
+        self.ear_thresh = ear_thresh
+        self.open_margin = open_margin
+        self.diff_thresh = diff_thresh
+        self.brightness_thresh = brightness_thresh
+        self.max_skip = max_skip
+        self.eye_cascade = eye_cascade
+
+        self.boxes = []
+        self.references = []
+        self.last_ear = 0.0
+        self.skipped = 0
+
+        # Stats
+        self.cheap_frames = 0
+        self.landmark_frames = 0
+
+    def reset(self):
+        """Forget the reference so the next frame runs landmarks"""
+        self.boxes = []
+        self.references = []
+        self.skipped = 0
+
+    def update(self, gray, eyes, ear):
+        """
+        Record the result of a landmark pass
+        Args:
+            gray: Grayscale frame the landmarks were found on
+            eyes: Eye landmark arrays in gray-frame pixels
+            ear: EAR computed from those landmarks
+        """
+        self.landmark_frames += 1
+        self.last_ear = ear
+        self.skipped = 0
+        self.boxes = boxes_from_points(eyes, gray.shape)
+        self.references = [gray[y:y + h, x:x + w].copy() for (x, y, w, h) in self.boxes]
+
+    def clearly_open(self):
+        return self.last_ear > self.ear_thresh * (1.0 + self.open_margin)
+
+    def needs_landmarks(self, gray, closing=False):
+        """
+        Cheap stage
+        Args:
+            gray: Grayscale frame for this frame (same size as in update)
+            closing: True while the detector's closed-eye counter/timer runs
+        Returns:
+            False when the frame can reuse last_ear, True to run landmarks
+        """
+        if closing or not self.references or not self.clearly_open() or self.skipped >= self.max_skip:
+            return True
+
+        worst = 0.0
+        for (x, y, w, h), reference in zip(self.boxes, self.references):
+            patch = gray[y:y + h, x:x + w]
+            if patch.shape != reference.shape:
+                return True
+            diff = cv2.norm(patch, reference, cv2.NORM_L1) / patch.size
+            if abs(float(patch.mean()) - float(reference.mean())) > self.brightness_thresh:
+                return True
+            worst = max(worst, diff)
+
+        if worst > self.diff_thresh:
+            if self.eye_cascade is None or worst > 2 * self.diff_thresh or not self._eyes_visible(gray):
+                return True
+
+        self.skipped += 1
+        self.cheap_frames += 1
+        return False
+
+    def _eyes_visible(self, gray):
+        """Haar open-eye check over the remembered eye regions"""
+        for (x, y, w, h) in self.boxes:
+            eyes = self.eye_cascade.detectMultiScale(gray[y:y + h, x:x + w], 1.1, 2, minSize=(6, 6))
+            if len(eyes) == 0:
+                return False
+        return True
+
+    def stats(self):
+        total = self.cheap_frames + self.landmark_frames
+        return {
+            'cheap_frames': self.cheap_frames,
+            'landmark_frames': self.landmark_frames,
+            'cheap_ratio': self.cheap_frames / total if total else 0.0,
+        }
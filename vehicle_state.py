@@ -0,0 +1,286 @@
+import os
+import threading
+import time
+
+KNOTS_TO_KMH = 1.852
+
+# J1939 Cruise Control/Vehicle Speed (PGN 65265): wheel-based speed in bytes
+# 2-3, little endian, 1/256 km/h
+J1939_CCVS_PGN = 0xFEF1
+
+
+def _nmea_checksum_ok(sentence):
+    if "*" not in sentence:
+        return True
+    body, checksum = sentence[1:].split("*", 1)
+    value = 0
+    for char in body:
+        value ^= ord(char)
+    try:
+        return value == int(checksum[:2], 16)
+    except ValueError:
+        return False
+
+
+def _nmea_time(field):
+    """hhmmss.ss to seconds since midnight"""
+    try:
+        return int(field[0:2]) * 3600 + int(field[2:4]) * 60 + float(field[4:])
+    except (ValueError, IndexError):
+        return None
+
+
+def parse_nmea(line):
+    """
+    Speed from an NMEA RMC or VTG sentence
+    Returns:
+        (timestamp or None, speed in km/h) or None if the line carries no speed
+    """
+    line = line.strip()
+    if not line.startswith("$") or not _nmea_checksum_ok(line):
+        return None
+    fields = line.split("*", 1)[0].split(",")
+    kind = fields[0][3:]
+    try:
+        if kind == "RMC" and len(fields) > 7:
+            if fields[2] != "A":
+                return None  # No fix
+            return _nmea_time(fields[1]), float(fields[7] or 0.0) * KNOTS_TO_KMH
+        if kind == "VTG" and len(fields) > 7:
+            return None, float(fields[7] or 0.0)
+    except ValueError:
+        pass
+    return None
+
+
+def parse_candump(line, can_id=None, offset=1, scale=1 / 256.0):
+    """
+    Speed from a candump log line: "(1600000000.123456) can0 18FEF100#..."
+    Args:
+        can_id: Arbitration ID carrying speed; None matches the J1939 CCVS PGN
+        offset: Byte offset of the little-endian 16-bit speed value
+        scale: km/h per bit
+    Returns:
+        (timestamp, speed in km/h) or None if the frame is not a speed frame
+    """
+    parts = line.split()
+    if len(parts) < 3 or not parts[0].startswith("(") or "#" not in parts[2]:
+        return None
+    try:
+        timestamp = float(parts[0].strip("()"))
+        frame_id, data = parts[2].split("#", 1)
+        frame_id = int(frame_id, 16)
+        data = bytes.fromhex(data)
+    except ValueError:
+        return None
+
+    if can_id is None:
+        if (frame_id >> 8) & 0xFFFF != J1939_CCVS_PGN:
+            return None
+    elif frame_id != can_id:
+        return None
+    if len(data) < offset + 2:
+        return None
+    raw = data[offset] | (data[offset + 1] << 8)
+    if raw == 0xFFFF:
+        return None  # Not available
+    return timestamp, raw * scale
+
+
+def parse_csv(line):
+    """Replay stand-in: "timestamp,speed_kmh[,ignition]" """
+    fields = line.strip().split(",")
+    try:
+        timestamp, speed = float(fields[0]), float(fields[1])
+    except (ValueError, IndexError):
+        return None
+    ignition = fields[2].strip() not in ("0", "off", "false") if len(fields) > 2 else None
+    return timestamp, speed, ignition
+
+
+def parse_line(line, **can_options):
+    """
+    Auto-detect the line format
+    Returns:
+        (timestamp, speed_kmh, ignition) with None for unknown parts, or None
+    """
+    if line.startswith("$"):
+        parsed = parse_nmea(line)
+    elif line.startswith("("):
+        parsed = parse_candump(line, **can_options)
+    elif line.strip() and not line.startswith("#"):
+        return parse_csv(line)
+    else:
+        return None
+    return None if parsed is None else (parsed[0], parsed[1], None)
+
+
+class VehicleStateFeed:
+    def __init__(self, source, rate=1.0, loop=False, **can_options):
+        """
+        Vehicle speed/ignition from a GPS NMEA stream, a candump log, or a
+        "timestamp,speed,ignition" CSV
+
+        A background thread parses lines as they arrive and updates the state
+        immediately, so the detector sees a change on its next frame. Log files
+        are replayed with their recorded timing, which makes them a stand-in
+        for a live CAN bus or GPS receiver when testing.
+
+        Args:
+            source: Path of a log file, serial device or FIFO
+            rate: Replay speed for logs (1.0 = real time, 0 = as fast as possible)
+            loop: Restart the log at the end
+            can_options: can_id/offset/scale passed to parse_candump
+        """
+        self.source = source
+        self.rate = rate
+        self.loop = loop
+        self.can_options = can_options
+
+        self.speed_kmh = None
+        self.ignition = None
+        self.updated = None
+        self.running = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+
+    def update(self, speed_kmh=None, ignition=None):
+        """Push a reading (also usable directly by other integrations)"""
+        with self._lock:
+            if speed_kmh is not None:
+                self.speed_kmh = speed_kmh
+            if ignition is not None:
+                self.ignition = ignition
+            self.updated = time.time()
+
+    def state(self):
+        with self._lock:
+            return self.speed_kmh, self.ignition, self.updated
+
+    def _run(self):
+        while self.running:
+            try:
+                with open(self.source, errors="ignore") as f:
+                    self._replay(f)
+            except OSError as e:
+                print(f"[WARNING] Vehicle state source {self.source}: {e}")
+                time.sleep(1.0)
+                continue
+            if not self.loop:
+                break
+        self.running = False
+
+    def _replay(self, lines):
+        first_log = first_wall = None
+        for line in lines:
+            if not self.running:
+                return
+            parsed = parse_line(line, **self.can_options)
+            if parsed is None:
+                continue
+            timestamp, speed, ignition = parsed
+
+            if self.rate and timestamp is not None:
+                # Keep the recorded spacing between readings
+                if first_log is None or timestamp < first_log:
+                    first_log, first_wall = timestamp, time.time()
+                delay = first_wall + (timestamp - first_log) / self.rate - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            self.update(speed, ignition)
+
+
+class VehicleGate:
+    def __init__(self, feed, moving_kmh=5.0, stop_delay=10.0, stale_after=5.0, throttle_every=0):
+        """
+        Decide per frame whether detection and alarms run
+
+        Moving is recognised on the first reading above moving_kmh, so
+        detection resumes on the next frame; stationary needs stop_delay
+        seconds below it, so traffic-light stops do not pause detection.
+        Ignition off counts as stationary at once. With no reading for
+        stale_after seconds the gate fails open and detection runs.
+
+        Args:
+            feed: VehicleStateFeed (or anything with state())
+            moving_kmh: Speed above which the vehicle counts as moving
+            stop_delay: Seconds below moving_kmh before detection pauses
+            stale_after: Seconds without data before the gate fails open
+            throttle_every: While stationary run detection every Nth frame
+                (alarm stays off); 0 suspends detection completely
+        """
+        self.feed = feed
+        self.moving_kmh = moving_kmh
+        self.stop_delay = stop_delay
+        self.stale_after = stale_after
+        self.throttle_every = throttle_every
+
+        self._below_since = None
+        self._frames = 0
+        self.last_moving = True
+
+        # Stats
+        self.active_frames = 0
+        self.suspended_frames = 0
+
+    def moving(self):
+        """True when the vehicle is moving or its state is unknown"""
+        speed, ignition, updated = self.feed.state()
+        now = time.time()
+        if updated is None or now - updated > self.stale_after:
+            self._below_since = None
+            return True
+        if ignition is False:
+            return False
+        if speed is None or speed >= self.moving_kmh:
+            self._below_since = None
+            return True
+        if self._below_since is None:
+            self._below_since = now
+        return now - self._below_since < self.stop_delay
+
+    def should_detect(self):
+        """
+        Returns:
+            (run detection on this frame, alarms allowed)
+        """
+        self.last_moving = self.moving()
+        if self.last_moving:
+            self._frames = 0
+            self.active_frames += 1
+            return True, True
+        self._frames += 1
+        if self.throttle_every and self._frames % self.throttle_every == 0:
+            self.active_frames += 1
+            return True, False
+        self.suspended_frames += 1
+        return False, False
+
+    def stats(self):
+        """Read-only: reports the moving state of the last detection frame"""
+        speed, ignition, updated = self.feed.state()
+        return {
+            'speed_kmh': speed,
+            'ignition': ignition,
+            'moving': self.last_moving,
+            'active_frames': self.active_frames,
+            'suspended_frames': self.suspended_frames,
+        }
+
+
+def vehicle_gate(source=None, rate=1.0, loop=False, **kwargs):
+    """Gate fed from source, or BLINKSENSE_VEHICLE_SOURCE; None if neither is set"""
+    source = source or os.environ.get("BLINKSENSE_VEHICLE_SOURCE")
+    if not source:
+        return None
+    print(f"[INFO] Gating detection on vehicle state from {source}")
+    return VehicleGate(VehicleStateFeed(source, rate, loop).start(), **kwargs)
@@ -0,0 +1,237 @@
+import argparse
+import asyncio
+import fractions
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+try:
+    from aiortc import RTCPeerConnection, RTCRtpSender, RTCSessionDescription, VideoStreamTrack
+    from aiortc.mediastreams import MediaStreamError
+    from av import VideoFrame
+except ImportError:
+    RTCPeerConnection = None
+    VideoStreamTrack = object
+
+from frame_relay import FrameRelay
+
+WEBRTC_CODEC = os.environ.get("BLINKSENSE_WEBRTC_CODEC", "VP8")
+VIDEO_FPS = 30
+POLL_INTERVAL = 0.005
+
+
+class RelayVideoTrack(VideoStreamTrack):
+    kind = "video"
+
+    def __init__(self, relay, fps=VIDEO_FPS):
+        """aiortc video track sending the newest annotated frame from a FrameRelay"""
+        super().__init__()
+        self.relay = relay
+        self.fps = fps
+        self._seq = 0
+        self._start = None
+
+    async def recv(self):
+        # Poll the relay on the event loop instead of blocking an executor
+        # thread per frame and viewer; repeat the last frame after four
+        # frame times without a new one
+        deadline = time.time() + 4.0 / self.fps
+        seq, frame = self.relay.latest()
+        while seq == self._seq and time.time() < deadline:
+            await asyncio.sleep(POLL_INTERVAL)
+            seq, frame = self.relay.latest()
+        if frame is None:
+            frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        self._seq = seq
+
+        # Timestamps follow the wall clock so dropped frames do not slow playback
+        now = time.time()
+        if self._start is None:
+            self._start = now
+        video_frame = VideoFrame.from_ndarray(frame, format="bgr24")
+        video_frame.pts = int((now - self._start) * 90000)
+        video_frame.time_base = fractions.Fraction(1, 90000)
+        return video_frame
+
+
+class WebRTCOutput:
+    def __init__(self, relay, codec=WEBRTC_CODEC):
+        """
+        Server-side WebRTC video output for the annotated stream
+
+        Runs its own asyncio loop in a background thread so the Flask views
+        can call answer() synchronously. Each viewer is one send-only peer
+        connection reading from the same FrameRelay as the MJPEG stream.
+        The bitrate follows the viewer's REMB estimates, which aiortc
+        applies itself within its encoder's limits (250 kbit/s to
+        1.5 Mbit/s for VP8).
+
+        Args:
+            relay: FrameRelay fed by the detection pipeline
+            codec: Preferred video codec ("VP8" or "H264", both CPU encoders)
+        """
+        if RTCPeerConnection is None:
+            raise ImportError("aiortc is not installed (pip install aiortc)")
+        self.relay = relay
+        self.codec = codec
+        self.peers = set()
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="webrtc", daemon=True).start()
+
+    def _prefer_codec(self, pc, sender):
+        codecs = [c for c in RTCRtpSender.getCapabilities("video").codecs
+                  if c.mimeType.lower() == f"video/{self.codec.lower()}"]
+        for transceiver in pc.getTransceivers():
+            if transceiver.sender == sender and codecs:
+                transceiver.setCodecPreferences(codecs)
+
+    async def _answer(self, sdp, kind):
+        pc = RTCPeerConnection()
+        self.peers.add(pc)
+        sender = pc.addTrack(RelayVideoTrack(self.relay))
+        self._prefer_codec(pc, sender)
+
+        @pc.on("connectionstatechange")
+        async def on_state():
+            if pc.connectionState in ("failed", "closed"):
+                self.peers.discard(pc)
+                await pc.close()
+
+        await pc.setRemoteDescription(RTCSessionDescription(sdp=sdp, type=kind))
+        await pc.setLocalDescription(await pc.createAnswer())
+        # aiortc finishes ICE gathering in setLocalDescription, so the
+        # answer already carries all candidates (no trickle needed)
+        return {'sdp': pc.localDescription.sdp, 'type': pc.localDescription.type}
+
+    def answer(self, offer, timeout=10.0):
+        """
+        Answer a browser's offer ({'sdp', 'type'}) from any thread
+        Returns:
+            The answer as {'sdp', 'type'}
+        """
+        future = asyncio.run_coroutine_threadsafe(self._answer(offer['sdp'], offer['type']), self.loop)
+        return future.result(timeout)
+
+    def close(self):
+        async def close_all():
+            await asyncio.gather(*(pc.close() for pc in list(self.peers)))
+            self.peers.clear()
+        asyncio.run_coroutine_threadsafe(close_all(), self.loop).result(10)
+
+    def stats(self):
+        return {'peers': len(self.peers), 'codec': self.codec}
+
+
+_outputs = {}
+
+
+def webrtc_output(relay):
+    """Shared WebRTCOutput for a relay, or None if aiortc is missing"""
+    if id(relay) not in _outputs:
+        try:
+            _outputs[id(relay)] = WebRTCOutput(relay)
+        except ImportError as e:
+            print(f"[WARNING] {e}; WebRTC output disabled")
+            _outputs[id(relay)] = None
+    return _outputs[id(relay)]
+
+
+def webrtc_stats(relay):
+    """Stats of the relay's WebRTCOutput, None if no viewer has asked for one yet"""
+    output = _outputs.get(id(relay))
+    return output.stats() if output is not None else None
+
+
+def offer_response(relay, offer):
+    """Flask view body for POST /api/webrtc/offer"""
+    from flask import jsonify
+    output = webrtc_output(relay)
+    if output is None:
+        return jsonify({'error': 'WebRTC output not available'}), 503
+    return jsonify(output.answer(offer))
+
+
+async def _loopback(output, seconds):
+    """Receive the stream with a local peer and measure it"""
+    pc = RTCPeerConnection()
+    pc.addTransceiver("video", direction="recvonly")
+    received = {'frames': 0, 'first': None}
+
+    @pc.on("track")
+    def on_track(track):
+        async def consume():
+            while True:
+                try:
+                    await track.recv()
+                except MediaStreamError:
+                    return      # Connection closed
+                received['frames'] += 1
+                received['first'] = received['first'] or time.time()
+        asyncio.ensure_future(consume())
+
+    await pc.setLocalDescription(await pc.createOffer())
+    answer = await output._answer(pc.localDescription.sdp, pc.localDescription.type)
+    await pc.setRemoteDescription(RTCSessionDescription(**answer))
+
+    start = time.time()
+    await asyncio.sleep(seconds)
+    # aiortc's inbound stats have no byte count; read the sending side's
+    reports = [await peer.getStats() for peer in list(output.peers)]
+    await pc.close()
+    elapsed = time.time() - (received['first'] or start)
+    nbytes = sum(r.bytesSent for stats in reports for r in stats.values() if r.type == "outbound-rtp")
+    return received['frames'] / max(elapsed, 1e-6), nbytes * 8 / max(elapsed, 1e-6)
+
+
+def loopback_test(source=None, seconds=10.0, codec=WEBRTC_CODEC):
+    """
+    Compare WebRTC and MJPEG bandwidth over a local loopback peer
+    Args:
+        source: Video file to stream (synthetic scene if None)
+        seconds: Measurement time
+    """
+    relay = FrameRelay()
+    mjpeg_bytes = []
+
+    def produce():
+        cap = cv2.VideoCapture(source) if source else None
+        # Synthetic scene: gradient background with a moving object
+        base = np.zeros((480, 640, 3), dtype=np.uint8)
+        base[:] = np.linspace(40, 200, 640, dtype=np.uint8)[None, :, None]
+        n = 0
+        while True:
+            if cap is not None:
+                ret, frame = cap.read()
+                if not ret:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                frame = cv2.resize(frame, (640, 480))
+            else:
+                frame = base.copy()
+                cv2.circle(frame, (n * 4 % 640, 240), 60, (0, 0, 255), -1)
+                cv2.putText(frame, f"{n}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+            n += 1
+            ret, jpeg = cv2.imencode('.jpg', frame)
+            mjpeg_bytes.append(len(jpeg))
+            relay.publish(frame)
+            time.sleep(1.0 / VIDEO_FPS)
+
+    relay.start(produce)
+    output = WebRTCOutput(relay, codec=codec)
+    fps, bitrate = asyncio.run_coroutine_threadsafe(_loopback(output, seconds), output.loop).result(seconds + 30)
+    mjpeg = np.mean(mjpeg_bytes) * 8 * VIDEO_FPS if mjpeg_bytes else 0.0
+    print(f"[INFO] WebRTC ({codec}): {fps:.1f} fps, {bitrate / 1000:.0f} kbit/s")
+    print(f"[INFO] MJPEG at {VIDEO_FPS} fps: {mjpeg / 1000:.0f} kbit/s ({mjpeg / max(bitrate, 1):.1f}x)")
+    return fps, bitrate, mjpeg
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="WebRTC output loopback benchmark")
+    ap.add_argument("-v", "--video", type=str, default=None, help="Video to stream (synthetic scene if omitted)")
+    ap.add_argument("-s", "--seconds", type=float, default=10.0)
+    ap.add_argument("--codec", type=str, default=WEBRTC_CODEC, choices=["VP8", "H264"])
+    args = ap.parse_args()
+    loopback_test(args.video, args.seconds, args.codec)
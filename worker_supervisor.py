@@ -0,0 +1,284 @@
+import argparse
+import gc
+import multiprocessing
+import os
+import signal
+import time
+
+import cv2
+
+from frame_buffer import DISPLAY_SIZE
+from shared_frames import open_source
+
+BACKENDS = ("mediapipe", "dlib", "cnn", "improved", "simple")
+
+
+def detector_class(backend):
+    """Import a detector class by backend name (same names as main.py)"""
+    if backend == "mediapipe":
+        from drowsiness_detector_mediapipe import DrowsinessDetectorMediaPipe
+        return DrowsinessDetectorMediaPipe
+    if backend == "dlib":
+        from drowsiness_detector import DrowsinessDetector
+        return DrowsinessDetector
+    if backend == "cnn":
+        from eye_state_detector import EyeStateDetector
+        return EyeStateDetector
+    if backend == "improved":
+        from improved_detector import ImprovedDrowsinessDetector
+        return ImprovedDrowsinessDetector
+    if backend == "simple":
+        from simple_detector import SimpleDrowsinessDetector
+        return SimpleDrowsinessDetector
+    raise ValueError(f"Unknown backend: {backend}")
+
+
+def resolve_backend(backend="auto"):
+    """First importable backend in main.py's order when backend is "auto" """
+    if backend != "auto":
+        detector_class(backend)
+        return backend
+    for name in ("mediapipe", "dlib", "improved", "simple"):
+        try:
+            detector_class(name)
+            return name
+        except ImportError:
+            continue
+    raise ImportError("No detector available")
+
+
+def memory_mb(pid):
+    """
+    Resident and proportional set size of a process, from /proc (Linux)
+    Returns:
+        {'rss': MB, 'pss': MB}, or None if unavailable. PSS splits shared
+        copy-on-write pages between the processes mapping them, so summed
+        PSS is the real memory cost of the worker pool.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return None
+    kb = lambda key: int(fields.get(key, "0 kB").split()[0])
+    return {'rss': round(kb("Rss") / 1024, 1), 'pss': round(kb("Pss") / 1024, 1)}
+
+
+def _run_worker(index, source, backend, cpus, threads, detector_kwargs):
+    """Headless detection loop for one stream, run in a forked child"""
+    # Ctrl+C goes to the whole process group; the supervisor stops workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    cv2.setNumThreads(threads)
+
+    detector = detector_class(backend)(**detector_kwargs)
+    cap = open_source(source, width=DISPLAY_SIZE[0], height=DISPLAY_SIZE[1])
+    if not cap.isOpened():
+        print(f"[ERROR] Worker {index}: could not open video source {source}")
+        raise SystemExit(2)
+
+    print(f"[INFO] Worker {index} (pid {os.getpid()}) running {backend} on {source}, "
+          f"cpus {sorted(cpus) if cpus else 'any'}, {threads} OpenCV thread(s)")
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                if cap.live:
+                    continue
+                break
+            if frame.shape[1::-1] != DISPLAY_SIZE:
+                frame = cv2.resize(frame, DISPLAY_SIZE)
+            _, ear, is_drowsy = detector.detect_drowsiness(frame)
+            if is_drowsy:
+                print(f"[ALERT] Worker {index} ({source}): drowsiness detected! EAR: {ear:.2f}")
+    finally:
+        cap.release()
+
+
+class WorkerSupervisor:
+    def __init__(self, sources, backend="auto", threads=1, cpus_per_worker=1,
+                 restart_delay=1.0, max_restart_delay=30.0, **detector_kwargs):
+        """
+        Pre-fork supervisor running one detector process per stream
+
+        The face detector, the Haar eye cascade and the dlib predictor are
+        loaded once in the supervisor and workers are forked from it, so
+        they and the imported modules are shared copy-on-write; the
+        detector constructors pick them up from the process caches. Each
+        worker still builds its own MediaPipe FaceMesh and CNN session,
+        since their graphs start threads that must not cross fork().
+        Each worker is pinned to its own CPUs with a matching OpenCV thread
+        count, and workers that crash are restarted with exponential backoff.
+
+        Args:
+            sources: Camera indexes, video paths or "shm:NAME" frame rings
+            backend: Detector backend name or "auto"
+            threads: cv2.setNumThreads per worker
+            cpus_per_worker: CPUs pinned per worker (0 = no pinning)
+            restart_delay: First restart delay in seconds, doubled per crash
+            max_restart_delay: Cap on the restart delay
+            detector_kwargs: Passed to the detector constructor
+        """
+        self.sources = list(sources)
+        self.backend = resolve_backend(backend)
+        self.threads = threads
+        self.cpus_per_worker = cpus_per_worker
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.detector_kwargs = detector_kwargs
+
+        methods = multiprocessing.get_all_start_methods()
+        self.ctx = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        if self.ctx.get_start_method() != "fork":
+            print("[WARNING] fork is not available; every worker loads its own models")
+
+        self.workers = [None] * len(self.sources)
+        self.started = [0.0] * len(self.sources)
+        self.restarts = [0] * len(self.sources)
+        self.crash_streak = [0] * len(self.sources)
+        self.next_start = [0.0] * len(self.sources)
+        self.running = False
+
+    def cpus_for(self, index):
+        """CPU set for a worker, round-robin over the CPUs this process may use"""
+        if not self.cpus_per_worker or not hasattr(os, "sched_getaffinity"):
+            return None
+        available = sorted(os.sched_getaffinity(0))
+        start = index * self.cpus_per_worker
+        return {available[(start + i) % len(available)] for i in range(self.cpus_per_worker)}
+
+    def preload(self):
+        """Import the detector and load shared models before forking"""
+        start = time.perf_counter()
+        # No OpenCV pool threads may be alive across fork()
+        cv2.setNumThreads(1)
+        detector_class(self.backend)
+
+        from face_detector_dnn import create_face_detector, load_eye_cascade
+        create_face_detector()
+        load_eye_cascade()
+        if self.backend == "dlib":
+            from landmark_models import select_predictor
+            select_predictor(self.detector_kwargs.get(
+                "shape_predictor_path", "data/models/shape_predictor_68_face_landmarks.dat"))
+
+        # Keep the garbage collector from touching (and so copying) the
+        # preloaded objects' pages in the children
+        gc.collect()
+        if hasattr(gc, "freeze"):
+            gc.freeze()
+        print(f"[INFO] Preloaded {self.backend} models in {time.perf_counter() - start:.2f}s")
+
+    def _spawn(self, index):
+        cpus = self.cpus_for(index)
+        proc = self.ctx.Process(target=_run_worker, name=f"blinksense-worker-{index}",
+                                args=(index, self.sources[index], self.backend, cpus,
+                                      self.threads, self.detector_kwargs))
+        proc.daemon = True
+        proc.start()
+        self.workers[index] = proc
+        self.started[index] = time.time()
+
+    def start(self):
+        self.preload()
+        self.running = True
+        for index in range(len(self.sources)):
+            self._spawn(index)
+        return self
+
+    def poll(self):
+        """Restart crashed workers; returns the number still running or pending"""
+        now = time.time()
+        active = 0
+        for index, proc in enumerate(self.workers):
+            if proc is None:
+                if now >= self.next_start[index]:
+                    self._spawn(index)
+                active += 1
+                continue
+            if proc.is_alive():
+                active += 1
+                continue
+            proc.join()
+            if proc.exitcode == 0:
+                # Video file finished; nothing to restart
+                continue
+            if now - self.started[index] > 60:
+                self.crash_streak[index] = 0
+            delay = min(self.max_restart_delay, self.restart_delay * 2 ** self.crash_streak[index])
+            self.crash_streak[index] += 1
+            self.restarts[index] += 1
+            print(f"[WARNING] Worker {index} exited with code {proc.exitcode}; "
+                  f"restarting in {delay:.1f}s")
+            self.workers[index] = None
+            self.next_start[index] = now + delay
+            active += 1
+        return active
+
+    def run(self, interval=1.0, report_every=60.0):
+        """Supervise until interrupted or every worker has finished"""
+        if not self.running:
+            self.start()
+        last_report = time.time()
+        try:
+            while self.poll():
+                time.sleep(interval)
+                if report_every and time.time() - last_report >= report_every:
+                    last_report = time.time()
+                    print(f"[INFO] Workers: {self.stats()['workers']}")
+        except KeyboardInterrupt:
+            print("\n[INFO] Supervisor stopped by user")
+        finally:
+            self.stop()
+
+    def stop(self, timeout=5.0):
+        self.running = False
+        for proc in self.workers:
+            if proc is not None and proc.is_alive():
+                proc.terminate()
+        for proc in self.workers:
+            if proc is not None:
+                proc.join(timeout)
+                if proc.is_alive():
+                    proc.kill()
+        print("[INFO] Cleanup completed")
+
+    def stats(self):
+        workers = []
+        for index, proc in enumerate(self.workers):
+            alive = proc is not None and proc.is_alive()
+            workers.append({
+                'source': self.sources[index],
+                'pid': proc.pid if alive else None,
+                'restarts': self.restarts[index],
+                'memory_mb': memory_mb(proc.pid) if alive else None,
+            })
+        return {
+            'backend': self.backend,
+            'supervisor_memory_mb': memory_mb(os.getpid()),
+            'workers': workers,
+        }
+
+
+def parse_source(value):
+    return int(value) if value.isdigit() else value
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Run one drowsiness detector process per stream")
+    ap.add_argument("sources", nargs="+", help="Webcam indexes, video paths or shm:NAME rings")
+    ap.add_argument("-b", "--backend", type=str, default="auto", choices=("auto",) + BACKENDS)
+    ap.add_argument("--threads", type=int, default=1, help="OpenCV threads per worker")
+    ap.add_argument("--cpus-per-worker", type=int, default=1, help="CPUs pinned per worker (0 = no pinning)")
+    ap.add_argument("-t", "--threshold", type=float, default=0.25, help="EAR threshold")
+    ap.add_argument("-f", "--frames", type=int, default=20, help="Consecutive frames for alert")
+    args = ap.parse_args()
+
+    backend = resolve_backend(args.backend)
+    kwargs = {}
+    if backend in ("mediapipe", "dlib", "simple"):
+        kwargs = {'ear_thresh': args.threshold, 'ear_consec_frames': args.frames}
+    supervisor = WorkerSupervisor([parse_source(s) for s in args.sources], backend,
+                                  args.threads, args.cpus_per_worker, **kwargs)
+    supervisor.run()
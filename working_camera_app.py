@@ -6,6 +6,9 @@ import time
 from PIL import Image
 import threading
 import queue
+from frame_buffer import FrameBufferPool, AnalysisFrame, DISPLAY_SIZE
+from camera_capture import CaptureService
+from camera_discovery import discovery
 
 # Page configuration
 st.set_page_config(
@@ -63,18 +66,19 @@ class CameraManager:
         self.cap = None
         self.camera_index = 0
         self.is_running = False
-        
-    def find_working_camera(self):
-        """Find the first working camera"""
-        for i in range(3):  # Check cameras 0, 1, 2
-            cap = cv2.VideoCapture(i)
-            if cap.isOpened():
-                ret, frame = cap.read()
-                if ret:
-                    cap.release()
-                    return i
-            cap.release()
-        return None
+        self.buffers = FrameBufferPool(*DISPLAY_SIZE)
+        self.probed_cap = None
+        
+    def find_working_camera(self, use_cache=True):
+        """Find a working camera (cached device, else parallel probe)"""
+        device, cap = discovery.find_camera(use_cache)
+        if device is None:
+            return None
+        # Keep a probed capture open so initialize_camera does not reopen it
+        if self.probed_cap is not None:
+            self.probed_cap.release()
+        self.probed_cap = cap
+        return device['index']
     
     def initialize_camera(self):
         """Initialize camera with best settings"""
@@ -84,32 +88,40 @@ class CameraManager:
             return False, "No working camera found"
         
         self.camera_index = camera_idx
-        self.cap = cv2.VideoCapture(self.camera_index)
+        self.release()
+        self.cap = CaptureService(self.camera_index, self.buffers.width, self.buffers.height, fps=30,
+                                  cap=self.probed_cap, resolver=discovery.resolve,
+                                  on_open=self._on_open).start()
+        self.probed_cap = None
         
         if not self.cap.isOpened():
+            # The cached device went stale; probe for real next time
+            discovery.reprobe_async()
+            self.release()
             return False, f"Cannot open camera {self.camera_index}"
         
-        # Set camera properties for better performance
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        self.cap.set(cv2.CAP_PROP_FPS, 30)
-        self.cap.set(cv2.CAP_PROP_BRIGHTNESS, 0.5)
-        self.cap.set(cv2.CAP_PROP_CONTRAST, 0.5)
-        
         return True, f"Camera {self.camera_index} initialized successfully"
     
+    def _on_open(self, service):
+        """Runs on every open, so the settings survive reconnects"""
+        discovery.remember_source(service)
+        # Set camera properties for better performance
+        service.cap.set(cv2.CAP_PROP_BRIGHTNESS, 0.5)
+        service.cap.set(cv2.CAP_PROP_CONTRAST, 0.5)
+    
     def read_frame(self):
         """Read frame from camera"""
-        if self.cap and self.cap.isOpened():
-            ret, frame = self.cap.read()
+        if self.cap and self.cap.running:
+            ret, frame = self.buffers.read(self.cap)
             if ret:
-                return cv2.flip(frame, 1)  # Mirror effect
+                return self.buffers.flip(frame)  # Mirror effect
         return None
     
     def release(self):
         """Release camera"""
         if self.cap:
             self.cap.release()
+            self.cap = None
 
 class DrowsinessDetector:
     def __init__(self):
@@ -142,6 +154,10 @@ class DrowsinessDetector:
         self.avg_ear = 0.0
         self.ear_history = []
         
+        # Reused RGB/overlay buffers; FaceMesh runs on a downscaled copy
+        self.buffers = FrameBufferPool(*DISPLAY_SIZE)
+        self.analysis = AnalysisFrame(self.buffers)
+        
     def eye_aspect_ratio(self, landmarks, eye_points, frame_shape):
         """Calculate Eye Aspect Ratio with improved accuracy"""
         h, w = frame_shape[:2]
@@ -197,8 +213,8 @@ class DrowsinessDetector:
         
         h, w = frame.shape[:2]
         
-        # Convert BGR to RGB for MediaPipe
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        # Downscaled RGB copy for MediaPipe (landmarks are normalised)
+        rgb_frame = self.analysis.prepare(frame, rgb=True)
         
         # Process with MediaPipe
         results = self.face_mesh.process(rgb_frame)
@@ -259,7 +275,7 @@ class DrowsinessDetector:
         h, w = frame.shape[:2]
         
         # Semi-transparent background
-        overlay = frame.copy()
+        overlay = self.buffers.overlay(frame)
         cv2.rectangle(overlay, (10, 10), (450, 160), (0, 0, 0), -1)
         cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
         
@@ -297,8 +313,8 @@ class DrowsinessDetector:
         if self.counter >= self.frame_threshold:
             # Pulsing red overlay
             pulse = int(abs(np.sin(time.time() * 8)) * 100)
-            alert_overlay = frame.copy()
-            cv2.rectangle(alert_overlay, (0, 0), (w, h), (0, 0, 255), -1)
+            alert_overlay = self.buffers.get("alert_overlay", frame.shape)
+            alert_overlay[:] = (0, 0, 255)
             cv2.addWeighted(alert_overlay, pulse/255.0 * 0.4, frame, 1 - pulse/255.0 * 0.4, 0, frame)
             
             # Alert text
@@ -403,7 +419,7 @@ def main():
                 
                 if processed_frame is not None:
                     # Convert BGR to RGB for Streamlit
-                    rgb_frame = cv2.cvtColor(processed_frame, cv2.COLOR_BGR2RGB)
+                    rgb_frame = detector.buffers.to_rgb(processed_frame, "display")
                     frame_placeholder.image(rgb_frame, channels="RGB", use_column_width=True)
                     
                     # Update metrics
@@ -439,12 +455,12 @@ def main():
                     else:
                         alert_placeholder.info("No alerts yet")
             
-            else:
+            elif st.session_state.camera_manager.cap is None or not st.session_state.camera_manager.cap.running:
                 frame_placeholder.error("❌ Cannot read from camera")
                 st.session_state.is_running = False
-            
-            # Small delay to prevent overwhelming
-            time.sleep(0.033)  # ~30 FPS
+            else:
+                # read_frame blocks for the next frame, so no pacing sleep is needed
+                frame_placeholder.warning("⏳ Camera reconnecting...")
     
     # Instructions
     st.markdown("---")